@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+import math
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of the given values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = int(math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[max(rank, 1) - 1]
+
+
+def measure(func, repeat=100, warmup=5):
+    """
+    Call func repeatedly and return its latency percentiles in milliseconds
+    together with the number of queries a single call runs.
+    """
+    for _i in range(warmup):
+        func()
+
+    with CaptureQueriesContext(connection) as context:
+        func()
+    queries = len(context.captured_queries)
+
+    timings = []
+    for _i in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'repeat': repeat,
+        'queries': queries,
+        'p50_ms': round(percentile(timings, 50), 4),
+        'p99_ms': round(percentile(timings, 99), 4),
+        'mean_ms': round(sum(timings) / len(timings), 4),
+    }
+
+
+def explain(queryset):
+    """
+    Return the database query plan of the given queryset, one line per step.
+    """
+    return queryset.explain().splitlines()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+"""
+Latency of NPS responses with checkbox contra options and the storage they
+take, with one option response row per chosen option and with contra masks
+(SURVEY_CONTRA_MASK_STORAGE). Table sizes are only reported on PostgreSQL,
+run it with PostgreSQL settings, e.g.
+
+    python run_benchmarks.py contra_storage --settings=myproject.settings_benchmark
+"""
+import random
+from uuid import uuid4
+
+from django.db import connection
+from django.test.utils import override_settings
+from upkook_core.businesses.services import BusinessService
+from upkook_core.industries.services import IndustryService
+
+from cx_metrics.multiple_choices.models import MultipleChoice, OptionResponse
+from cx_metrics.multiple_choices.services import MultipleChoiceService
+from cx_metrics.nps.models import NPSResponse
+from cx_metrics.nps.services import NPSService
+
+from .base import measure
+
+OPTIONS = 10
+CHOSEN = 4
+RESPONSES = 10000
+REPEAT = 100
+
+
+def create_survey():
+    industry = IndustryService.create_industry(name='Benchmark', icon='')
+    business = BusinessService.create_business(
+        size=5, name='Benchmark', domain='benchmark-%s.com' % uuid4().hex, industry=industry
+    )
+    contra = MultipleChoiceService.create(text='contra', type_=MultipleChoice.TYPE_CHECKBOX)
+    MultipleChoiceService.create_options(contra, [
+        {'text': 'option %d' % index, 'order': index} for index in range(OPTIONS)
+    ])
+    survey = NPSService.create_nps_survey(
+        name='Benchmark', business=business, text='text', question='question', message='message'
+    )
+    survey.contra = contra
+    survey.save()
+    return survey
+
+
+def get_table_sizes():
+    """
+    Return the {table: bytes} sizes of the response tables, indexes included,
+    None on databases other than PostgreSQL.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    sizes = {}
+    with connection.cursor() as cursor:
+        for model in (NPSResponse, OptionResponse):
+            cursor.execute('SELECT pg_total_relation_size(%s)', [model._meta.db_table])
+            sizes[model._meta.db_table] = cursor.fetchone()[0]
+    return sizes
+
+
+def run_storage(mask_storage):
+    random.seed(0)
+    before = get_table_sizes()
+    with override_settings(SURVEY_CONTRA_MASK_STORAGE=mask_storage):
+        survey = create_survey()
+        option_ids = list(survey.contra.options.values_list('id', flat=True))
+
+        def respond():
+            NPSService.respond(survey, uuid4(), random.randint(0, 10), random.sample(option_ids, CHOSEN))
+
+        result = measure(respond, repeat=REPEAT)
+        for _i in range(RESPONSES):
+            respond()
+
+    after = get_table_sizes()
+    result.update({
+        'responses': NPSResponse.objects.filter(survey_uuid=survey.uuid).count(),
+        'option_responses': OptionResponse.objects.filter(option_text__multiple_choice_id=survey.contra_id).count(),
+        'table_bytes': {table: after[table] - before[table] for table in after} if after else None,
+    })
+    return result
+
+
+def run():
+    return {
+        'vendor': connection.vendor,
+        'options': OPTIONS,
+        'chosen': CHOSEN,
+        'option_responses': run_storage(False),
+        'contra_mask': run_storage(True),
+    }
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+"""
+Throughput of concurrent NPS responses to a single survey with plain and
+sharded counters. Row lock contention only shows on a database with row
+level locking, run it with PostgreSQL settings, e.g.
+
+    python run_benchmarks.py counter_contention --settings=myproject.settings_benchmark
+"""
+import threading
+import time
+from uuid import uuid4
+
+from django.db import DatabaseError, close_old_connections, connection
+from upkook_core.businesses.services import BusinessService
+from upkook_core.industries.services import IndustryService
+
+from cx_metrics.nps.services import NPSService
+
+from .base import percentile
+
+THREADS = 16
+RESPONSES_PER_THREAD = 50
+SHARDS = (1, 4, 16)
+
+
+def create_survey(counter_shards):
+    industry = IndustryService.create_industry(name='Benchmark', icon='')
+    business = BusinessService.create_business(
+        size=5, name='Benchmark', domain='benchmark-%s.com' % uuid4().hex, industry=industry
+    )
+    survey = NPSService.create_nps_survey(
+        name='Benchmark', business=business, text='text', question='question', message='message'
+    )
+    survey.counter_shards = counter_shards
+    survey.save()
+    return survey
+
+
+def worker(survey, timings, errors):
+    close_old_connections()
+    try:
+        for index in range(RESPONSES_PER_THREAD):
+            start = time.perf_counter()
+            try:
+                NPSService.respond(survey, uuid4(), index % 11)
+            except DatabaseError:
+                errors.append(index)
+                continue
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        connection.close()
+
+
+def run_contention(counter_shards):
+    survey = create_survey(counter_shards)
+    timings = []
+    errors = []
+    threads = [threading.Thread(target=worker, args=(survey, timings, errors)) for _i in range(THREADS)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    survey = NPSService.get_nps_survey_by_uuid(survey.uuid)
+    return {
+        'threads': THREADS,
+        'responses': len(timings),
+        'errors': len(errors),
+        'responses_per_second': round(len(timings) / elapsed, 2),
+        'p50_ms': round(percentile(timings, 50) or 0, 4),
+        'p99_ms': round(percentile(timings, 99) or 0, 4),
+        'counted': sum(survey.counters.values()),
+    }
+
+
+def run():
+    return {
+        'vendor': connection.vendor,
+        'shards': {str(shards): run_contention(shards) for shards in SHARDS},
+    }
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+"""
+Latency and query counts of the public endpoints on a database seeded with
+many businesses, surveys and responses, compared with the query budgets of
+cx_metrics.tests.budgets.
+
+    python run_benchmarks.py endpoints --output endpoints.json
+"""
+import json
+import random
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from upkook_core.auth.tests.client import AuthClient
+from upkook_core.businesses.services import BusinessService
+from upkook_core.industries.services import IndustryService
+from upkook_core.teams.services import MemberService
+from upkook_core.teams.tests import MemberPermissionTestMixin
+
+from cx_metrics.ces.models import CESResponse
+from cx_metrics.ces.services import CESService
+from cx_metrics.csat.models import CSATResponse
+from cx_metrics.csat.services import CSATService
+from cx_metrics.nps.models import NPSResponse
+from cx_metrics.nps.services import NPSService
+from cx_metrics.tests.budgets import QUERY_BUDGETS
+
+from .base import measure
+
+BUSINESSES = 100
+SURVEYS_PER_BUSINESS = 10
+RESPONSES = 1000000
+BATCH_SIZE = 5000
+REPEAT = 100
+
+SURVEY_TYPES = (
+    ('nps', NPSService.create_nps_survey, NPSResponse, 'score', lambda: random.randint(0, 10)),
+    ('csat', CSATService.create_csat_survey, CSATResponse, 'rate', lambda: random.randint(1, 3)),
+    ('ces', CESService.create_ces_survey, CESResponse, 'rate', lambda: random.randint(1, 3)),
+)
+PERMISSIONS = (
+    ('surveys', ['view_survey']),
+    ('nps', ['view_npssurvey']),
+    ('csat', ['view_csatsurvey']),
+    ('ces', ['view_cessurvey']),
+)
+
+
+def create_surveys(business, count):
+    surveys = {}
+    for survey_type, create, _model, _field_name, _value in SURVEY_TYPES:
+        surveys[survey_type] = [
+            create(name='Benchmark %d' % index, business=business, text='text', question='question', message='message')
+            for index in range(count)
+        ]
+    return surveys
+
+
+def create_responses(surveys, count):
+    random.seed(0)
+    customer_uuids = [uuid4() for _i in range(count // 20 or 1)]
+    per_type = count // len(SURVEY_TYPES)
+    for survey_type, _create, model, field_name, value in SURVEY_TYPES:
+        survey_uuids = [survey.uuid for survey in surveys[survey_type]]
+        for start in range(0, per_type, BATCH_SIZE):
+            model.objects.bulk_create([
+                model(**{
+                    'survey_uuid': random.choice(survey_uuids),
+                    'customer_uuid': random.choice(customer_uuids),
+                    field_name: value(),
+                })
+                for _i in range(min(BATCH_SIZE, per_type - start))
+            ])
+
+
+def seed():
+    """
+    Load the users and teams fixtures, give the first member of them read
+    access to all surveys and seed BUSINESSES businesses with surveys and
+    RESPONSES responses spread over them. Returns the member and the surveys
+    of its business.
+    """
+    call_command('loaddata', 'users', 'industries', 'businesses', 'teams', verbosity=0)
+    member = MemberService.get_member_by_id(1)
+    permissions = MemberPermissionTestMixin()
+    for app_label, codenames in PERMISSIONS:
+        permissions.give_member_permissions(member, app_label=app_label, codenames=codenames)
+
+    industry = IndustryService.create_industry(name='Benchmark', icon='')
+    surveys = {survey_type: [] for survey_type, _create, _model, _field_name, _value in SURVEY_TYPES}
+    member_surveys = create_surveys(member.business, SURVEYS_PER_BUSINESS)
+    for index in range(BUSINESSES):
+        business = BusinessService.create_business(
+            size=5, name='Benchmark %d' % index, domain='benchmark-%d.com' % index, industry=industry
+        )
+        for survey_type, items in create_surveys(business, SURVEYS_PER_BUSINESS).items():
+            surveys[survey_type].extend(items)
+    for survey_type, items in member_surveys.items():
+        surveys[survey_type].extend(items)
+
+    create_responses(surveys, RESPONSES)
+    return member, member_surveys
+
+
+def get_auth_client(member):
+    User = get_user_model()
+    client = AuthClient()
+    client.login(**{
+        User.USERNAME_FIELD: User.objects.first().email,
+        'password': 'test_password',
+        'business': member.business.username,
+    })
+    return client
+
+
+def post_response(client, url, data):
+    def post():
+        return client.post(url, data=json.dumps(data), content_type='application/json')
+    return post
+
+
+def get_endpoints(member, surveys):
+    """
+    Return (URL name, request function) pairs, each function requests the
+    endpoint once. Response posts create a new anonymous customer per call.
+    """
+    auth_client = get_auth_client(member)
+    client = Client()
+
+    nps, csat, ces = surveys['nps'][0], surveys['csat'][0], surveys['ces'][0]
+    return [
+        ('cx-surveys:list', lambda: auth_client.get(reverse('cx-surveys:list'))),
+        ('cx-surveys:retrieve', lambda: client.get(reverse('cx-surveys:retrieve', kwargs={'uuid': nps.uuid}))),
+        ('cx-nps:responses-create', post_response(
+            client, reverse('cx-nps:responses-create', kwargs={'uuid': nps.uuid}), {'score': 10, 'customer': {}}
+        )),
+        ('cx-nps:insights', lambda: auth_client.get(reverse('cx-nps:insights', kwargs={'uuid': nps.uuid}))),
+        ('cx-csat:responses-create', post_response(
+            client, reverse('cx-csat:responses-create', kwargs={'uuid': csat.uuid}), {'rate': 3, 'customer': {}}
+        )),
+        ('cx-csat:insights', lambda: auth_client.get(reverse('cx-csat:insights', kwargs={'uuid': csat.uuid}))),
+        ('cx-ces:responses-create', post_response(
+            client, reverse('cx-ces:responses-create', kwargs={'uuid': ces.uuid}), {'rate': 3, 'customer': {}}
+        )),
+        ('cx-ces:insights', lambda: auth_client.get(reverse('cx-ces:insights', kwargs={'uuid': ces.uuid}))),
+    ]
+
+
+def run():
+    member, surveys = seed()
+
+    results = {}
+    for name, request in get_endpoints(member, surveys):
+        result = measure(request, repeat=REPEAT)
+        result['status'] = request().status_code
+        result['budget'] = QUERY_BUDGETS[name]
+        result['over_budget'] = result['queries'] > result['budget']
+        results[name] = result
+
+    return {
+        'vendor': connection.vendor,
+        'businesses': BUSINESSES + 1,
+        'surveys': (BUSINESSES + 1) * SURVEYS_PER_BUSINESS * len(SURVEY_TYPES),
+        'responses': RESPONSES,
+        'endpoints': results,
+    }
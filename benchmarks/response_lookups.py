@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+"""
+Query plans and latency of the response lookups done on every survey
+response, with and without the composite response lookup indexes.
+"""
+import random
+from datetime import timedelta
+from uuid import uuid4
+
+from django.db import connection
+from django.utils import timezone
+
+from cx_metrics.nps.models import NPSResponse
+
+from .base import explain, measure
+
+SURVEYS = 20
+CUSTOMERS = 5000
+RESPONSES = 100000
+BATCH_SIZE = 5000
+
+
+def seed(responses=RESPONSES):
+    random.seed(0)
+    survey_uuids = [uuid4() for _i in range(SURVEYS)]
+    customer_uuids = [uuid4() for _i in range(CUSTOMERS)]
+    now = timezone.now()
+    rows = [
+        NPSResponse(
+            survey_uuid=random.choice(survey_uuids),
+            customer_uuid=random.choice(customer_uuids),
+            score=random.randint(0, 10),
+        )
+        for _i in range(responses)
+    ]
+    NPSResponse.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    # created is auto_now_add, spread it over a year afterwards
+    for index, pk in enumerate(NPSResponse.objects.values_list('pk', flat=True).iterator()):
+        if index % 10 == 0:
+            NPSResponse.objects.filter(pk__gte=pk, pk__lt=pk + 10).update(
+                created=now - timedelta(minutes=random.randint(0, 525600))
+            )
+    return survey_uuids, customer_uuids
+
+
+def lookups(survey_uuids, customer_uuids):
+    since = timezone.now() - timedelta(days=30)
+    return {
+        'last_response_by_customer': lambda: (
+            NPSResponse.objects.filter(customer_uuid=random.choice(customer_uuids)).order_by('-created')
+        ),
+        'recent_responses_by_survey': lambda: (
+            NPSResponse.objects.filter(survey_uuid=random.choice(survey_uuids), created__gt=since)
+        ),
+    }
+
+
+def run_lookups(survey_uuids, customer_uuids):
+    results = {}
+    for name, queryset in lookups(survey_uuids, customer_uuids).items():
+        results[name] = {
+            'plan': explain(queryset()),
+            'latency': measure(lambda: list(queryset()[:1])),
+        }
+    return results
+
+
+def run():
+    survey_uuids, customer_uuids = seed()
+    indexes = NPSResponse._meta.indexes
+
+    with connection.schema_editor() as schema_editor:
+        for index in indexes:
+            schema_editor.remove_index(NPSResponse, index)
+    before = run_lookups(survey_uuids, customer_uuids)
+
+    with connection.schema_editor() as schema_editor:
+        for index in indexes:
+            schema_editor.add_index(NPSResponse, index)
+    after = run_lookups(survey_uuids, customer_uuids)
+
+    return {
+        'rows': RESPONSES,
+        'before': before,
+        'after': after,
+    }
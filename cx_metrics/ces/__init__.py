@@ -0,0 +1,3 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+default_app_config = 'cx_metrics.ces.apps.CESAppConfig'
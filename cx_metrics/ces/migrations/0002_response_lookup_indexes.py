@@ -0,0 +1,21 @@
+# Generated by Django 2.2 on 2026-10-17 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ces', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cesresponse',
+            index=models.Index(fields=['customer_uuid', 'created'], name='ces_customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cesresponse',
+            index=models.Index(fields=['survey_uuid', 'created'], name='ces_survey_created_idx'),
+        ),
+    ]
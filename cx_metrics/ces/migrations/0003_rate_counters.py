@@ -0,0 +1,64 @@
+# Generated by Django 2.2 on 2026-10-17 10:05
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_rate_counters(apps, schema_editor):
+    CESSurvey = apps.get_model('ces', 'CESSurvey')
+    CESResponse = apps.get_model('ces', 'CESResponse')
+
+    counts = {}
+    responses = CESResponse.objects.order_by().values_list('survey_uuid', 'rate').annotate(count=Count('id'))
+    for survey_uuid, rate, count in responses:
+        counts.setdefault(survey_uuid, {})['rate_%d' % rate] = count
+
+    for survey_uuid, kwargs in counts.items():
+        CESSurvey.objects.filter(uuid=survey_uuid).update(**kwargs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ces', '0002_response_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cessurvey',
+            name='rate_1',
+            field=models.BigIntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Rate 1 Responses'),
+        ),
+        migrations.AddField(
+            model_name='cessurvey',
+            name='rate_2',
+            field=models.BigIntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Rate 2 Responses'),
+        ),
+        migrations.AddField(
+            model_name='cessurvey',
+            name='rate_3',
+            field=models.BigIntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Rate 3 Responses'),
+        ),
+        migrations.AddField(
+            model_name='cessurvey',
+            name='rate_4',
+            field=models.BigIntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Rate 4 Responses'),
+        ),
+        migrations.AddField(
+            model_name='cessurvey',
+            name='rate_5',
+            field=models.BigIntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Rate 5 Responses'),
+        ),
+        migrations.AddField(
+            model_name='cessurvey',
+            name='rate_6',
+            field=models.BigIntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Rate 6 Responses'),
+        ),
+        migrations.AddField(
+            model_name='cessurvey',
+            name='rate_7',
+            field=models.BigIntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Rate 7 Responses'),
+        ),
+        migrations.RunPython(populate_rate_counters, migrations.RunPython.noop),
+    ]
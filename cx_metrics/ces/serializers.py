@@ -10,7 +10,6 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import empty
 from upkook_core.customers.serializers import CustomerSerializer
-from upkook_core.customers.services import CustomerService
 
 from cx_metrics.ces.models import CESSurvey, CESResponse
 from cx_metrics.ces.services import CESService
@@ -20,8 +19,10 @@ from cx_metrics.multiple_choices.serializers import (
     MultipleChoiceRespondSerializer
 )
 from cx_metrics.surveys.decorators import register_survey_serializer
+from cx_metrics.surveys.factory import survey_factory
 from cx_metrics.surveys.models import Survey
-from cx_metrics.surveys.services import SurveyInsightCacheService, SurveyService
+from cx_metrics.surveys.serializers import SurveyOptionResponsesQuerySerializer, SurveyRespondSerializerMixin
+from cx_metrics.surveys.services import SurveyService
 
 
 @register_survey_serializer('CES')
@@ -32,7 +33,7 @@ class CESSerializer(serializers.ModelSerializer):
 
     def __init__(self, instance=None, data=empty, **kwargs):
         if isinstance(instance, Survey):
-            instance = CESService.get_ces_survey(survey_id=instance.id)
+            instance = survey_factory.load(instance)
         super(CESSerializer, self).__init__(instance, data, **kwargs)
         contra = instance and instance.contra
         self.fields['contra_reason'] = CachedMultipleChoiceSerializer(source='contra', instance=contra)
@@ -52,7 +53,7 @@ class CESSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         obj = instance
         if isinstance(instance, Survey):
-            obj = CESService.get_ces_survey(survey_id=instance.id)
+            obj = survey_factory.load(instance)
             if obj is None:
                 raise Http404
         return super(CESSerializer, self).to_representation(obj)
@@ -80,7 +81,17 @@ class CESSerializer(serializers.ModelSerializer):
         return super(CESSerializer, self).update(instance, v_data)
 
 
-class CESRespondSerializer(serializers.ModelSerializer):
+class CESResponseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CESResponse
+        fields = ('id', 'customer_uuid', 'rate', 'created')
+
+
+class CESOptionResponsesQuerySerializer(SurveyOptionResponsesQuerySerializer):
+    rate = serializers.IntegerField(min_value=1, max_value=CESSurvey.MAX_RATE, required=False)
+
+
+class CESRespondSerializer(SurveyRespondSerializerMixin, serializers.ModelSerializer):
     customer = CustomerSerializer()
     contra_options = serializers.ListField(child=serializers.IntegerField(), required=False)
 
@@ -92,7 +103,9 @@ class CESRespondSerializer(serializers.ModelSerializer):
         c_kwargs = copy(kwargs)
         self.survey = c_kwargs.pop('survey')
         super(CESRespondSerializer, self).__init__(instance, data, **c_kwargs)
-        self.fields["contra_options"] = MultipleChoiceRespondSerializer(mc_id=self.survey.contra_id, required=False)
+        self.fields["contra_options"] = MultipleChoiceRespondSerializer(
+            mc_id=self.survey.contra_id, contra=self.survey.contra, required=False
+        )
 
     def to_representation(self, instance):
         return {
@@ -122,47 +135,7 @@ class CESRespondSerializer(serializers.ModelSerializer):
             raise ValidationError(_('Contra is required'))
         return attrs
 
-    def create(self, validated_data):
-        customer_data = validated_data.get('customer', {})
-
-        client_id = customer_data.get('client_id')
-        user_agent = validated_data.get('user_agent', None)
-
-        business = self.survey.business
-        if business.is_identified_by_email():
-            email = customer_data.get('email')
-            if not email:
-                raise ValidationError(_('Email is required'))
-            customer = CustomerService.identify_by_email(
-                business=self.survey.business, email=email, client_id=client_id, user_agent=user_agent
-            )
-        elif business.is_identified_by_mobile_number():
-            mobile_number = customer_data.get('mobile_number')
-            if not mobile_number:
-                raise ValidationError(_('Mobile number is required'))
-            customer = CustomerService.identify_by_mobile_number(
-                business=self.survey.business, mobile_number=mobile_number, client_id=client_id, user_agent=user_agent
-            )
-        elif business.is_identified_by_bizz_user_id():
-            bizz_user_id = customer_data.get('bizz_user_id')
-            if not bizz_user_id:
-                raise ValidationError(_('Business UserID is required'))
-            customer = CustomerService.identify_by_bizz_user_id(
-                business=self.survey.business, bizz_user_id=bizz_user_id, client_id=client_id, user_agent=user_agent
-            )
-        else:
-            customer = CustomerService.identify_anonymous(
-                business=self.survey.business, client_id=client_id
-            )
-
-        last_response = CESService.get_last_response(customer)
-        if SurveyService.is_duplicate_response(last_response):
-            raise ValidationError(
-                {
-                    "non_field_errors": [_("You could not submit responses within specific time !")]
-                }
-            )
-
+    def respond(self, customer, validated_data):
         rate = validated_data['rate']
         contra_options = validated_data.get('contra_options')
 
@@ -173,9 +146,20 @@ class CESRespondSerializer(serializers.ModelSerializer):
             contra_options_ids=contra_options
         )
 
-    def save(self, **kwargs):
-        SurveyInsightCacheService.delete(self.survey.type, self.survey.uuid)
-        return super(CESRespondSerializer, self).save(**kwargs)
+    def get_last_response(self, customer):
+        return CESService.get_last_response(customer, self.survey.uuid)
+
+    def get_recent_customer_uuids(self, customer_uuids):
+        return CESService.get_recent_customer_uuids(
+            customer_uuids, SurveyService.get_duplicate_block_start(), self.survey.uuid
+        )
+
+    def bulk_respond(self, entries):
+        responses = [
+            (customer.uuid, validated_data['rate'], validated_data.get('contra_options'))
+            for customer, validated_data in entries
+        ]
+        return CESService.bulk_respond(self.survey, responses)
 
 
 class CESInsightSerializer(serializers.ModelSerializer):
@@ -184,4 +168,4 @@ class CESInsightSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CESSurvey
-        fields = ('id', 'name', 'scale', 'contra_options')
+        fields = ('id', 'name', 'scale', 'rates', 'contra_options')
@@ -1,6 +1,15 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+import time
+from collections import Counter
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Count, F
+
 from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
+from cx_metrics.surveys.models import SurveyRollup
+from cx_metrics.surveys.services import SurveyInsightCacheService, SurveyRollupService, SurveyService
 from ..models import CESSurvey, CESResponse
 
 
@@ -39,18 +48,175 @@ class CESService(object):
     def get_ces_survey_by_uuid(uuid_):
         return CESService.get_ces_survey(uuid=uuid_)
 
+    @staticmethod
+    def change_rate_counts(survey_uuid, amounts):
+        kwargs = {field_name: F(field_name) + amount for field_name, amount in amounts.items()}
+        return CESSurvey.objects.filter(uuid=survey_uuid).update(**kwargs)
+
+    @staticmethod
+    def count_option_texts(option_texts):
+        texts = [option_text.text for option_text in option_texts]
+        return SurveyRollupService.count(SurveyRollup.DIMENSION_OPTION, texts)
+
     @staticmethod
     def respond(survey, customer_uuid, rate, contra_options_ids=None):
-        ces_response = CESResponse.objects.create(
-            survey_uuid=survey.uuid,
-            customer_uuid=customer_uuid,
-            rate=rate
-        )
+        field_name = CESSurvey.get_rate_field_name(rate)
 
+        contra_mask = 0
         if contra_options_ids:
-            OptionResponseService.store_option_response(survey.contra, customer_uuid, contra_options_ids)
+            contra_mask = OptionResponseService.get_contra_mask(survey.contra, contra_options_ids)
+
+        started = time.time()
+        with transaction.atomic():
+            rows = CESService.change_rate_counts(survey.uuid, {field_name: 1})
+            if rows > 0:
+                ces_response = CESResponse.objects.create(
+                    survey_uuid=survey.uuid,
+                    customer_uuid=customer_uuid,
+                    rate=rate,
+                    contra_mask=contra_mask
+                )
+
+                rollup_counts = SurveyRollupService.count(SurveyRollup.DIMENSION_RATE, [rate])
+                cross_tab_counts = {}
+                if contra_options_ids:
+                    option_texts = OptionResponseService.store_option_response(
+                        survey.contra, customer_uuid, contra_options_ids, mask=contra_mask,
+                        survey_response=ces_response, key=str(rate)
+                    )
+                    rollup_counts.update(CESService.count_option_texts(option_texts))
+                    cross_tab_counts = OptionResponseService.count_cross_tabs([option_texts], [str(rate)])
+                SurveyRollupService.increment(survey.uuid, rollup_counts, ces_response.created)
+            else:
+                return None
+
+        CESService.update_insights(survey.uuid, rollup_counts, cross_tab_counts, started)
         return ces_response
 
     @staticmethod
-    def get_last_response(customer):
-        return CESResponse.objects.filter(customer_uuid=customer.uuid).order_by('-created').first()
+    def rebuild_rate_counts(survey):
+        """
+        Recount the rate counters of the given survey from its responses.
+        The survey row is locked so that concurrent responses are not lost.
+        """
+        with transaction.atomic():
+            CESSurvey.objects.select_for_update().filter(uuid=survey.uuid).only('id').first()
+            responses = CESResponse.objects.filter(survey_uuid=survey.uuid).order_by()
+            counts = responses.values_list('rate').annotate(count=Count('id'))
+
+            kwargs = {CESSurvey.get_rate_field_name(rate): 0 for rate in range(1, CESSurvey.MAX_RATE + 1)}
+            kwargs.update({CESSurvey.get_rate_field_name(rate): count for rate, count in counts})
+            CESSurvey.objects.filter(uuid=survey.uuid).update(**kwargs)
+        return kwargs
+
+    @staticmethod
+    def backfill_rollups(survey):
+        """
+        Rebuild the rate and contra option rollups of the survey from its responses
+        """
+        rows = list(SurveyRollupService.get_rows(
+            CESResponse.objects.filter(survey_uuid=survey.uuid), SurveyRollup.DIMENSION_RATE, 'rate'
+        ))
+        if survey.contra_id:
+            rows.extend(SurveyRollupService.get_rows(
+                OptionResponseService.get_option_responses(survey.contra_id), SurveyRollup.DIMENSION_OPTION,
+                'option_text__text'
+            ))
+            rows.extend(SurveyRollupService.get_mask_rows(
+                CESResponse.objects.filter(survey_uuid=survey.uuid), SurveyRollup.DIMENSION_OPTION,
+                OptionResponseService.get_option_texts_by_bit(survey.contra_id)
+            ))
+        SurveyRollupService.rebuild(survey.uuid, rows)
+        return len(rows)
+
+    @staticmethod
+    def get_last_response(customer, survey_uuid=None):
+        responses = CESResponse.objects.filter(customer_uuid=customer.uuid)
+        if survey_uuid is not None:
+            responses = responses.filter(survey_uuid=survey_uuid)
+        return responses.order_by('-created').first()
+
+    @staticmethod
+    def get_recent_customer_uuids(customer_uuids, since, survey_uuid=None):
+        responses = CESResponse.objects.filter(customer_uuid__in=customer_uuids, created__gt=since)
+        if survey_uuid is not None:
+            responses = responses.filter(survey_uuid=survey_uuid)
+        return responses.values_list('customer_uuid', flat=True).distinct()
+
+    @staticmethod
+    def bulk_respond(survey, responses):
+        """
+        Store (customer_uuid, rate, contra_options_ids) tuples with a single INSERT
+        and a single UPDATE of the rate counters.
+        """
+        ces_responses = [
+            CESResponse(
+                survey_uuid=survey.uuid, customer_uuid=customer_uuid, rate=rate,
+                contra_mask=OptionResponseService.get_contra_mask(survey.contra, contra_options_ids)
+                if contra_options_ids else 0
+            )
+            for customer_uuid, rate, contra_options_ids in responses
+        ]
+        if not ces_responses:
+            return []
+
+        amounts = Counter(CESSurvey.get_rate_field_name(rate) for _customer_uuid, rate, _options in responses)
+        started = time.time()
+        with transaction.atomic():
+            rows = CESService.change_rate_counts(survey.uuid, amounts)
+            if rows == 0:
+                return [None] * len(ces_responses)
+
+            ces_responses = CESResponse.objects.bulk_create(ces_responses)
+            rollup_counts = SurveyRollupService.count(SurveyRollup.DIMENSION_RATE, [item[1] for item in responses])
+            contra_responses = [
+                (customer_uuid, contra_options_ids)
+                for customer_uuid, _rate, contra_options_ids in responses if contra_options_ids
+            ]
+            survey_responses = [response for response, item in zip(ces_responses, responses) if item[2]]
+            keys = [str(item[1]) for item in responses if item[2]]
+            cross_tab_counts = {}
+            if contra_responses:
+                SurveyService.set_missing_response_ids(survey_responses)
+                option_texts = OptionResponseService.store_option_responses(
+                    survey.contra, contra_responses, masks=[response.contra_mask for response in survey_responses],
+                    survey_responses=survey_responses, keys=keys
+                )
+                rollup_counts.update(CESService.count_option_texts(chain.from_iterable(option_texts)))
+                cross_tab_counts = OptionResponseService.count_cross_tabs(option_texts, keys)
+            SurveyRollupService.increment(survey.uuid, rollup_counts)
+
+        CESService.update_insights(survey.uuid, rollup_counts, cross_tab_counts, started)
+        return ces_responses
+
+    @staticmethod
+    def update_insights(survey_uuid, rollup_counts, cross_tab_counts=None, since=None):
+        """
+        Apply the rate and contra option counts of new responses and their
+        {text: {rate: amount}} cross tab counts to the cached insights of the
+        survey.
+        """
+        rate_amounts = {}
+        option_amounts = {}
+        for (dimension, key), amount in rollup_counts.items():
+            if dimension == SurveyRollup.DIMENSION_RATE:
+                rate_amounts[int(key)] = amount
+            elif dimension == SurveyRollup.DIMENSION_OPTION:
+                option_amounts[key] = amount
+
+        def update(data):
+            if data.get('rates') is None:
+                # Cached with an older layout, recompute
+                return None
+            data['rates'] = SurveyInsightCacheService.add_counts(data['rates'], 'rate', rate_amounts)
+            if option_amounts:
+                data['contra_options'] = SurveyInsightCacheService.add_counts(
+                    data.get('contra_options'), 'text', option_amounts
+                )
+            if cross_tab_counts:
+                data['contra_options'] = SurveyInsightCacheService.add_breakdowns(
+                    data.get('contra_options'), cross_tab_counts
+                )
+            return data
+
+        SurveyInsightCacheService.update('CES', survey_uuid, update, since)
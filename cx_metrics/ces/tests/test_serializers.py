@@ -2,7 +2,7 @@
 # vim: ai ts=4 sts=4 et sw=4
 from django.forms import model_to_dict
 from django.http import Http404
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.exceptions import ValidationError
 from upkook_core.businesses.models import Settings
 from upkook_core.businesses.services import BusinessService
@@ -513,6 +513,13 @@ class CESRespondSerializerTestCase(TestCase):
 
         self.assertRaises(ValidationError, serializer.validate_rate, data['rate'])
 
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }
+        }
+    )
     def test_duplicate_response(self):
         ces_survey = CESSurvey.objects.first()
         customer = CustomerService.create_customer()
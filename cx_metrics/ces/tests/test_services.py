@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+from django.core.management import call_command
 from django.test import TestCase
 from upkook_core.businesses.services import BusinessService
 from upkook_core.customers.services import CustomerService
 from upkook_core.industries.services import IndustryService
 
-from cx_metrics.ces.models import CESSurvey
+from cx_metrics.ces.models import CESSurvey, CESResponse
 from cx_metrics.ces.services.ces import CESService
 
 
@@ -70,3 +71,56 @@ class CESServiceTestCase(TestCase):
         self.assertEqual(response.rate, rate)
         self.assertEqual(response.customer_uuid, customer.uuid)
         self.assertEqual(response.survey_uuid, ces_survey.uuid)
+
+    def test_respond_rate_counts(self):
+        ces_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        CESService.respond(ces_survey, customer.uuid, 2)
+        CESService.respond(ces_survey, customer.uuid, 2)
+        CESService.respond(ces_survey, customer.uuid, 3)
+
+        ces_survey.refresh_from_db()
+        self.assertEqual(ces_survey.rates, [
+            {'rate': 1, 'count': 0},
+            {'rate': 2, 'count': 2},
+            {'rate': 3, 'count': 1},
+        ])
+
+    def test_respond_survey_not_found(self):
+        ces_survey = self._create_survey(self.id())
+        CESSurvey.objects.filter(pk=ces_survey.pk).delete()
+        customer = CustomerService.create_customer()
+
+        self.assertIsNone(CESService.respond(ces_survey, customer.uuid, 1))
+        self.assertFalse(CESResponse.objects.filter(survey_uuid=ces_survey.uuid).exists())
+
+    def test_bulk_respond(self):
+        ces_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        other = CustomerService.create_customer()
+        responses = CESService.bulk_respond(ces_survey, [(customer.uuid, 1, None), (other.uuid, 1, None)])
+
+        self.assertEqual([response.customer_uuid for response in responses], [customer.uuid, other.uuid])
+        ces_survey.refresh_from_db()
+        self.assertEqual(ces_survey.rate_1, 2)
+
+    def test_rebuild_rate_counts(self):
+        ces_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        CESService.respond(ces_survey, customer.uuid, 1)
+        CESService.respond(ces_survey, customer.uuid, 3)
+        CESSurvey.objects.filter(pk=ces_survey.pk).update(rate_1=10, rate_2=5, rate_3=0)
+
+        CESService.rebuild_rate_counts(ces_survey)
+        ces_survey.refresh_from_db()
+        self.assertEqual((ces_survey.rate_1, ces_survey.rate_2, ces_survey.rate_3), (1, 0, 1))
+
+    def test_rebuild_ces_counters_command(self):
+        ces_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        CESService.respond(ces_survey, customer.uuid, 2)
+        CESSurvey.objects.filter(pk=ces_survey.pk).update(rate_2=0)
+
+        call_command('rebuild_ces_counters', str(ces_survey.uuid))
+        ces_survey.refresh_from_db()
+        self.assertEqual(ces_survey.rate_2, 1)
@@ -10,6 +10,7 @@ from django.utils.encoding import force_text
 from mock import patch
 from rest_framework import status
 from upkook_core.auth.tests.client import AuthClient
+from upkook_core.customers.services import CustomerService
 from upkook_core.teams.services import MemberService
 from upkook_core.teams.tests import MemberPermissionTestMixin
 
@@ -17,7 +18,8 @@ from cx_metrics.ces.serializers import CESInsightSerializer
 from cx_metrics.multiple_choices.models import MultipleChoice
 from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
 from ..services import CESService
-from ..models import CESSurvey
+from ..models import CESSurvey, CESResponse
+from cx_metrics.tests.budgets import QueryBudgetTestMixin
 
 
 class CESViewTestBase(MemberPermissionTestMixin, TestCase):
@@ -179,7 +181,7 @@ class CESSurveyTestCase(CESViewTestBase):
         self.assertDictEqual(data, response_data)
 
 
-class CESResponseAPIViewTestCase(TestCase):
+class CESResponseAPIViewTestCase(QueryBudgetTestMixin, TestCase):
     fixtures = ['users', 'industries', 'businesses', 'ces']
 
     def test_get_survey_none(self):
@@ -209,8 +211,45 @@ class CESResponseAPIViewTestCase(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_post_query_budget(self):
+        survey = CESSurvey.objects.first()
+        data = {
+            "rate": 3,
+            "customer": {
+                "client_id": CustomerService.create_customer().client_id
+            }
+        }
+        url = reverse('cx-ces:responses-create', kwargs={'uuid': survey.uuid})
+        with self.assertQueryBudget('cx-ces:responses-create'):
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class CESBulkResponseAPIViewTestCase(TestCase):
+    fixtures = ['users', 'industries', 'businesses', 'ces']
 
-class CESInsightsViewTestCase(MemberPermissionTestMixin, TestCase):
+    def test_post(self):
+        ces = CESSurvey.objects.first()
+        customer = CustomerService.create_customer()
+        data = {
+            'responses': [
+                {'rate': 3, 'customer': {'client_id': customer.client_id}},
+                {'rate': 5, 'customer': {'client_id': customer.client_id}},
+            ]
+        }
+        url = reverse('cx-ces:responses-bulk-create', kwargs={'uuid': ces.uuid})
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        response_data = json.loads(force_text(response.content))
+        results = response_data['results']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(results[0], {'status': 201, 'data': {'rate': 3, 'client_id': customer.client_id}})
+        self.assertEqual(results[1]['status'], status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CESResponse.objects.filter(survey_uuid=ces.uuid).count(), 1)
+
+
+class CESInsightsViewTestCase(QueryBudgetTestMixin, MemberPermissionTestMixin, TestCase):
     fixtures = ['users', 'industries', 'businesses', 'teams', 'ces']
 
     def setUp(self):
@@ -234,6 +273,13 @@ class CESInsightsViewTestCase(MemberPermissionTestMixin, TestCase):
     def tearDown(self):
         self.remove_member_permissions(self.member, self.group)
 
+    def test_get_query_budget(self):
+        survey = CESSurvey.objects.first()
+        url = reverse('cx-ces:insights', kwargs={'uuid': str(survey.uuid)})
+        with self.assertQueryBudget('cx-ces:insights'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_get(self):
         ces = CESSurvey.objects.first()
         ces.refresh_from_db()
@@ -244,6 +290,7 @@ class CESInsightsViewTestCase(MemberPermissionTestMixin, TestCase):
             'id': str(ces.uuid),
             'name': ces.name,
             'scale': ces.scale,
+            'rates': ces.rates,
             'contra_options': ces.contra_response_option_texts
         }
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -281,6 +328,7 @@ class CESInsightsViewTestCase(MemberPermissionTestMixin, TestCase):
             'id': str(ces.uuid),
             'name': ces.name,
             'scale': ces.scale,
+            'rates': ces.rates,
             'contra_options': ces.contra_response_option_texts
         }
 
@@ -3,7 +3,10 @@
 
 from django.urls import path
 
-from cx_metrics.ces.views.api import CESAPIView, CESResponseAPIView, CESInsightsView
+from cx_metrics.ces.views.api import (
+    CESAPIView, CESResponseAPIView, CESBulkResponseAPIView, CESInsightsView, CESTimeseriesView,
+    CESResponseExportView, CESOptionResponsesView
+)
 
 app_name = 'ces'
 
@@ -11,5 +14,12 @@ urlpatterns = [
     path('', CESAPIView.as_view({'post': 'create'}), name='create'),
     path('<uuid:uuid>/', CESAPIView.as_view({'get': 'retrieve', 'put': 'update'}), name='detail'),
     path('<uuid:uuid>/responses/', CESResponseAPIView.as_view(), name='responses-create'),
-    path('<uuid:uuid>/insights/', CESInsightsView.as_view(), name='insights')
+    path('<uuid:uuid>/responses/export/', CESResponseExportView.as_view(), name='responses-export'),
+    path('<uuid:uuid>/responses/bulk/', CESBulkResponseAPIView.as_view(), name='responses-bulk-create'),
+    path('<uuid:uuid>/insights/', CESInsightsView.as_view(), name='insights'),
+    path('<uuid:uuid>/insights/timeseries/', CESTimeseriesView.as_view(), name='insights-timeseries'),
+    path(
+        '<uuid:uuid>/insights/options/responses/', CESOptionResponsesView.as_view(),
+        name='insights-option-responses'
+    ),
 ]
@@ -6,8 +6,15 @@ from rest_framework.filters import OrderingFilter
 from rest_framework.viewsets import ModelViewSet
 from upkook_core.auth.permissions import BusinessMemberPermissions
 
-from cx_metrics.surveys.views.api import SurveyResponseAPIView, SurveyInsightsView
-from ..serializers import CESSerializer, CESRespondSerializer, CESInsightSerializer
+from cx_metrics.surveys.views.api import (
+    SurveyResponseAPIView, SurveyInsightsView, SurveyBulkResponseMixin, SurveyTimeseriesView,
+    SurveyResponseExportView, SurveyOptionResponsesView,
+)
+from ..serializers import (
+    CESSerializer, CESRespondSerializer, CESInsightSerializer, CESResponseSerializer,
+    CESOptionResponsesQuerySerializer,
+)
+from ..models import CESResponse
 from ..services import CESService
 
 
@@ -39,12 +46,13 @@ class CESAPIView(ModelViewSet):
 @method_decorator(cache_control(private=True), name='post')
 @method_decorator(never_cache, name='post')
 class CESResponseAPIView(SurveyResponseAPIView):
+    survey_type = 'CES'
     serializer_class = CESRespondSerializer
     filter_backends = (OrderingFilter,)
     ordering = ('-updated',)
 
-    def get_survey(self):
-        return CESService.get_ces_survey_by_uuid(self.kwargs['uuid'])
+    def load_survey(self, survey_uuid):
+        return CESService.get_ces_survey_by_uuid(survey_uuid)
 
 
 @method_decorator(cache_control(private=True, max_age=1 * 60), name='get')  # 1 minute
@@ -57,3 +65,52 @@ class CESInsightsView(SurveyInsightsView):
 
     def get_queryset(self):
         return CESService.get_ces_surveys_by_business(self.request.user.business_id)
+
+
+@method_decorator(cache_control(private=True, max_age=1 * 60), name='get')  # 1 minute
+class CESTimeseriesView(SurveyTimeseriesView):
+    permission_classes = (
+        BusinessMemberPermissions('ces', 'cessurvey'),
+    )
+
+    def get_queryset(self):
+        return CESService.get_ces_surveys_by_business(self.request.user.business_id)
+
+
+@method_decorator(cache_control(private=True), name='post')
+@method_decorator(never_cache, name='post')
+class CESBulkResponseAPIView(SurveyBulkResponseMixin, CESResponseAPIView):
+    pass
+
+
+@method_decorator(cache_control(private=True), name='get')
+@method_decorator(never_cache, name='get')
+class CESResponseExportView(SurveyResponseExportView):
+    response_field_name = 'rate'
+    permission_classes = (
+        BusinessMemberPermissions('ces', 'cessurvey'),
+    )
+
+    def get_queryset(self):
+        return CESService.get_ces_surveys_by_business(self.request.user.business_id)
+
+    def get_responses(self, survey):
+        return CESResponse.objects.filter(survey_uuid=survey.uuid)
+
+
+@method_decorator(cache_control(private=True), name='get')
+@method_decorator(never_cache, name='get')
+class CESOptionResponsesView(SurveyOptionResponsesView):
+    serializer_class = CESResponseSerializer
+    query_serializer_class = CESOptionResponsesQuerySerializer
+    permission_classes = (
+        BusinessMemberPermissions('ces', 'cessurvey'),
+    )
+
+    def get_surveys(self):
+        return CESService.get_ces_surveys_by_business(self.request.user.business_id)
+
+    def filter_responses(self, responses, params):
+        if params.get('rate') is None:
+            return responses
+        return responses.filter(rate=params['rate'])
@@ -16,13 +16,18 @@ class CSATSurveyAdmin(SurveyAdminBase):
 
     exclude = ('survey', 'contra')
     readonly_fields = (
-        'author', 'uuid', 'created', 'updated', 'contra_question'
+        'author', 'uuid', 'created', 'updated', 'contra_question',
+        'rate_1', 'rate_2', 'rate_3', 'rate_4', 'rate_5', 'rate_6', 'rate_7'
     )
     fieldsets = (
         (None, {
             'fields': (
                 'uuid', 'name', 'business', 'updated', 'created', 'author', 'scale',)
         }),
+        (_('Responses'), {
+            'classes': ('collapse',),
+            'fields': ('rate_1', 'rate_2', 'rate_3', 'rate_4', 'rate_5', 'rate_6', 'rate_7')
+        }),
         (_('Advanced options'), {
             'classes': ('collapse',),
             'fields': ('text_enabled', 'text', 'question', 'contra_question', 'message')
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.management.base import BaseCommand
+
+from ...models import CSATSurvey
+from ...services import CSATService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily rollups of CSAT surveys from their responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('uuids', nargs='*', help='UUIDs of the surveys to backfill, all surveys if omitted')
+
+    def handle(self, *args, **options):
+        surveys = CSATSurvey.objects.order_by('id')
+        if options['uuids']:
+            surveys = surveys.filter(uuid__in=options['uuids'])
+
+        for survey in surveys.iterator():
+            rows = CSATService.backfill_rollups(survey)
+            if options['verbosity'] > 1:
+                self.stdout.write('Backfilled %d rollups of %s' % (rows, survey.uuid))
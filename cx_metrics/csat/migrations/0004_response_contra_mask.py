@@ -0,0 +1,18 @@
+# Generated by Django 2.2 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csat', '0003_rate_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csatresponse',
+            name='contra_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Contra Mask'),
+        ),
+    ]
@@ -8,11 +8,13 @@ from upkook_core.customers.services import CustomerService
 
 from cx_metrics.multiple_choices.models import MultipleChoice
 from cx_metrics.surveys.decorators import register_survey
-from cx_metrics.surveys.models import SurveyModel, SurveyResponseBase
+from cx_metrics.surveys.models import (
+    SurveyModel, SurveyRateCountersBase, SurveyResponseBase, response_lookup_indexes
+)
 
 
 @register_survey('CSAT')
-class CSATSurvey(SurveyModel):
+class CSATSurvey(SurveyModel, SurveyRateCountersBase):
     SCALE_1_TO_3 = '3'
     SCALE_1_TO_5 = '5'
     SCALE_1_TO_7 = '7'
@@ -31,6 +33,12 @@ class CSATSurvey(SurveyModel):
     )
     scale = models.CharField(_('Scale'), max_length=1, choices=SCALE_CHOICES, default=SCALE_1_TO_3)
 
+    SNAPSHOT_FIELDS = ('scale',)
+    LOAD_SELECT_RELATED = ('business', 'contra')
+    LOAD_PREFETCH_RELATED = ('contra__options',)
+    CLONE_FIELDS = ('text', 'text_enabled', 'question', 'message', 'scale')
+    RESPONSE_MODEL = 'csat.CSATResponse'
+
     class Meta:
         verbose_name = _('CSAT Survey')
         verbose_name_plural = _('CSAT Surveys')
@@ -42,9 +50,12 @@ class CSATSurvey(SurveyModel):
     @property
     def contra_response_option_texts(self):
         if self.contra:
-            return self.contra.option_texts.all()
+            return self.contra.option_texts.with_shard_counts().prefetch_related('cross_tabs')
         return []
 
+    def get_cross_tab_filters(self):
+        return self.get_rate_filters()
+
     def has_contra(self):
         return self.contra and self.contra.enabled
 
@@ -55,6 +66,7 @@ class CSATResponse(SurveyResponseBase):
     class Meta:
         verbose_name = _('CSAT Response')
         verbose_name_plural = _('CSAT Responses')
+        indexes = response_lookup_indexes('csat')
 
     @cached_property
     def customer(self):
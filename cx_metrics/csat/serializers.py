@@ -10,7 +10,6 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import empty
 from upkook_core.customers.serializers import CustomerSerializer
-from upkook_core.customers.services import CustomerService
 
 from cx_metrics.multiple_choices.serializers import (
     CachedMultipleChoiceSerializer,
@@ -18,10 +17,12 @@ from cx_metrics.multiple_choices.serializers import (
     MultipleChoiceRespondSerializer
 )
 from cx_metrics.surveys.decorators import register_survey_serializer
+from cx_metrics.surveys.factory import survey_factory
 from cx_metrics.surveys.models import Survey
+from cx_metrics.surveys.serializers import SurveyOptionResponsesQuerySerializer, SurveyRespondSerializerMixin
 from .models import CSATSurvey, CSATResponse
 from .services import CSATService
-from cx_metrics.surveys.services import SurveyInsightCacheService, SurveyService
+from cx_metrics.surveys.services import SurveyService
 
 
 @register_survey_serializer('CSAT')
@@ -32,7 +33,7 @@ class CSATSerializer(serializers.ModelSerializer):
 
     def __init__(self, instance=None, data=empty, **kwargs):
         if isinstance(instance, Survey):
-            instance = CSATService.get_csat_survey(survey_id=instance.id)
+            instance = survey_factory.load(instance)
         super(CSATSerializer, self).__init__(instance, data, **kwargs)
         contra = instance and instance.contra
         self.fields['contra_reason'] = CachedMultipleChoiceSerializer(source='contra', instance=contra)
@@ -52,7 +53,7 @@ class CSATSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         obj = instance
         if isinstance(instance, Survey):
-            obj = CSATService.get_csat_survey(survey_id=instance.id)
+            obj = survey_factory.load(instance)
             if obj is None:
                 raise Http404
         return super(CSATSerializer, self).to_representation(obj)
@@ -80,7 +81,17 @@ class CSATSerializer(serializers.ModelSerializer):
         return super(CSATSerializer, self).update(instance, v_data)
 
 
-class CSATRespondSerializer(serializers.ModelSerializer):
+class CSATResponseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CSATResponse
+        fields = ('id', 'customer_uuid', 'rate', 'created')
+
+
+class CSATOptionResponsesQuerySerializer(SurveyOptionResponsesQuerySerializer):
+    rate = serializers.IntegerField(min_value=1, max_value=CSATSurvey.MAX_RATE, required=False)
+
+
+class CSATRespondSerializer(SurveyRespondSerializerMixin, serializers.ModelSerializer):
     customer = CustomerSerializer()
     contra_options = serializers.ListField(child=serializers.IntegerField(), required=False)
 
@@ -92,7 +103,9 @@ class CSATRespondSerializer(serializers.ModelSerializer):
         c_kwargs = copy(kwargs)
         self.survey = c_kwargs.pop('survey')
         super(CSATRespondSerializer, self).__init__(instance, data, **c_kwargs)
-        self.fields["contra_options"] = MultipleChoiceRespondSerializer(mc_id=self.survey.contra_id, required=False)
+        self.fields["contra_options"] = MultipleChoiceRespondSerializer(
+            mc_id=self.survey.contra_id, contra=self.survey.contra, required=False
+        )
 
     def to_representation(self, instance):
         return {
@@ -122,45 +135,7 @@ class CSATRespondSerializer(serializers.ModelSerializer):
             raise ValidationError(_('Contra is required'))
         return attrs
 
-    def create(self, validated_data):
-        customer_data = validated_data.get('customer', {})
-
-        client_id = customer_data.get('client_id')
-        user_agent = validated_data.get('user_agent', None)
-
-        business = self.survey.business
-        if business.is_identified_by_email():
-            email = customer_data.get('email')
-            if not email:
-                raise ValidationError(_('Email is required'))
-            customer = CustomerService.identify_by_email(
-                business=self.survey.business, email=email, client_id=client_id, user_agent=user_agent
-            )
-        elif business.is_identified_by_mobile_number():
-            mobile_number = customer_data.get('mobile_number')
-            if not mobile_number:
-                raise ValidationError(_('Mobile number is required'))
-            customer = CustomerService.identify_by_mobile_number(
-                business=self.survey.business, mobile_number=mobile_number, client_id=client_id, user_agent=user_agent
-            )
-        elif business.is_identified_by_bizz_user_id():
-            bizz_user_id = customer_data.get('bizz_user_id')
-            if not bizz_user_id:
-                raise ValidationError(_('Business UserID is required'))
-            customer = CustomerService.identify_by_bizz_user_id(
-                business=self.survey.business, bizz_user_id=bizz_user_id, client_id=client_id, user_agent=user_agent
-            )
-        else:
-            customer = CustomerService.identify_anonymous(
-                business=self.survey.business, client_id=client_id
-            )
-        last_response = CSATService.get_last_response(customer)
-        if SurveyService.is_duplicate_response(last_response):
-            raise ValidationError(
-                {
-                    "non_field_errors": [_("You could not submit responses within specific time !")]
-                }
-            )
+    def respond(self, customer, validated_data):
         rate = validated_data['rate']
         contra_options = validated_data.get('contra_options')
 
@@ -171,9 +146,20 @@ class CSATRespondSerializer(serializers.ModelSerializer):
             contra_options_ids=contra_options
         )
 
-    def save(self, **kwargs):
-        SurveyInsightCacheService.delete(self.survey.type, self.survey.uuid)
-        return super(CSATRespondSerializer, self).save(**kwargs)
+    def get_last_response(self, customer):
+        return CSATService.get_last_response(customer, self.survey.uuid)
+
+    def get_recent_customer_uuids(self, customer_uuids):
+        return CSATService.get_recent_customer_uuids(
+            customer_uuids, SurveyService.get_duplicate_block_start(), self.survey.uuid
+        )
+
+    def bulk_respond(self, entries):
+        responses = [
+            (customer.uuid, validated_data['rate'], validated_data.get('contra_options'))
+            for customer, validated_data in entries
+        ]
+        return CSATService.bulk_respond(self.survey, responses)
 
 
 class CSATInsightSerializer(serializers.ModelSerializer):
@@ -182,4 +168,4 @@ class CSATInsightSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CSATSurvey
-        fields = ('id', 'name', 'scale', 'contra_options')
+        fields = ('id', 'name', 'scale', 'rates', 'contra_options')
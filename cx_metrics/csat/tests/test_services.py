@@ -1,10 +1,16 @@
-from django.test import TestCase
+import json
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from upkook_core.businesses.services import BusinessService
 from upkook_core.customers.services import CustomerService
 from upkook_core.industries.services import IndustryService
 
-from cx_metrics.csat.models import CSATSurvey
+from cx_metrics.csat.models import CSATSurvey, CSATResponse
+from cx_metrics.csat.serializers import CSATInsightSerializer
 from cx_metrics.csat.services.csat import CSATService
+from cx_metrics.surveys.services import SurveyInsightCacheService
 
 
 class CSATServiceTestCase(TestCase):
@@ -68,3 +74,81 @@ class CSATServiceTestCase(TestCase):
         self.assertEqual(response.rate, rate)
         self.assertEqual(response.customer_uuid, customer.uuid)
         self.assertEqual(response.survey_uuid, csat_survey.uuid)
+
+    def test_respond_rate_counts(self):
+        csat_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        CSATService.respond(csat_survey, customer.uuid, 2)
+        CSATService.respond(csat_survey, customer.uuid, 2)
+        CSATService.respond(csat_survey, customer.uuid, 3)
+
+        csat_survey.refresh_from_db()
+        self.assertEqual(csat_survey.rates, [
+            {'rate': 1, 'count': 0},
+            {'rate': 2, 'count': 2},
+            {'rate': 3, 'count': 1},
+        ])
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'csat-insights',
+            }
+        }
+    )
+    def test_respond_updates_cached_insights(self):
+        cache.clear()
+        csat_survey = CSATSurvey.objects.first()
+        SurveyInsightCacheService.set('CSAT', csat_survey.uuid, CSATInsightSerializer(csat_survey).data)
+
+        CSATService.respond(csat_survey, CustomerService.create_customer().uuid, 2, [1])
+        CSATService.bulk_respond(csat_survey, [
+            (CustomerService.create_customer().uuid, 3, [2]),
+            (CustomerService.create_customer().uuid, 3, None),
+        ])
+
+        expected = CSATInsightSerializer(CSATSurvey.objects.get(pk=csat_survey.pk)).data
+        self.assertEqual(
+            json.loads(json.dumps(SurveyInsightCacheService.get('CSAT', csat_survey.uuid))),
+            json.loads(json.dumps(expected)),
+        )
+
+    def test_respond_survey_not_found(self):
+        csat_survey = self._create_survey(self.id())
+        CSATSurvey.objects.filter(pk=csat_survey.pk).delete()
+        customer = CustomerService.create_customer()
+
+        self.assertIsNone(CSATService.respond(csat_survey, customer.uuid, 1))
+        self.assertFalse(CSATResponse.objects.filter(survey_uuid=csat_survey.uuid).exists())
+
+    def test_bulk_respond(self):
+        csat_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        other = CustomerService.create_customer()
+        responses = CSATService.bulk_respond(csat_survey, [(customer.uuid, 1, None), (other.uuid, 1, None)])
+
+        self.assertEqual([response.customer_uuid for response in responses], [customer.uuid, other.uuid])
+        csat_survey.refresh_from_db()
+        self.assertEqual(csat_survey.rate_1, 2)
+
+    def test_rebuild_rate_counts(self):
+        csat_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        CSATService.respond(csat_survey, customer.uuid, 1)
+        CSATService.respond(csat_survey, customer.uuid, 3)
+        CSATSurvey.objects.filter(pk=csat_survey.pk).update(rate_1=10, rate_2=5, rate_3=0)
+
+        CSATService.rebuild_rate_counts(csat_survey)
+        csat_survey.refresh_from_db()
+        self.assertEqual((csat_survey.rate_1, csat_survey.rate_2, csat_survey.rate_3), (1, 0, 1))
+
+    def test_rebuild_csat_counters_command(self):
+        csat_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        CSATService.respond(csat_survey, customer.uuid, 2)
+        CSATSurvey.objects.filter(pk=csat_survey.pk).update(rate_2=0)
+
+        call_command('rebuild_csat_counters', str(csat_survey.uuid))
+        csat_survey.refresh_from_db()
+        self.assertEqual(csat_survey.rate_2, 1)
@@ -10,15 +10,18 @@ from mock import patch
 from django.utils.encoding import force_text
 from rest_framework import status
 from upkook_core.auth.tests.client import AuthClient
+from upkook_core.customers.services import CustomerService
 from upkook_core.teams.services import MemberService
 from upkook_core.teams.tests import MemberPermissionTestMixin
 
 from cx_metrics.csat.serializers import CSATInsightSerializer
 from cx_metrics.multiple_choices.models import MultipleChoice
 from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
+from cx_metrics.csat.models import CSATResponse
 from ..services.csat import CSATSurvey
 
 from cx_metrics.csat.services.csat import CSATService
+from cx_metrics.tests.budgets import QueryBudgetTestMixin
 
 
 class CSATViewTestBase(MemberPermissionTestMixin, TestCase):
@@ -180,7 +183,7 @@ class CSATSurveyTestCase(CSATViewTestBase):
         self.assertDictEqual(data, response_data)
 
 
-class CSATResponseAPIViewTestCase(TestCase):
+class CSATResponseAPIViewTestCase(QueryBudgetTestMixin, TestCase):
     fixtures = ['users', 'industries', 'businesses', 'csat']
 
     def test_get_survey_none(self):
@@ -210,8 +213,45 @@ class CSATResponseAPIViewTestCase(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_post_query_budget(self):
+        survey = CSATSurvey.objects.first()
+        data = {
+            "rate": 3,
+            "customer": {
+                "client_id": CustomerService.create_customer().client_id
+            }
+        }
+        url = reverse('cx-csat:responses-create', kwargs={'uuid': survey.uuid})
+        with self.assertQueryBudget('cx-csat:responses-create'):
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class CSATBulkResponseAPIViewTestCase(TestCase):
+    fixtures = ['users', 'industries', 'businesses', 'csat']
 
-class CSATInsightsViewTestCase(MemberPermissionTestMixin, TestCase):
+    def test_post(self):
+        csat = CSATSurvey.objects.first()
+        customer = CustomerService.create_customer()
+        data = {
+            'responses': [
+                {'rate': 3, 'customer': {'client_id': customer.client_id}},
+                {'rate': 5, 'customer': {'client_id': customer.client_id}},
+            ]
+        }
+        url = reverse('cx-csat:responses-bulk-create', kwargs={'uuid': csat.uuid})
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        response_data = json.loads(force_text(response.content))
+        results = response_data['results']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(results[0], {'status': 201, 'data': {'rate': 3, 'client_id': customer.client_id}})
+        self.assertEqual(results[1]['status'], status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CSATResponse.objects.filter(survey_uuid=csat.uuid).count(), 1)
+
+
+class CSATInsightsViewTestCase(QueryBudgetTestMixin, MemberPermissionTestMixin, TestCase):
     fixtures = ['users', 'industries', 'businesses', 'teams', 'csat']
 
     def setUp(self):
@@ -235,6 +275,13 @@ class CSATInsightsViewTestCase(MemberPermissionTestMixin, TestCase):
     def tearDown(self):
         self.remove_member_permissions(self.member, self.group)
 
+    def test_get_query_budget(self):
+        survey = CSATSurvey.objects.first()
+        url = reverse('cx-csat:insights', kwargs={'uuid': str(survey.uuid)})
+        with self.assertQueryBudget('cx-csat:insights'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_get(self):
         csat = CSATSurvey.objects.first()
         csat.refresh_from_db()
@@ -245,6 +292,7 @@ class CSATInsightsViewTestCase(MemberPermissionTestMixin, TestCase):
             'id': str(csat.uuid),
             'name': csat.name,
             'scale': csat.scale,
+            'rates': csat.rates,
             'contra_options': csat.contra_response_option_texts
         }
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -282,6 +330,7 @@ class CSATInsightsViewTestCase(MemberPermissionTestMixin, TestCase):
             'id': str(csat.uuid),
             'name': csat.name,
             'scale': csat.scale,
+            'rates': csat.rates,
             'contra_options': csat.contra_response_option_texts
         }
 
@@ -3,7 +3,10 @@
 
 from django.urls import path
 
-from cx_metrics.csat.views.api import CSATAPIView, CSATResponseAPIView, CSATInsightsView
+from cx_metrics.csat.views.api import (
+    CSATAPIView, CSATResponseAPIView, CSATBulkResponseAPIView, CSATInsightsView, CSATTimeseriesView,
+    CSATResponseExportView, CSATOptionResponsesView
+)
 
 app_name = 'csat'
 
@@ -11,5 +14,12 @@ urlpatterns = [
     path('', CSATAPIView.as_view({'post': 'create'}), name='create'),
     path('<uuid:uuid>/', CSATAPIView.as_view({'get': 'retrieve', 'put': 'update'}), name='detail'),
     path('<uuid:uuid>/responses/', CSATResponseAPIView.as_view(), name='responses-create'),
-    path('<uuid:uuid>/insights/', CSATInsightsView.as_view(), name='insights')
+    path('<uuid:uuid>/responses/export/', CSATResponseExportView.as_view(), name='responses-export'),
+    path('<uuid:uuid>/responses/bulk/', CSATBulkResponseAPIView.as_view(), name='responses-bulk-create'),
+    path('<uuid:uuid>/insights/', CSATInsightsView.as_view(), name='insights'),
+    path('<uuid:uuid>/insights/timeseries/', CSATTimeseriesView.as_view(), name='insights-timeseries'),
+    path(
+        '<uuid:uuid>/insights/options/responses/', CSATOptionResponsesView.as_view(),
+        name='insights-option-responses'
+    ),
 ]
@@ -6,8 +6,15 @@ from rest_framework.filters import OrderingFilter
 from rest_framework.viewsets import ModelViewSet
 from upkook_core.auth.permissions import BusinessMemberPermissions
 
-from cx_metrics.csat.serializers import CSATSerializer, CSATRespondSerializer, CSATInsightSerializer
-from cx_metrics.surveys.views.api import SurveyResponseAPIView, SurveyInsightsView
+from cx_metrics.csat.serializers import (
+    CSATSerializer, CSATRespondSerializer, CSATInsightSerializer, CSATResponseSerializer,
+    CSATOptionResponsesQuerySerializer,
+)
+from cx_metrics.surveys.views.api import (
+    SurveyResponseAPIView, SurveyInsightsView, SurveyBulkResponseMixin, SurveyTimeseriesView,
+    SurveyResponseExportView, SurveyOptionResponsesView,
+)
+from ..models import CSATResponse
 from ..services.csat import CSATService
 
 
@@ -39,12 +46,13 @@ class CSATAPIView(ModelViewSet):
 @method_decorator(cache_control(private=True), name='post')
 @method_decorator(never_cache, name='post')
 class CSATResponseAPIView(SurveyResponseAPIView):
+    survey_type = 'CSAT'
     serializer_class = CSATRespondSerializer
     filter_backends = (OrderingFilter,)
     ordering = ('-updated',)
 
-    def get_survey(self):
-        return CSATService.get_csat_survey_by_uuid(self.kwargs['uuid'])
+    def load_survey(self, survey_uuid):
+        return CSATService.get_csat_survey_by_uuid(survey_uuid)
 
 
 @method_decorator(cache_control(private=True, max_age=1 * 60), name='get')  # 1 minute
@@ -57,3 +65,52 @@ class CSATInsightsView(SurveyInsightsView):
 
     def get_queryset(self):
         return CSATService.get_csat_surveys_by_business(self.request.user.business_id)
+
+
+@method_decorator(cache_control(private=True, max_age=1 * 60), name='get')  # 1 minute
+class CSATTimeseriesView(SurveyTimeseriesView):
+    permission_classes = (
+        BusinessMemberPermissions('csat', 'csatsurvey'),
+    )
+
+    def get_queryset(self):
+        return CSATService.get_csat_surveys_by_business(self.request.user.business_id)
+
+
+@method_decorator(cache_control(private=True), name='post')
+@method_decorator(never_cache, name='post')
+class CSATBulkResponseAPIView(SurveyBulkResponseMixin, CSATResponseAPIView):
+    pass
+
+
+@method_decorator(cache_control(private=True), name='get')
+@method_decorator(never_cache, name='get')
+class CSATResponseExportView(SurveyResponseExportView):
+    response_field_name = 'rate'
+    permission_classes = (
+        BusinessMemberPermissions('csat', 'csatsurvey'),
+    )
+
+    def get_queryset(self):
+        return CSATService.get_csat_surveys_by_business(self.request.user.business_id)
+
+    def get_responses(self, survey):
+        return CSATResponse.objects.filter(survey_uuid=survey.uuid)
+
+
+@method_decorator(cache_control(private=True), name='get')
+@method_decorator(never_cache, name='get')
+class CSATOptionResponsesView(SurveyOptionResponsesView):
+    serializer_class = CSATResponseSerializer
+    query_serializer_class = CSATOptionResponsesQuerySerializer
+    permission_classes = (
+        BusinessMemberPermissions('csat', 'csatsurvey'),
+    )
+
+    def get_surveys(self):
+        return CSATService.get_csat_surveys_by_business(self.request.user.business_id)
+
+    def filter_responses(self, responses, params):
+        if params.get('rate') is None:
+            return responses
+        return responses.filter(rate=params['rate'])
@@ -37,3 +37,4 @@ class MultipleChoiceAdmin(admin.ModelAdmin):
         super(MultipleChoiceAdmin, self).save_related(request, form, formsets, change)
         representation = self.to_representation(self.saved_obj)
         MultipleChoiceService.cache_representation(self.saved_obj.id, representation)
+        MultipleChoiceService.invalidate_local_representation(self.saved_obj.id)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import OptionText
+from ...services import OptionResponseService
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the counts of option texts from their responses, '
+        'or only report drifted counts with --check'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true', dest='check',
+            help='Compare the counts with the responses without changing them',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, dest='batch_size')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        option_texts = OptionText.objects.order_by('id')
+
+        drifted = 0
+        last_id = 0
+        while True:
+            batch = list(option_texts.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for option_text, count, responses in OptionResponseService.get_drifted_option_texts(batch):
+                drifted += 1
+                if options['check']:
+                    self.stdout.write(
+                        '%s (%d): count %d, responses %d' % (option_text, option_text.id, count, responses)
+                    )
+                else:
+                    OptionResponseService.rebuild_option_text_count(option_text)
+                    if options['verbosity'] > 1:
+                        self.stdout.write('Rebuilt %s (%d)' % (option_text, option_text.id))
+
+        if options['check'] and drifted:
+            raise CommandError('%d option texts have drifted counts' % drifted)
@@ -0,0 +1,28 @@
+# Generated by Django 2.2 on 2026-10-17 11:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multiple_choices', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptionTextCounterShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='Shard')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Count')),
+                ('option_text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='multiple_choices.OptionText', verbose_name='Option Text')),
+            ],
+            options={
+                'verbose_name': 'Option Text Counter Shard',
+                'verbose_name_plural': 'Option Text Counter Shards',
+                'unique_together': {('option_text', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.2 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+MAX_BIT = 62
+
+# Only the options of checkbox and multi select questions are stored in masks
+MASK_TYPES = ('C', 'M')
+
+
+def assign_option_bits(apps, schema_editor):
+    MultipleChoice = apps.get_model('multiple_choices', 'MultipleChoice')
+    Option = apps.get_model('multiple_choices', 'Option')
+
+    ids = {}
+    bits = {}
+    options = Option.objects.filter(multiple_choice__type__in=MASK_TYPES).order_by('multiple_choice_id', 'id')
+    options = options.values_list('id', 'multiple_choice_id')
+    for option_id, multiple_choice_id in options.iterator():
+        bit = bits.get(multiple_choice_id, -1) + 1
+        bits[multiple_choice_id] = bit
+        if bit <= MAX_BIT:
+            ids.setdefault(bit, []).append(option_id)
+
+    for bit, option_ids in ids.items():
+        for start in range(0, len(option_ids), 1000):
+            Option.objects.filter(id__in=option_ids[start:start + 1000]).update(bit=bit)
+
+    multiple_choice_ids = {}
+    for multiple_choice_id, bit in bits.items():
+        multiple_choice_ids.setdefault(min(bit + 1, MAX_BIT + 1), []).append(multiple_choice_id)
+    for next_bit, multiple_choice_ids in multiple_choice_ids.items():
+        for start in range(0, len(multiple_choice_ids), 1000):
+            MultipleChoice.objects.filter(id__in=multiple_choice_ids[start:start + 1000]).update(next_bit=next_bit)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multiple_choices', '0002_optiontextcountershard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='multiplechoice',
+            name='next_bit',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Bit of the next option, bits of deleted options are not reused', verbose_name='Next Bit'),
+        ),
+        migrations.AddField(
+            model_name='option',
+            name='bit',
+            field=models.PositiveSmallIntegerField(default=None, editable=False, help_text='Position of the option in the contra mask of responses', null=True, verbose_name='Bit'),
+        ),
+        migrations.RunPython(assign_option_bits, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='option',
+            unique_together={('multiple_choice', 'text'), ('multiple_choice', 'bit')},
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2 on 2026-10-17 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('multiple_choices', '0003_option_bit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optionresponse',
+            name='response_id',
+            field=models.PositiveIntegerField(default=None, editable=False, null=True, verbose_name='Response ID'),
+        ),
+        migrations.AddField(
+            model_name='optionresponse',
+            name='response_type',
+            field=models.ForeignKey(default=None, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='contenttypes.ContentType', verbose_name='Response Type'),
+        ),
+        migrations.AddIndex(
+            model_name='optionresponse',
+            index=models.Index(fields=['option_text', 'created'], name='option_response_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='optionresponse',
+            index=models.Index(fields=['response_type', 'response_id'], name='option_response_response_idx'),
+        ),
+    ]
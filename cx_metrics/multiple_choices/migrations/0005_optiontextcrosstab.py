@@ -0,0 +1,28 @@
+# Generated by Django 2.2 on 2026-10-17 17:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multiple_choices', '0004_option_response_response'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptionTextCrossTab',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=16, verbose_name='Key')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Count')),
+                ('option_text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cross_tabs', to='multiple_choices.OptionText', verbose_name='Option Text')),
+            ],
+            options={
+                'verbose_name': 'Option Text Cross Tab',
+                'verbose_name_plural': 'Option Text Cross Tabs',
+                'unique_together': {('option_text', 'key')},
+            },
+        ),
+    ]
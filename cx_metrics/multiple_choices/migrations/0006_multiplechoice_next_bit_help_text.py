@@ -0,0 +1,18 @@
+# Generated by Django 2.2 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multiple_choices', '0005_optiontextcrosstab'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='multiplechoice',
+            name='next_bit',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Bit of the next option, bits of deleted options are reused once all bits were used', verbose_name='Next Bit'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2 on 2026-10-17 22:30
+
+from django.db import migrations
+
+# Only the options of checkbox and multi select questions are stored in masks
+MASK_TYPES = ('C', 'M')
+
+
+def clear_single_answer_option_bits(apps, schema_editor):
+    MultipleChoice = apps.get_model('multiple_choices', 'MultipleChoice')
+    Option = apps.get_model('multiple_choices', 'Option')
+
+    Option.objects.exclude(multiple_choice__type__in=MASK_TYPES).exclude(bit=None).update(bit=None)
+    MultipleChoice.objects.exclude(type__in=MASK_TYPES).exclude(next_bit=0).update(next_bit=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multiple_choices', '0006_multiplechoice_next_bit_help_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_single_answer_option_bits, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
-from django.db import models
+from django.conf import settings
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 
 from cx_metrics.questions.models import Question
@@ -21,6 +27,13 @@ class MultipleChoice(Question):
 
     type = models.CharField(_('Type'), max_length=1, choices=TYPE_CHOICES, default=TYPE_RADIO)
     other_enabled = models.BooleanField(_('Is Other Option Enabled'), default=False)
+    next_bit = models.PositiveSmallIntegerField(
+        _('Next Bit'), default=0, editable=False,
+        help_text=_('Bit of the next option, bits of deleted options are reused once all bits were used')
+    )
+
+    # Types whose responses may store their chosen options in a contra_mask
+    MASK_TYPES = (TYPE_CHECKBOX, TYPE_MULTI_SELECT)
 
     class Meta:
         abstract = False
@@ -42,6 +55,88 @@ class MultipleChoice(Question):
     def one_option_accept_type(self):
         return self.type == "R" or self.type == "S"
 
+    def uses_mask(self):
+        """
+        Whether the options chosen with responses are stored in their
+        contra_mask, see SURVEY_CONTRA_MASK_STORAGE. Only these options get bits.
+        """
+        return bool(settings.SURVEY_CONTRA_MASK_STORAGE) and self.type in self.MASK_TYPES
+
+    def get_contra_survey(self):
+        """
+        Return the survey the multiple choice is the contra question of, None
+        if there is none.
+        """
+        # Imported here, the survey models depend on the multiple choice models
+        from cx_metrics.surveys.models import SurveyModel
+
+        for related_object in self._meta.related_objects:
+            if not related_object.one_to_one or not issubclass(related_object.related_model, SurveyModel):
+                continue
+            try:
+                return getattr(self, related_object.get_accessor_name())
+            except ObjectDoesNotExist:
+                continue
+        return None
+
+    def get_used_bits(self):
+        """
+        Return the bits of the options and the bits set in the contra_mask of
+        a response of the contra survey, with one aggregate query for the
+        responses.
+        """
+        used = set(self.options.exclude(bit=None).values_list('bit', flat=True))
+        survey = self.get_contra_survey()
+        free = [bit for bit in range(Option.MAX_BIT + 1) if bit not in used]
+        if survey is not None and free:
+            maxes = {'bit_%d' % bit: models.Max(models.F('contra_mask').bitand(1 << bit)) for bit in free}
+            values = survey.responses.exclude(contra_mask=0).aggregate(**maxes)
+            used.update(bit for bit in free if values['bit_%d' % bit])
+        return used
+
+    @cached_property
+    def option_ids(self):
+        return frozenset(self.option_bits)
+
+    @cached_property
+    def option_bits(self):
+        """
+        {option id: bit} of the options, the bit is None for options without one
+        """
+        return dict(self.options.values_list('id', 'bit'))
+
+    def get_next_bits(self, count):
+        """
+        Reserve the bits of count new options and return them, None for the
+        ones no bit is left for. Once next_bit passes Option.MAX_BIT the bits
+        of deleted options are reused, unless a response still has them set,
+        see get_used_bits(). Call it in the transaction saving the options,
+        the multiple choice stays locked until it ends.
+        """
+        with transaction.atomic():
+            start = MultipleChoice.objects.select_for_update().values_list('next_bit', flat=True).get(pk=self.pk)
+            end = min(start + count, Option.MAX_BIT + 1)
+            if end != start:
+                MultipleChoice.objects.filter(pk=self.pk).update(next_bit=end)
+            bits = list(range(start, end))
+            if len(bits) < count:
+                used = self.get_used_bits()
+                bits.extend([bit for bit in range(start) if bit not in used][:count - len(bits)])
+        self.next_bit = end
+        return bits + [None] * (count - len(bits))
+
+    def get_mask(self, option_ids):
+        """
+        Return the bitset of the given options, None if one of them has no bit
+        """
+        mask = 0
+        for option_id in option_ids:
+            bit = self.option_bits.get(option_id)
+            if bit is None:
+                return None
+            mask |= 1 << bit
+        return mask
+
 
 class Option(models.Model):
     multiple_choice = models.ForeignKey(
@@ -51,20 +146,36 @@ class Option(models.Model):
     text = models.CharField(_('Text'), max_length=256)
     enabled = models.BooleanField(_('Is Enabled'), default=True)
     order = models.PositiveSmallIntegerField(_('Order'), default=0, db_index=True)
+    bit = models.PositiveSmallIntegerField(
+        _('Bit'), null=True, default=None, editable=False,
+        help_text=_('Position of the option in the contra mask of responses')
+    )
     created = models.DateTimeField(_('Created at'), auto_now_add=True)
     updated = models.DateTimeField(_('Updated at'), auto_now=True)
 
+    # contra_mask is a signed 64 bit integer
+    MAX_BIT = 62
+
     class Meta:
         verbose_name = _('Option')
         verbose_name_plural = _('Options')
         unique_together = (
             ('multiple_choice', 'text'),
+            ('multiple_choice', 'bit'),
         )
         ordering = ('order',)
 
     def __str__(self):
         return self.text
 
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if not self._state.adding or self.bit is not None or not self.multiple_choice.uses_mask():
+            return super(Option, self).save(force_insert, force_update, using, update_fields)
+
+        with transaction.atomic():
+            self.bit = self.multiple_choice.get_next_bits(1)[0]
+            super(Option, self).save(force_insert, force_update, using, update_fields)
+
     # FIXME: Implement a seperate API for deleting an option
     def delete_option(self, value):
         if value:
@@ -72,6 +183,11 @@ class Option(models.Model):
         return False
 
 
+class OptionTextQuerySet(models.QuerySet):
+    def with_shard_counts(self):
+        return self.annotate(shard_count=Coalesce(models.Sum('counter_shards__count'), 0))
+
+
 class OptionText(models.Model):
     multiple_choice = models.ForeignKey(
         MultipleChoice, verbose_name=_('Multiple Choice'),
@@ -81,6 +197,8 @@ class OptionText(models.Model):
     count = models.PositiveIntegerField(_('Count'), default=0)
     created = models.DateTimeField(_('Created at'), auto_now_add=True)
 
+    objects = OptionTextQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Option Text')
         verbose_name_plural = _('Option Texts')
@@ -89,6 +207,57 @@ class OptionText(models.Model):
     def __str__(self):
         return self.text
 
+    @property
+    def total_count(self):
+        """
+        Count including the counter shards, annotated by with_shard_counts()
+        or queried otherwise.
+        """
+        shard_count = getattr(self, 'shard_count', None)
+        if shard_count is None:
+            shard_count = self.counter_shards.aggregate(total=models.Sum('count'))['total'] or 0
+        return self.count + shard_count
+
+    @property
+    def breakdown(self):
+        """
+        {key: count} cross tab counts, prefetch cross_tabs to read them
+        without a query per option text.
+        """
+        return {cross_tab.key: cross_tab.count for cross_tab in self.cross_tabs.all()}
+
+
+class OptionTextCounterShard(models.Model):
+    option_text = models.ForeignKey(
+        OptionText, verbose_name=_('Option Text'),
+        related_name='counter_shards', on_delete=models.CASCADE
+    )
+    shard = models.PositiveSmallIntegerField(_('Shard'))
+    count = models.BigIntegerField(_('Count'), default=0)
+
+    class Meta:
+        verbose_name = _('Option Text Counter Shard')
+        verbose_name_plural = _('Option Text Counter Shards')
+        unique_together = ('option_text', 'shard')
+
+
+class OptionTextCrossTab(models.Model):
+    """
+    Number of responses of one group of the survey, e.g. NPS detractors or
+    a CSAT rate, that chose the option text.
+    """
+    option_text = models.ForeignKey(
+        OptionText, verbose_name=_('Option Text'),
+        related_name='cross_tabs', on_delete=models.CASCADE
+    )
+    key = models.CharField(_('Key'), max_length=16)
+    count = models.BigIntegerField(_('Count'), default=0)
+
+    class Meta:
+        verbose_name = _('Option Text Cross Tab')
+        verbose_name_plural = _('Option Text Cross Tabs')
+        unique_together = ('option_text', 'key')
+
 
 class OptionResponse(models.Model):
     option_text = models.ForeignKey(
@@ -96,12 +265,24 @@ class OptionResponse(models.Model):
         related_name='option_response', on_delete=models.PROTECT
     )
     customer_uuid = models.UUIDField(_('Customer UUID'), editable=False)
+    # The NPS, CSAT or CES response the option was chosen with, None for
+    # option responses stored before they were linked
+    response_type = models.ForeignKey(
+        ContentType, verbose_name=_('Response Type'), null=True, default=None, editable=False,
+        related_name='+', on_delete=models.PROTECT
+    )
+    response_id = models.PositiveIntegerField(_('Response ID'), null=True, default=None, editable=False)
+    response = GenericForeignKey('response_type', 'response_id')
     updated = models.DateTimeField(_('Updated at'), auto_now=True)
     created = models.DateTimeField(_('Created at'), auto_now_add=True)
 
     class Meta:
         verbose_name = _('Option Response')
         verbose_name_plural = _('Option Responses')
+        indexes = [
+            models.Index(fields=['option_text', 'created'], name='option_response_created_idx'),
+            models.Index(fields=['response_type', 'response_id'], name='option_response_response_idx'),
+        ]
 
     def __str__(self):
         return str(self.option_text)
@@ -32,7 +32,9 @@ class MultipleChoiceRespondSerializer(serializers.ListSerializer):
         default_kwargs = {'child': serializers.IntegerField()}
         default_kwargs.update(**kwargs)
         contra_id = default_kwargs.pop("mc_id", None)
-        self.contra = MultipleChoiceService.get_by_id(contra_id)
+        self.contra = default_kwargs.pop("contra", None)
+        if self.contra is None:
+            self.contra = MultipleChoiceService.get_by_id(contra_id)
         super(MultipleChoiceRespondSerializer, self).__init__(**default_kwargs)
 
     def validate(self, value):
@@ -47,9 +49,8 @@ class MultipleChoiceRespondSerializer(serializers.ListSerializer):
             if len(value) > 1 and self.contra.one_option_accept_type():
                 raise ValidationError(_("Only 1 option can be chosen !"))
 
-            for option_id in value:
-                if not self.contra.options.filter(id=option_id).exists():
-                    raise ValidationError(_("Contra option and Survey not related!"))
+            if not self.contra.option_ids.issuperset(value):
+                raise ValidationError(_("Contra option and Survey not related!"))
 
         return value
 
@@ -61,10 +62,21 @@ class MultipleChoiceSerializer(serializers.ModelSerializer):
         model = MultipleChoice
         fields = ('type', 'text', 'enabled', 'required', 'other_enabled', 'options')
 
+    def get_existing_options(self):
+        """
+        Options of the instance by id, loaded once per serializer
+        """
+        if self.instance is None:
+            return {}
+        if not hasattr(self, '_existing_options'):
+            self._existing_options = MultipleChoiceService.get_options_by_id(self.instance)
+        return self._existing_options
+
     def validate_options(self, options):
+        existing_options = self.get_existing_options()
         for option in options:
             option_id = option.get('id')
-            if option_id and not (self.instance and MultipleChoiceService.option_exists(self.instance, option_id)):
+            if option_id and option_id not in existing_options:
                 raise ValidationError(_('Option %(id)s does not exists') % {'id': option_id})
 
         orders = [option.get('order') for option in options]
@@ -98,31 +110,35 @@ class MultipleChoiceSerializer(serializers.ModelSerializer):
         instance = super(MultipleChoiceSerializer, self).update(instance, v_data)
 
         options = []
+        deleted_option_ids = []
         for option in raw_options:
             delete_option = option.get('delete_option', False)
             option_id = option.get('id', None)
             if delete_option and option_id:
-                MultipleChoiceService.delete_option(instance, option_id)
+                deleted_option_ids.append(option_id)
             else:
                 options.append(option)
             option.pop('delete_option', None)
 
-        MultipleChoiceService.update_options(instance, options)
+        existing_options = self.get_existing_options() if instance is self.instance else None
+        MultipleChoiceService.delete_options(instance, deleted_option_ids)
+        MultipleChoiceService.update_options(instance, options, existing_options)
         serializer = MultipleChoiceSerializer(instance)
         representation = serializer.to_representation(instance)
         MultipleChoiceService.cache_representation(instance.id, representation)
+        MultipleChoiceService.invalidate_local_representation(instance.id)
         return instance
 
     def validate(self, attrs):
         enabled = attrs.get('enabled', True)
         options = attrs.get('options', [])
 
-        if self.instance:
-            for option in options:
-                text = option.get('text')
-                option_id = option.get('id')
-                if MultipleChoiceService.option_text_exists(self.instance, text, option_id):
-                    raise ValidationError(_('You should not have duplicate option texts'))
+        existing_options = self.get_existing_options()
+        for option in options:
+            text = option.get('text')
+            option_id = option.get('id')
+            if any(o.text == text and o.id != option_id for o in existing_options.values()):
+                raise ValidationError(_('You should not have duplicate option texts'))
 
         if enabled and sum(
                 [1 for option in options if option.get('enabled', True) and not option.get('delete_option')]) < 2:
@@ -132,16 +148,29 @@ class MultipleChoiceSerializer(serializers.ModelSerializer):
 
 
 class CachedMultipleChoiceSerializer(MultipleChoiceSerializer):
+    """
+    Caches the representation in the namespace of the business of the
+    survey serialized by the parent serializer, if any.
+    """
+
+    def get_business_id(self):
+        parent_instance = getattr(self.parent, 'instance', None)
+        return getattr(parent_instance, 'business_id', None)
+
     def to_representation(self, instance):
-        representation = MultipleChoiceService.representation_from_cache(instance.id)
+        business_id = self.get_business_id()
+        representation = MultipleChoiceService.representation_from_cache(instance.id, business_id)
 
         if not representation:
             representation = super(CachedMultipleChoiceSerializer, self).to_representation(instance)
-            MultipleChoiceService.cache_representation(instance.id, representation)
+            MultipleChoiceService.cache_representation(instance.id, representation, business_id)
         return representation
 
 
 class OptionTextSerializer(serializers.ModelSerializer):
+    count = serializers.IntegerField(source='total_count', read_only=True)
+    breakdown = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
     class Meta:
         model = OptionText
-        fields = ('text', 'count')
+        fields = ('text', 'count', 'breakdown')
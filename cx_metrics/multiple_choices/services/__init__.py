@@ -1,3 +1,3 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
-from .multiple_choice import MultipleChoiceService  # NOQA
+from .multiple_choice import MultipleChoiceService, OptionResponseService  # NOQA
@@ -1,15 +1,29 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+from collections import Counter
+from itertools import chain
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
-from django.db import IntegrityError
-from django.db.models import F
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, QuerySet, Sum
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from rest_framework.exceptions import ValidationError
 
-from ..models import MultipleChoice, Option, OptionText, OptionResponse
+from cx_metrics.surveys.services import (
+    BufferedCounterService, CacheNamespaceService, CacheStatsService, LocalCache, ShardedCounterService
+)
+from ..models import (
+    MultipleChoice, Option, OptionText, OptionResponse, OptionTextCounterShard, OptionTextCrossTab
+)
 
 
 class MultipleChoiceService(object):
+    REPRESENTATION_STATS_NAME = 'multiple_choice'
+    local_cache = LocalCache('multiple_choice_local')
+
     @staticmethod
     def get(*args, **kwargs):
         try:
@@ -36,14 +50,82 @@ class MultipleChoiceService(object):
         )
 
     @staticmethod
-    def cache_representation(mc_id, representation):
+    def clone(multiple_choice, count):
+        """
+        Create count copies of the multiple choice with its options, the
+        options of all copies are inserted in one batch.
+        """
+        fields = ('text', 'enabled', 'required', 'type', 'other_enabled', 'next_bit')
+        clones = [
+            MultipleChoice(**{field_name: getattr(multiple_choice, field_name) for field_name in fields})
+            for _i in range(count)
+        ]
+        options = list(multiple_choice.options.all())
+        with transaction.atomic():
+            if connection.features.can_return_ids_from_bulk_insert:
+                MultipleChoice.objects.bulk_create(clones)
+            else:
+                for clone in clones:
+                    clone.save()
+
+            Option.objects.bulk_create([
+                Option(
+                    multiple_choice=clone, text=option.text, enabled=option.enabled, order=option.order, bit=option.bit
+                )
+                for clone in clones for option in options
+            ])
+        return clones
+
+    @staticmethod
+    def cache_representation(mc_id, representation, business_id=None):
+        """
+        Cache the representation of the multiple choice, in the namespace
+        of the given business if any, see CacheNamespaceService.
+        """
         key = MultipleChoiceService.representation_cache_key(mc_id)
-        cache.set(key=key, value=representation, timeout=1 * 60 * 60)  # 1hour
+        value = representation
+        if business_id is not None:
+            namespace = CacheNamespaceService.get_business_namespace(business_id)
+            value = (namespace, CacheNamespaceService.get_version(namespace), representation)
+        cache.set(key=key, value=value, timeout=1 * 60 * 60)  # 1hour
 
     @staticmethod
-    def representation_from_cache(mc_id):
+    def invalidate_local_representation(mc_id):
+        """
+        Drop the representation of the multiple choice from the local cache
+        of every process, call it after changing the multiple choice.
+        """
+        MultipleChoiceService.local_cache.invalidate(MultipleChoiceService.representation_cache_key(mc_id))
+
+    @staticmethod
+    def get_cached_representation(value, business_id=None):
+        """
+        Return the representation of a cached value, None if it was cached
+        without a business while one is given or its namespace was invalidated.
+        """
+        if not isinstance(value, tuple):
+            return value if business_id is None else None
+
+        namespace, version, representation = value
+        if not CacheNamespaceService.is_current(namespace, version):
+            return None
+        return representation
+
+    @staticmethod
+    def representation_from_cache(mc_id, business_id=None):
         key = MultipleChoiceService.representation_cache_key(mc_id)
-        return cache.get(key=key)
+        representation = MultipleChoiceService.local_cache.get(key)
+        if representation is not None:
+            return representation
+
+        version = MultipleChoiceService.local_cache.get_key_version(key)
+        representation = MultipleChoiceService.get_cached_representation(cache.get(key=key), business_id)
+        if representation is None:
+            CacheStatsService.incr(MultipleChoiceService.REPRESENTATION_STATS_NAME, CacheStatsService.MISS)
+        else:
+            CacheStatsService.incr(MultipleChoiceService.REPRESENTATION_STATS_NAME, CacheStatsService.HIT)
+            MultipleChoiceService.local_cache.set(key, representation, version)
+        return representation
 
     @staticmethod
     def representation_cache_key(mc_id):
@@ -52,16 +134,48 @@ class MultipleChoiceService(object):
 
     @staticmethod
     def create_options(multiple_choice, options_kwargs):
+        """
+        Create the options with one bulk insert, reserving the bits of all of
+        them at once if the multiple choice uses contra masks.
+        """
         options = []
         for kwargs in options_kwargs:
             kwargs.update({'multiple_choice': multiple_choice})
             options.append(Option(**kwargs))
 
         try:
-            return Option.objects.bulk_create(options)
+            if not options or not multiple_choice.uses_mask():
+                return Option.objects.bulk_create(options)
+            with transaction.atomic():
+                for option, bit in zip(options, multiple_choice.get_next_bits(len(options))):
+                    option.bit = bit
+                return Option.objects.bulk_create(options)
         except IntegrityError:
             raise ValidationError(_('Failed to create options'))
 
+    @staticmethod
+    def assign_bits(multiple_choice):
+        """
+        Give the options of the multiple choice without a bit one, with one
+        bulk update, if it uses contra masks. Options created before the
+        multiple choice used them, e.g. radio options of a question changed
+        to checkboxes, have no bit. Returns the options given a bit.
+        """
+        if not multiple_choice.uses_mask():
+            return []
+
+        with transaction.atomic():
+            options = list(multiple_choice.options.filter(bit=None).order_by('order', 'id'))
+            if not options:
+                return []
+            for option, bit in zip(options, multiple_choice.get_next_bits(len(options))):
+                option.bit = bit
+            options = [option for option in options if option.bit is not None]
+            if options:
+                MultipleChoiceService.bulk_update_options(options, ['bit'])
+        MultipleChoiceService.clear_options_cache(multiple_choice)
+        return options
+
     @staticmethod
     def get_option(*args, **kwargs):
         try:
@@ -94,23 +208,75 @@ class MultipleChoiceService(object):
         )
 
     @staticmethod
-    def update_options(multiple_choice, options_kwargs):
+    def get_options_by_id(multiple_choice):
+        return {option.id: option for option in multiple_choice.options.all()}
+
+    @staticmethod
+    def bulk_update_options(options, fields):
+        for option in options:
+            option.updated = timezone.now()
+        fields = list(fields) + ['updated']
+
+        if hasattr(QuerySet, 'bulk_update'):
+            Option.objects.bulk_update(options, fields)
+        else:  # pragma: no cover, Django < 2.2
+            for option in options:
+                Option.objects.filter(id=option.id).update(
+                    **{field_name: getattr(option, field_name) for field_name in fields}
+                )
+
+    @staticmethod
+    def clear_options_cache(multiple_choice):
+        getattr(multiple_choice, '_prefetched_objects_cache', {}).pop('options', None)
+        multiple_choice.__dict__.pop('option_ids', None)
+        multiple_choice.__dict__.pop('option_bits', None)
+
+    @staticmethod
+    def update_options(multiple_choice, options_kwargs, options=None):
+        """
+        Update the options given with an id and create the others, with one
+        bulk update and one bulk insert. options maps the ids of the options
+        of the multiple choice to their instances and is loaded if omitted,
+        unknown ids are ignored.
+        """
+        if options is None:
+            options = MultipleChoiceService.get_options_by_id(multiple_choice)
+
+        changed_options = []
+        changed_fields = set()
         new_options = []
         for kwargs in options_kwargs:
             option_id = kwargs.pop('id', None)
-            if option_id:
-                multiple_choice.options.filter(id=option_id).update(**kwargs)
-            else:
+            if not option_id:
                 new_options.append(kwargs)
+            elif option_id in options:
+                option = options[option_id]
+                for field_name, value in kwargs.items():
+                    setattr(option, field_name, value)
+                changed_options.append(option)
+                changed_fields.update(kwargs)
 
-        MultipleChoiceService.create_options(multiple_choice, new_options)
+        if changed_options and changed_fields:
+            MultipleChoiceService.bulk_update_options(changed_options, changed_fields)
+        if new_options:
+            MultipleChoiceService.create_options(multiple_choice, new_options)
+        if multiple_choice.uses_mask() and any(option.bit is None for option in options.values()):
+            MultipleChoiceService.assign_bits(multiple_choice)
+        MultipleChoiceService.clear_options_cache(multiple_choice)
 
     @staticmethod
     def delete_option(multiple_choice, option_id):
         multiple_choice.options.filter(id=option_id).delete()
 
+    @staticmethod
+    def delete_options(multiple_choice, option_ids):
+        if option_ids:
+            multiple_choice.options.filter(id__in=option_ids).delete()
+            MultipleChoiceService.clear_options_cache(multiple_choice)
+
 
 class OptionResponseService(object):
+    COUNTER_BUFFER_KIND = 'option_text'
 
     @staticmethod
     def get_or_create_option_text(defaults=None, **kwargs):
@@ -124,23 +290,456 @@ class OptionResponseService(object):
         )
 
     @staticmethod
-    def store_option_response(multiple_choice, customer_uuid, option_ids):
-        for option_id in option_ids:
-            option = MultipleChoiceService.get_option_by_id(option_id)
-            contra_option = OptionResponseService.get_or_create_option_text(
-                multiple_choice=multiple_choice, text=option.text
-            )[0]
-            OptionResponseService.create_option_response(
-                customer_uuid=customer_uuid,
-                contra_option=contra_option
+    def get_option_responses(multiple_choice_id):
+        return OptionResponse.objects.filter(option_text__multiple_choice_id=multiple_choice_id)
+
+    @staticmethod
+    def can_upsert():
+        return connection.vendor == 'postgresql'
+
+    @staticmethod
+    def upsert_option_texts(multiple_choice, amounts):
+        """
+        Create the option texts of the multiple choice with the given
+        {text: amount} counts or add the amounts to the counts of the
+        existing ones with a single INSERT ... ON CONFLICT statement, and
+        return a {text: option_text} dict. Requires PostgreSQL, see can_upsert().
+        """
+        if not amounts:
+            return {}
+
+        meta = OptionText._meta
+        quote_name = connection.ops.quote_name
+        columns = {
+            field_name: quote_name(meta.get_field(field_name).column)
+            for field_name in ('id', 'multiple_choice', 'text', 'count', 'created')
+        }
+        created = meta.get_field('created').get_db_prep_value(timezone.now(), connection)
+
+        params = []
+        # Sorted to lock conflicting rows in the same order in every transaction
+        texts = sorted(amounts)
+        for text in texts:
+            params.extend([multiple_choice.id, text, amounts[text], created])
+        sql = (
+            'INSERT INTO {table} ({multiple_choice}, {text}, {count}, {created}) VALUES {values} '
+            'ON CONFLICT ({multiple_choice}, {text}) DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count} '
+            'RETURNING {id}, {text}, {count}, {created}'
+        ).format(
+            table=quote_name(meta.db_table),
+            values=', '.join(['(%s, %s, %s, %s)'] * len(texts)),
+            **columns
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        option_texts = {}
+        for id_, text, count, created in rows:
+            option_texts[text] = OptionText(
+                id=id_, multiple_choice=multiple_choice, text=text, count=count, created=created
             )
-            OptionResponseService.change_option_text_count(contra_option, 'count', 1)
+        return option_texts
+
+    @staticmethod
+    def get_or_create_option_texts(multiple_choice, texts):
+        """
+        Return a {text: option_text} dict of the option texts of the multiple
+        choice with the given texts, creating the missing ones in bulk.
+        """
+        option_texts = {
+            option_text.text: option_text
+            for option_text in OptionText.objects.filter(multiple_choice=multiple_choice, text__in=texts)
+        }
+        missing = set(texts).difference(option_texts)
+        if not missing:
+            return option_texts
+
+        if OptionResponseService.can_upsert():
+            option_texts.update(
+                OptionResponseService.upsert_option_texts(multiple_choice, {text: 0 for text in missing})
+            )
+            return option_texts
+
+        try:
+            with transaction.atomic():
+                OptionText.objects.bulk_create(
+                    [OptionText(multiple_choice=multiple_choice, text=text) for text in missing]
+                )
+        except IntegrityError:
+            # Some were created by a concurrent writer meanwhile
+            for text in missing:
+                OptionResponseService.get_or_create_option_text(multiple_choice=multiple_choice, text=text)
+
+        # bulk_create() does not set primary keys on every database backend
+        option_texts.update(
+            (option_text.text, option_text)
+            for option_text in OptionText.objects.filter(multiple_choice=multiple_choice, text__in=missing)
+        )
+        return option_texts
+
+    @staticmethod
+    def get_contra_mask(multiple_choice, option_ids):
+        """
+        Return the contra_mask of a response choosing the given options, 0 if
+        they are stored as option responses instead.
+        """
+        if not settings.SURVEY_CONTRA_MASK_STORAGE or multiple_choice.type not in MultipleChoice.MASK_TYPES:
+            return 0
+        return multiple_choice.get_mask(set(option_ids).intersection(multiple_choice.option_ids)) or 0
+
+    @staticmethod
+    def store_option_response(
+            multiple_choice, customer_uuid, option_ids, shards=None, mask=0, survey_response=None, key=None
+    ):
+        """
+        Store the chosen options of a customer and return their option texts.
+        The number of queries does not depend on the number of options.
+        """
+        return OptionResponseService.store_option_responses(
+            multiple_choice, [(customer_uuid, option_ids)], shards, masks=[mask], survey_responses=[survey_response],
+            keys=[key]
+        )[0]
+
+    @staticmethod
+    def store_option_responses(
+            multiple_choice, responses, shards=None, masks=None, survey_responses=None, keys=None
+    ):
+        """
+        Store the chosen options of (customer_uuid, option_ids) pairs and
+        return the list of option texts of each pair. The number of queries
+        depends on neither the number of pairs nor of options. Counts written
+        to the option text rows are added by the upsert creating them on
+        PostgreSQL. No option responses are created for the pairs with a
+        contra_mask in masks, only their option text counts are incremented.
+        Option responses are linked to the saved survey response of their
+        pair in survey_responses and counted in the cross tab of their key
+        in keys, e.g. the NPS group of the response.
+        """
+        if masks is None:
+            masks = [0] * len(responses)
+        if survey_responses is None:
+            survey_responses = [None] * len(responses)
+        if keys is None:
+            keys = [None] * len(responses)
+        if shards is None:
+            shards = ShardedCounterService.get_shard_count()
+        option_ids = set(chain.from_iterable(ids for _customer_uuid, ids in responses))
+        texts = dict(
+            Option.objects.filter(multiple_choice=multiple_choice, id__in=option_ids).values_list('id', 'text')
+        )
+        if not texts:
+            return [[] for _response in responses]
+
+        chosen_texts = [
+            [texts[option_id] for option_id in ids if option_id in texts] for _customer_uuid, ids in responses
+        ]
+        amounts = Counter(chain.from_iterable(chosen_texts))
+        # Counts kept in the cache buffer or in shards need the option text ids first
+        upsert_counts = OptionResponseService.can_upsert() and not (
+            BufferedCounterService.is_enabled() or ShardedCounterService.is_sharded(shards)
+        )
+        if upsert_counts:
+            option_texts_by_text = OptionResponseService.upsert_option_texts(multiple_choice, amounts)
+        else:
+            option_texts_by_text = OptionResponseService.get_or_create_option_texts(multiple_choice, list(amounts))
+
+        option_texts = [[option_texts_by_text[text] for text in item] for item in chosen_texts]
+        items = zip(responses, masks, survey_responses, option_texts)
+        OptionResponse.objects.bulk_create([
+            OptionResponse(customer_uuid=customer_uuid, option_text=option_text, response=survey_response)
+            for (customer_uuid, _ids), mask, survey_response, item in items if not mask for option_text in item
+        ])
+        if not upsert_counts:
+            OptionResponseService.increment_option_text_counts(list(chain.from_iterable(option_texts)), shards)
+        OptionResponseService.increment_cross_tabs(Counter(
+            (option_text.id, key) for key, item in zip(keys, option_texts) if key is not None for option_text in item
+        ))
+        return option_texts
+
+    @staticmethod
+    def increment_cross_tabs(amounts):
+        """
+        Add the {(option_text_id, key): amount} amounts to the cross tabs of
+        the option texts, creating the missing ones. The number of queries
+        does not depend on the number of option texts.
+        """
+        if not amounts:
+            return
+        if OptionResponseService.can_upsert():
+            OptionResponseService.upsert_cross_tabs(amounts)
+            return
+
+        existing = set(OptionTextCrossTab.objects.filter(
+            option_text_id__in={option_text_id for option_text_id, _key in amounts}
+        ).values_list('option_text_id', 'key'))
+        missing = [item for item in amounts if item not in existing]
+        if missing:
+            try:
+                with transaction.atomic():
+                    OptionTextCrossTab.objects.bulk_create([
+                        OptionTextCrossTab(option_text_id=option_text_id, key=key, count=amounts[option_text_id, key])
+                        for option_text_id, key in missing
+                    ])
+            except IntegrityError:
+                # Some were created by a concurrent writer meanwhile
+                for option_text_id, key in missing:
+                    OptionTextCrossTab.objects.get_or_create(option_text_id=option_text_id, key=key)
+                existing.update(missing)
+
+        option_text_ids = {}
+        for (option_text_id, key), amount in amounts.items():
+            if (option_text_id, key) in existing:
+                option_text_ids.setdefault((key, amount), []).append(option_text_id)
+        for (key, amount), ids in option_text_ids.items():
+            OptionTextCrossTab.objects.filter(option_text_id__in=ids, key=key).update(count=F('count') + amount)
+
+    @staticmethod
+    def upsert_cross_tabs(amounts):
+        """
+        Add the {(option_text_id, key): amount} amounts to the cross tabs of
+        the option texts with a single INSERT ... ON CONFLICT statement.
+        Requires PostgreSQL, see can_upsert().
+        """
+        meta = OptionTextCrossTab._meta
+        quote_name = connection.ops.quote_name
+        columns = {
+            field_name: quote_name(meta.get_field(field_name).column) for field_name in ('option_text', 'key', 'count')
+        }
+
+        params = []
+        # Sorted to lock conflicting rows in the same order in every transaction
+        items = sorted(amounts)
+        for option_text_id, key in items:
+            params.extend([option_text_id, key, amounts[(option_text_id, key)]])
+        sql = (
+            'INSERT INTO {table} ({option_text}, {key}, {count}) VALUES {values} '
+            'ON CONFLICT ({option_text}, {key}) DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}'
+        ).format(table=quote_name(meta.db_table), values=', '.join(['(%s, %s, %s)'] * len(items)), **columns)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @staticmethod
+    def count_cross_tabs(option_texts, keys):
+        """
+        Return the {option text: {key: amount}} counts of the lists of option
+        texts chosen with responses of the given keys.
+        """
+        counts = {}
+        for key, item in zip(keys, option_texts):
+            for option_text in item:
+                amounts = counts.setdefault(option_text.text, {})
+                amounts[key] = amounts.get(key, 0) + 1
+        return counts
+
+    @staticmethod
+    def rebuild_cross_tabs(multiple_choice, responses, filters):
+        """
+        Recount the cross tabs of the option texts of the multiple choice from
+        the given survey responses, {key: Q} filters select the responses of
+        each key. Option responses not linked to their response are not
+        counted. Runs two queries per key.
+        """
+        response_type = ContentType.objects.get_for_model(responses.model)
+        option_text_ids = dict(OptionText.objects.filter(multiple_choice=multiple_choice).values_list('text', 'id'))
+        counts = Counter()
+        for key, condition in filters.items():
+            keyed = responses.filter(condition)
+            linked = OptionResponse.objects.filter(
+                option_text__multiple_choice=multiple_choice, response_type=response_type,
+                response_id__in=keyed.values('id')
+            ).order_by().values_list('option_text_id').annotate(count=Count('id'))
+            for option_text_id, count in linked:
+                counts[(option_text_id, key)] += count
+            for text, count in OptionResponseService.get_mask_counts(multiple_choice, keyed).items():
+                if text in option_text_ids:
+                    counts[(option_text_ids[text], key)] += count
+
+        with transaction.atomic():
+            OptionTextCrossTab.objects.filter(option_text__multiple_choice=multiple_choice).delete()
+            OptionTextCrossTab.objects.bulk_create([
+                OptionTextCrossTab(option_text_id=option_text_id, key=key, count=count)
+                for (option_text_id, key), count in counts.items()
+            ])
+        return counts
+
+    @staticmethod
+    def increment_option_text_counts(option_texts, shards):
+        """
+        Count one response for each of the given option texts, option texts
+        with the same increment are updated in one statement.
+        """
+        amounts = Counter(option_text.id for option_text in option_texts)
+        option_text_ids = {}
+        for option_text in option_texts:
+            amount = amounts.pop(option_text.id, None)
+            if amount is None or OptionResponseService.buffer_option_text_count(option_text, amount):
+                continue
+            if ShardedCounterService.is_sharded(shards):
+                ShardedCounterService.increment(
+                    OptionTextCounterShard, shards, {'count': amount}, option_text=option_text
+                )
+            else:
+                option_text_ids.setdefault(amount, []).append(option_text.id)
+
+        for amount, ids in option_text_ids.items():
+            OptionText.objects.filter(id__in=ids).update(count=F('count') + amount)
 
     @staticmethod
     def change_option_text_count(survey_option, field_name, amount):
         kwargs = {field_name: F(field_name) + amount}
         return OptionText.objects.filter(id=survey_option.id).update(**kwargs)
 
+    @staticmethod
+    def buffer_option_text_count(option_text, amount):
+        """
+        Buffer the count increment in the cache in write-behind mode, returns
+        False if it has to be written to the database instead.
+        """
+        if not BufferedCounterService.is_enabled():
+            return False
+        return BufferedCounterService.increment(OptionResponseService.COUNTER_BUFFER_KIND, str(option_text.id), amount)
+
+    @staticmethod
+    def flush_buffered_counts(batch_size=None):
+        """
+        Write the count increments buffered in the cache to the database and
+        return the number of updated option texts. Option texts with the same
+        increment are updated together.
+        """
+        kind = OptionResponseService.COUNTER_BUFFER_KIND
+        batch_size = batch_size or int(settings.SURVEY_COUNTER_FLUSH_BATCH_SIZE)
+        if not BufferedCounterService.acquire_flush_lock(kind):
+            return 0
+
+        flushed = 0
+        try:
+            names = BufferedCounterService.pop_dirty_names(kind, batch_size)
+            while names:
+                option_text_ids = {}
+                taken = set()
+                try:
+                    for name in names:
+                        amount = BufferedCounterService.take(kind, name)
+                        taken.add(name)
+                        if amount:
+                            option_text_ids.setdefault(amount, []).append(int(name))
+                except Exception:
+                    # Write what was taken already, the other names stay buffered
+                    BufferedCounterService.restore_dirty_names(kind, names - taken)
+                    OptionResponseService.apply_buffered_counts(option_text_ids)
+                    raise
+
+                OptionResponseService.apply_buffered_counts(option_text_ids)
+                flushed += sum(len(ids) for ids in option_text_ids.values())
+                if len(names) < batch_size:
+                    break
+                names = BufferedCounterService.pop_dirty_names(kind, batch_size)
+        finally:
+            BufferedCounterService.release_flush_lock(kind)
+        return flushed
+
+    @staticmethod
+    def apply_buffered_counts(option_text_ids):
+        try:
+            with transaction.atomic():
+                for amount, ids in option_text_ids.items():
+                    OptionText.objects.filter(id__in=ids).update(count=F('count') + amount)
+        except Exception:
+            for amount, ids in option_text_ids.items():
+                for id_ in ids:
+                    BufferedCounterService.increment(OptionResponseService.COUNTER_BUFFER_KIND, str(id_), amount)
+            raise
+
+    @staticmethod
+    def get_option_texts_by_bit(multiple_choice_id):
+        return dict(
+            Option.objects.filter(multiple_choice_id=multiple_choice_id, bit__isnull=False).values_list('bit', 'text')
+        )
+
+    @staticmethod
+    def get_contra_survey(multiple_choice):
+        """
+        Return the survey the multiple choice is the contra question of, None
+        if there is none.
+        """
+        return multiple_choice.get_contra_survey()
+
+    @staticmethod
+    def get_mask_counts(multiple_choice, responses=None):
+        """
+        Return the {option text: count} numbers of the given responses, the
+        responses of the contra survey of the multiple choice by default,
+        choosing each option in their contra_mask, with a single aggregate
+        query.
+        """
+        if responses is None:
+            survey = OptionResponseService.get_contra_survey(multiple_choice)
+            if survey is None:
+                return {}
+            responses = survey.responses
+        texts = OptionResponseService.get_option_texts_by_bit(multiple_choice.id)
+        if not texts:
+            return {}
+
+        sums = {'bit_%d' % bit: Sum(F('contra_mask').bitand(1 << bit) / (1 << bit)) for bit in texts}
+        counts = responses.exclude(contra_mask=0).aggregate(**sums)
+        return {text: counts['bit_%d' % bit] for bit, text in texts.items() if counts['bit_%d' % bit]}
+
+    @staticmethod
+    def get_drifted_option_texts(option_texts):
+        """
+        Return (option_text, count, responses) tuples of the given option texts
+        whose count, counter shards and buffered increments included, differs
+        from their number of responses, option responses and contra_mask bits.
+        """
+        ids = [option_text.id for option_text in option_texts]
+        responses = Counter(dict(
+            OptionResponse.objects.filter(option_text_id__in=ids).order_by().values_list(
+                'option_text_id'
+            ).annotate(count=Count('id'))
+        ))
+        multiple_choices = MultipleChoice.objects.in_bulk(
+            {option_text.multiple_choice_id for option_text in option_texts}
+        )
+        mask_counts = {
+            id_: OptionResponseService.get_mask_counts(multiple_choice)
+            for id_, multiple_choice in multiple_choices.items()
+        }
+        for option_text in option_texts:
+            responses[option_text.id] += mask_counts[option_text.multiple_choice_id].get(option_text.text, 0)
+        shard_counts = dict(
+            OptionTextCounterShard.objects.filter(option_text_id__in=ids).order_by().values_list(
+                'option_text_id'
+            ).annotate(count=Sum('count'))
+        )
+
+        drifted = []
+        for option_text in option_texts:
+            count = option_text.count + shard_counts.get(option_text.id, 0) + BufferedCounterService.get(
+                OptionResponseService.COUNTER_BUFFER_KIND, str(option_text.id)
+            )
+            if count != responses.get(option_text.id, 0):
+                drifted.append((option_text, count, responses.get(option_text.id, 0)))
+        return drifted
+
+    @staticmethod
+    def rebuild_option_text_count(option_text):
+        """
+        Recount the count of the given option text from its responses, folding
+        counter shards and buffered increments into the option text row.
+        """
+        with transaction.atomic():
+            OptionText.objects.select_for_update().filter(id=option_text.id).only('id').first()
+            BufferedCounterService.take(OptionResponseService.COUNTER_BUFFER_KIND, str(option_text.id))
+            OptionTextCounterShard.objects.filter(option_text_id=option_text.id).delete()
+            count = OptionResponse.objects.filter(option_text_id=option_text.id).count()
+            count += OptionResponseService.get_mask_counts(option_text.multiple_choice).get(option_text.text, 0)
+            OptionText.objects.filter(id=option_text.id).update(count=count)
+        return count
+
     @staticmethod
     def get_option_text(*args, **kwargs):
         try:
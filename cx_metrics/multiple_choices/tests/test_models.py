@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from cx_metrics.multiple_choices.models import OptionText, MultipleChoice, OptionResponse
+from cx_metrics.multiple_choices.models import Option, OptionText, MultipleChoice, OptionResponse
 
 
 class OptionTextTestCase(TestCase):
@@ -26,3 +26,53 @@ class OptionResponseTestCase(TestCase):
             customer_uuid="uuid"
         )
         self.assertEqual(str(response), str(option_text))
+
+
+@override_settings(SURVEY_CONTRA_MASK_STORAGE=True)
+class MultipleChoiceMaskTestCase(TestCase):
+
+    def setUp(self):
+        self.mc = MultipleChoice.objects.create(text=self.id(), type=MultipleChoice.TYPE_CHECKBOX)
+        self.options = [Option.objects.create(multiple_choice=self.mc, text='option %d' % index) for index in range(3)]
+
+    def test_option_bits(self):
+        self.assertEqual([option.bit for option in self.options], [0, 1, 2])
+        self.assertEqual(self.mc.option_bits, {option.id: option.bit for option in self.options})
+
+    def test_get_mask(self):
+        self.assertEqual(self.mc.get_mask([self.options[0].id, self.options[2].id]), 0b101)
+        self.assertEqual(self.mc.get_mask([]), 0)
+
+    def test_get_mask_option_without_bit(self):
+        Option.objects.filter(pk=self.options[1].pk).update(bit=None)
+        self.assertIsNone(self.mc.get_mask([self.options[0].id, self.options[1].id]))
+
+    def test_get_next_bits(self):
+        self.options[2].delete()
+        self.assertEqual(self.mc.get_next_bits(2), [3, 4])
+        self.mc.refresh_from_db()
+        self.assertEqual(self.mc.next_bit, 5)
+
+    def test_get_next_bits_exhausted(self):
+        MultipleChoice.objects.filter(pk=self.mc.pk).update(next_bit=Option.MAX_BIT)
+        Option.objects.bulk_create(
+            Option(multiple_choice=self.mc, text='unused %d' % bit, bit=bit) for bit in range(3, Option.MAX_BIT)
+        )
+        self.assertEqual(self.mc.get_next_bits(2), [Option.MAX_BIT, None])
+        self.assertEqual(self.mc.get_next_bits(1), [None])
+
+    def test_get_next_bits_reuses_deleted_bits(self):
+        MultipleChoice.objects.filter(pk=self.mc.pk).update(next_bit=Option.MAX_BIT + 1)
+        self.options[1].delete()
+        self.assertEqual(self.mc.get_next_bits(2), [1, 3])
+
+    def test_option_bit_radio(self):
+        mc = MultipleChoice.objects.create(text=self.id(), type=MultipleChoice.TYPE_RADIO)
+        with self.assertNumQueries(1):
+            option = Option.objects.create(multiple_choice=mc, text='option')
+        self.assertIsNone(option.bit)
+
+    @override_settings(SURVEY_CONTRA_MASK_STORAGE=False)
+    def test_option_bit_disabled(self):
+        option = Option.objects.create(multiple_choice=self.mc, text='option')
+        self.assertIsNone(option.bit)
@@ -1,11 +1,20 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+from unittest import skipUnless
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.exceptions import ValidationError
 
 from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
-from ..models import MultipleChoice, Option
+from cx_metrics.surveys.services import SurveyCacheService
+from ..models import MultipleChoice, Option, OptionText, OptionTextCounterShard, OptionTextCrossTab
 from ..services import MultipleChoiceService
+from ..tasks import flush_option_text_counters
 
 
 class MultipleChoiceServiceTestCase(TestCase):
@@ -59,6 +68,34 @@ class MultipleChoiceServiceTestCase(TestCase):
             self.assertEqual(option.text, options_kwargs[i]['text'])
             self.assertEqual(option.order, options_kwargs[i]['order'])
 
+    def test_create_options_radio_without_bits(self):
+        mc = MultipleChoiceService.create(text=self.id())
+
+        with self.assertNumQueries(1):
+            options = MultipleChoiceService.create_options(mc, [{'text': 'Option 1'}, {'text': 'Option 2'}])
+
+        self.assertEqual([option.bit for option in options], [None, None])
+
+    @override_settings(SURVEY_CONTRA_MASK_STORAGE=True)
+    def test_create_options_bits(self):
+        mc = MultipleChoiceService.create(text=self.id(), type_=MultipleChoice.TYPE_CHECKBOX)
+
+        options = MultipleChoiceService.create_options(mc, [{'text': 'Option %d' % i} for i in range(3)])
+
+        self.assertEqual([option.bit for option in options], [0, 1, 2])
+        mc.refresh_from_db()
+        self.assertEqual(mc.next_bit, 3)
+
+    def test_update_options_assigns_bits(self):
+        mc = MultipleChoiceService.create(text=self.id(), type_=MultipleChoice.TYPE_CHECKBOX)
+        option = MultipleChoiceService.create_option(mc, 'Option 1', 1)
+        self.assertIsNone(option.bit)
+
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=True):
+            MultipleChoiceService.update_options(mc, [{'id': option.pk, 'order': 1}, {'text': 'Option 2', 'order': 2}])
+
+        self.assertEqual(sorted(mc.options.values_list('text', 'bit')), [('Option 1', 1), ('Option 2', 0)])
+
     def test_create_options_raises_validation_error(self):
         mc = MultipleChoiceService.create(text=self.id())
         options_kwargs = [
@@ -115,6 +152,24 @@ class MultipleChoiceServiceTestCase(TestCase):
         self.assertEqual(option.text, options_kwargs[0].get('text'))
         self.assertEqual(option.order, options_kwargs[0].get('order'))
 
+    def test_update_options_loaded(self):
+        mc = MultipleChoiceService.create(text=self.id())
+        options = [MultipleChoiceService.create_option(mc, 'Option %d' % i, i) for i in range(3)]
+        options_kwargs = [{'id': option.pk, 'text': 'Changed %d' % option.order} for option in options]
+        options_kwargs.append({'id': 0, 'text': 'Unknown'})
+
+        loaded = MultipleChoiceService.get_options_by_id(mc)
+        with self.assertNumQueries(1):
+            MultipleChoiceService.update_options(mc, options_kwargs, loaded)
+
+        self.assertEqual(list(mc.options.values_list('text', flat=True)), ['Changed 0', 'Changed 1', 'Changed 2'])
+
+    def test_delete_options(self):
+        mc = MultipleChoiceService.create(text=self.id())
+        options = [MultipleChoiceService.create_option(mc, 'Option %d' % i, i) for i in range(3)]
+        MultipleChoiceService.delete_options(mc, [options[0].pk, options[1].pk])
+        self.assertEqual(list(mc.options.values_list('id', flat=True)), [options[2].pk])
+
     def test_update_options_with_new_options(self):
         mc = MultipleChoiceService.create(text=self.id())
         option = MultipleChoiceService.create_option(mc, 'Option', 1)
@@ -147,6 +202,27 @@ class MultipleChoiceServiceTestCase(TestCase):
 
         self.assertEqual(representation, expected_repr)
 
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'multiple-choice-namespaces',
+            }
+        }
+    )
+    def test_cache_representation_business(self):
+        expected_repr = {
+            "test": "test"
+        }
+        MultipleChoiceService.cache_representation(1, expected_repr, business_id=1)
+        self.assertEqual(MultipleChoiceService.representation_from_cache(1, business_id=1), expected_repr)
+
+        SurveyCacheService.invalidate_business(1)
+        self.assertIsNone(MultipleChoiceService.representation_from_cache(1, business_id=1))
+
+        MultipleChoiceService.cache_representation(1, expected_repr)
+        self.assertIsNone(MultipleChoiceService.representation_from_cache(1, business_id=1))
+
     def test_generate_cache_key(self):
         expected_key = "multiple-choice-1"
 
@@ -159,3 +235,170 @@ class OptionResponseServiceTestCase(TestCase):
 
     def test_get_option_text_not_exist(self):
         self.assertIsNone(OptionResponseService.get_option_text(id=1000))
+
+
+class OptionResponseServiceStoreTestCase(TestCase):
+    fixtures = ['multiple_choices', 'options']
+
+    def test_store_option_response(self):
+        option = Option.objects.first()
+        OptionResponseService.store_option_response(option.multiple_choice, uuid4(), [option.id])
+
+        option_text = OptionText.objects.get(multiple_choice=option.multiple_choice, text=option.text)
+        self.assertEqual(option_text.count, 1)
+        self.assertEqual(option_text.total_count, 1)
+
+    def test_store_option_response_options(self):
+        multiple_choice = Option.objects.first().multiple_choice
+        options = list(multiple_choice.options.all())
+        option_texts = OptionResponseService.store_option_response(
+            multiple_choice, uuid4(), [option.id for option in options]
+        )
+
+        self.assertEqual([option_text.text for option_text in option_texts], [option.text for option in options])
+        for option_text in option_texts:
+            option_text.refresh_from_db()
+            self.assertEqual(option_text.option_response.count(), option_text.count)
+
+    def test_store_option_response_query_count(self):
+        multiple_choice = Option.objects.first().multiple_choice
+        option_ids = list(multiple_choice.options.values_list('id', flat=True))
+        self.assertGreater(len(option_ids), 1)
+        OptionResponseService.store_option_response(multiple_choice, uuid4(), option_ids)
+
+        with CaptureQueriesContext(connection) as single:
+            OptionResponseService.store_option_response(multiple_choice, uuid4(), option_ids[:1])
+        with CaptureQueriesContext(connection) as multiple:
+            OptionResponseService.store_option_response(multiple_choice, uuid4(), option_ids)
+        self.assertEqual(len(single), len(multiple))
+
+    def test_store_option_response_other_multiple_choice(self):
+        option = Option.objects.first()
+        other = MultipleChoiceService.create(text=self.id())
+        self.assertEqual(OptionResponseService.store_option_response(other, uuid4(), [option.id]), [])
+
+    def test_get_or_create_option_texts(self):
+        multiple_choice = Option.objects.first().multiple_choice
+        existing = OptionText.objects.create(multiple_choice=multiple_choice, text='existing')
+
+        option_texts = OptionResponseService.get_or_create_option_texts(multiple_choice, ['existing', 'new'])
+
+        self.assertEqual(option_texts['existing'], existing)
+        self.assertIsNotNone(option_texts['new'].pk)
+
+    def test_store_option_responses(self):
+        multiple_choice = Option.objects.first().multiple_choice
+        options = list(multiple_choice.options.all()[:2])
+        responses = [(uuid4(), [options[0].id]), (uuid4(), [options[0].id, options[1].id]), (uuid4(), [0])]
+
+        option_texts = OptionResponseService.store_option_responses(multiple_choice, responses)
+
+        self.assertEqual([[option_text.text for option_text in item] for item in option_texts], [
+            [options[0].text], [options[0].text, options[1].text], []
+        ])
+        self.assertEqual(OptionText.objects.get(multiple_choice=multiple_choice, text=options[0].text).count, 2)
+        self.assertEqual(OptionText.objects.get(multiple_choice=multiple_choice, text=options[1].text).count, 1)
+
+    def test_store_option_responses_query_count(self):
+        multiple_choice = Option.objects.first().multiple_choice
+        option_ids = list(multiple_choice.options.values_list('id', flat=True))
+        OptionResponseService.store_option_responses(multiple_choice, [(uuid4(), option_ids)])
+
+        with CaptureQueriesContext(connection) as single:
+            OptionResponseService.store_option_responses(multiple_choice, [(uuid4(), option_ids)])
+        with CaptureQueriesContext(connection) as multiple:
+            OptionResponseService.store_option_responses(multiple_choice, [(uuid4(), option_ids) for _i in range(5)])
+        self.assertEqual(len(single), len(multiple))
+
+    def test_store_option_responses_cross_tabs(self):
+        multiple_choice = Option.objects.first().multiple_choice
+        options = list(multiple_choice.options.all()[:2])
+        OptionResponseService.store_option_responses(
+            multiple_choice, [(uuid4(), [options[0].id]), (uuid4(), [options[0].id, options[1].id])], keys=['x', 'y']
+        )
+        OptionResponseService.store_option_response(multiple_choice, uuid4(), [options[0].id], key='x')
+        OptionResponseService.store_option_response(multiple_choice, uuid4(), [options[1].id])
+
+        self.assertEqual(
+            sorted(OptionTextCrossTab.objects.values_list('option_text__text', 'key', 'count')),
+            sorted([(options[0].text, 'x', 2), (options[0].text, 'y', 1), (options[1].text, 'y', 1)])
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'INSERT ... ON CONFLICT requires PostgreSQL')
+    def test_upsert_option_texts(self):
+        multiple_choice = Option.objects.first().multiple_choice
+        existing = OptionText.objects.create(multiple_choice=multiple_choice, text='existing', count=3)
+
+        with self.assertNumQueries(1):
+            option_texts = OptionResponseService.upsert_option_texts(multiple_choice, {'existing': 2, 'new': 1})
+
+        self.assertEqual(option_texts['existing'].pk, existing.pk)
+        self.assertEqual(option_texts['existing'].count, 5)
+        self.assertEqual(OptionText.objects.get(pk=option_texts['new'].pk).count, 1)
+
+    def test_store_option_response_sharded(self):
+        option = Option.objects.first()
+        for _i in range(3):
+            OptionResponseService.store_option_response(option.multiple_choice, uuid4(), [option.id], shards=2)
+
+        option_text = OptionText.objects.get(multiple_choice=option.multiple_choice, text=option.text)
+        self.assertEqual(option_text.count, 0)
+        self.assertEqual(option_text.total_count, 3)
+        self.assertLessEqual(option_text.counter_shards.count(), 2)
+        self.assertEqual(OptionText.objects.with_shard_counts().get(pk=option_text.pk).total_count, 3)
+
+    @override_settings(SURVEY_COUNTER_SHARDS=4)
+    def test_store_option_response_sharded_by_setting(self):
+        option = Option.objects.first()
+        OptionResponseService.store_option_response(option.multiple_choice, uuid4(), [option.id])
+
+        option_text = OptionText.objects.get(multiple_choice=option.multiple_choice, text=option.text)
+        self.assertEqual(option_text.count, 0)
+        self.assertEqual(option_text.total_count, 1)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'counters',
+        }
+    },
+    SURVEY_COUNTER_WRITE_BEHIND=True
+)
+class OptionResponseServiceBufferedTestCase(TestCase):
+    fixtures = ['multiple_choices', 'options']
+
+    def setUp(self):
+        cache.clear()
+        self.option = Option.objects.first()
+
+    def _get_option_text(self):
+        return OptionText.objects.get(multiple_choice=self.option.multiple_choice, text=self.option.text)
+
+    def test_store_option_response(self):
+        OptionResponseService.store_option_response(self.option.multiple_choice, uuid4(), [self.option.id])
+        self.assertEqual(self._get_option_text().count, 0)
+
+        self.assertEqual(OptionResponseService.flush_buffered_counts(), 1)
+        self.assertEqual(self._get_option_text().count, 1)
+
+    def test_flush_option_text_counters_task(self):
+        for _i in range(2):
+            OptionResponseService.store_option_response(self.option.multiple_choice, uuid4(), [self.option.id])
+        flush_option_text_counters.delay()
+
+        self.assertEqual(self._get_option_text().count, 2)
+
+    def test_rebuild_option_text_counters_command(self):
+        OptionResponseService.store_option_response(self.option.multiple_choice, uuid4(), [self.option.id], shards=1)
+        call_command('rebuild_option_text_counters', '--check')
+
+        option_text = self._get_option_text()
+        OptionTextCounterShard.objects.create(option_text=option_text, shard=0, count=2)
+        self.assertRaises(CommandError, call_command, 'rebuild_option_text_counters', '--check')
+
+        call_command('rebuild_option_text_counters')
+        option_text = self._get_option_text()
+        self.assertEqual(option_text.total_count, 1)
+        self.assertFalse(option_text.counter_shards.exists())
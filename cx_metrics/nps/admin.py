@@ -23,7 +23,7 @@ class NPSSurveyAdmin(SurveyAdminBase):
         }),
         (_('Advanced options'), {
             'classes': ('collapse',),
-            'fields': ('text_enabled', 'text', 'question', 'contra_question', 'message')
+            'fields': ('text_enabled', 'text', 'question', 'contra_question', 'message', 'counter_shards')
         }),
     )
 
@@ -0,0 +1,2 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
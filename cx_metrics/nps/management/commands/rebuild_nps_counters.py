@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import NPSSurvey
+from ...services import NPSService
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the promoters, passives and detractors counters of NPS surveys from their responses, '
+        'or only report drifted counters with --check'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('uuids', nargs='*', help='UUIDs of the surveys to rebuild, all surveys if omitted')
+        parser.add_argument(
+            '--check', action='store_true', dest='check',
+            help='Compare the counters with the responses without changing them',
+        )
+
+    def handle(self, *args, **options):
+        surveys = NPSSurvey.objects.order_by('id')
+        if options['uuids']:
+            surveys = surveys.filter(uuid__in=options['uuids'])
+
+        drifted = 0
+        for survey in surveys.iterator():
+            counts = NPSService.count_responses(survey.uuid)
+            counters = NPSService.get_counters(survey)
+            if counters == counts:
+                continue
+
+            drifted += 1
+            if options['check']:
+                self.stdout.write('%s: counters %s, responses %s' % (survey.uuid, counters, counts))
+            else:
+                NPSService.rebuild_counters(survey)
+                if options['verbosity'] > 1:
+                    self.stdout.write('Rebuilt %s' % survey.uuid)
+
+        if options['check'] and drifted:
+            raise CommandError('%d NPS surveys have drifted counters' % drifted)
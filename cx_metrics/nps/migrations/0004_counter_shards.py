@@ -0,0 +1,34 @@
+# Generated by Django 2.2 on 2026-10-17 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nps', '0003_response_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NPSCounterShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('survey_uuid', models.UUIDField(editable=False, verbose_name='Survey UUID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='Shard')),
+                ('promoters', models.BigIntegerField(default=0, verbose_name='Promoters')),
+                ('passives', models.BigIntegerField(default=0, verbose_name='Passives')),
+                ('detractors', models.BigIntegerField(default=0, verbose_name='Detractors')),
+            ],
+            options={
+                'verbose_name': 'NPS Counter Shard',
+                'verbose_name_plural': 'NPS Counter Shards',
+                'unique_together': {('survey_uuid', 'shard')},
+            },
+        ),
+        migrations.AddField(
+            model_name='npssurvey',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Number of rows the counters are spread over, 0 to use the default', verbose_name='Counter Shards'),
+        ),
+    ]
@@ -8,7 +8,7 @@ from upkook_core.customers.services import CustomerService
 
 from cx_metrics.multiple_choices.models import MultipleChoice
 from cx_metrics.surveys.decorators import register_survey
-from cx_metrics.surveys.models import SurveyModel, SurveyResponseBase
+from cx_metrics.surveys.models import SurveyModel, SurveyResponseBase, response_lookup_indexes
 
 
 @register_survey('NPS')
@@ -24,6 +24,16 @@ class NPSSurvey(SurveyModel):
         MultipleChoice, related_name='nps_survey', on_delete=models.PROTECT,
         verbose_name=_('Contra'), null=True, default=None,
     )
+    counter_shards = models.PositiveSmallIntegerField(
+        _('Counter Shards'), default=0,
+        help_text=_('Number of rows the counters are spread over, 0 to use the default')
+    )
+
+    SNAPSHOT_FIELDS = ('counter_shards',)
+    LOAD_SELECT_RELATED = ('business', 'contra')
+    LOAD_PREFETCH_RELATED = ('contra__options',)
+    CLONE_FIELDS = ('text', 'text_enabled', 'question', 'message', 'counter_shards')
+    RESPONSE_MODEL = 'nps.NPSResponse'
 
     class Meta:
         verbose_name = _('NPS Survey')
@@ -36,9 +46,32 @@ class NPSSurvey(SurveyModel):
     @property
     def contra_response_option_texts(self):
         if self.contra:
-            return self.contra.option_texts.all()
+            return self.contra.option_texts.with_shard_counts().prefetch_related('cross_tabs')
         return []
 
+    @cached_property
+    def counters(self):
+        """
+        Promoters, passives and detractors including the counter shards
+        """
+        totals = NPSCounterShard.objects.filter(survey_uuid=self.uuid).aggregate(
+            promoters=models.Sum('promoters'),
+            passives=models.Sum('passives'),
+            detractors=models.Sum('detractors'),
+        )
+        return {
+            'promoters': self.promoters + (totals['promoters'] or 0),
+            'passives': self.passives + (totals['passives'] or 0),
+            'detractors': self.detractors + (totals['detractors'] or 0),
+        }
+
+    def get_cross_tab_filters(self):
+        return {
+            'promoters': models.Q(score__gte=9),
+            'passives': models.Q(score__gte=7, score__lte=8),
+            'detractors': models.Q(score__lte=6),
+        }
+
     def has_contra(self):
         return self.contra and self.contra.enabled
 
@@ -49,7 +82,21 @@ class NPSResponse(SurveyResponseBase):
     class Meta:
         verbose_name = _('NPS Response')
         verbose_name_plural = _('NPS Responses')
+        indexes = response_lookup_indexes('nps')
 
     @cached_property
     def customer(self):
         return CustomerService.get_customer_by_uuid(self.customer_uuid)
+
+
+class NPSCounterShard(models.Model):
+    survey_uuid = models.UUIDField(_('Survey UUID'), editable=False)
+    shard = models.PositiveSmallIntegerField(_('Shard'))
+    promoters = models.BigIntegerField(_('Promoters'), default=0)
+    passives = models.BigIntegerField(_('Passives'), default=0)
+    detractors = models.BigIntegerField(_('Detractors'), default=0)
+
+    class Meta:
+        verbose_name = _('NPS Counter Shard')
+        verbose_name_plural = _('NPS Counter Shards')
+        unique_together = ('survey_uuid', 'shard')
@@ -8,7 +8,6 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import empty
 from upkook_core.customers.serializers import CustomerSerializer
-from upkook_core.customers.services import CustomerService
 
 from cx_metrics.multiple_choices.serializers import (
     CachedMultipleChoiceSerializer,
@@ -16,10 +15,12 @@ from cx_metrics.multiple_choices.serializers import (
     MultipleChoiceRespondSerializer
 )
 from cx_metrics.surveys.decorators import register_survey_serializer
+from cx_metrics.surveys.factory import survey_factory
 from cx_metrics.surveys.models import Survey
+from cx_metrics.surveys.serializers import SurveyOptionResponsesQuerySerializer, SurveyRespondSerializerMixin
 from .models import NPSSurvey, NPSResponse
 from .services import NPSService
-from cx_metrics.surveys.services import SurveyInsightCacheService, SurveyService
+from cx_metrics.surveys.services import SurveyService
 
 
 @register_survey_serializer('NPS')
@@ -42,7 +43,7 @@ class OldNPSSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         obj = instance
         if isinstance(instance, Survey):
-            obj = NPSService.get_nps_survey(survey_id=instance.id)
+            obj = survey_factory.load(instance)
             if obj is None:
                 raise Http404
         return super(OldNPSSerializer, self).to_representation(obj)
@@ -52,7 +53,7 @@ class NPSSerializer(OldNPSSerializer):
 
     def __init__(self, instance=None, data=empty, **kwargs):
         if isinstance(instance, Survey):
-            instance = NPSService.get_nps_survey(survey_id=instance.id)
+            instance = survey_factory.load(instance)
         super(NPSSerializer, self).__init__(instance, data, **kwargs)
         contra = instance and instance.contra
         self.fields['contra_reason'] = CachedMultipleChoiceSerializer(source='contra', instance=contra)
@@ -82,6 +83,9 @@ class NPSSerializer(OldNPSSerializer):
 
 class NPSInsightsSerializer(serializers.ModelSerializer):
     id = serializers.UUIDField(source='uuid', read_only=True)
+    promoters = serializers.IntegerField(source='counters.promoters', read_only=True)
+    passives = serializers.IntegerField(source='counters.passives', read_only=True)
+    detractors = serializers.IntegerField(source='counters.detractors', read_only=True)
     contra_options = OptionTextSerializer(source='contra_response_option_texts', many=True)
 
     class Meta:
@@ -89,7 +93,17 @@ class NPSInsightsSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'promoters', 'passives', 'detractors', 'contra_options')
 
 
-class OldNPSRespondSerializer(serializers.ModelSerializer):
+class NPSResponseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NPSResponse
+        fields = ('id', 'customer_uuid', 'score', 'created')
+
+
+class NPSOptionResponsesQuerySerializer(SurveyOptionResponsesQuerySerializer):
+    group = serializers.ChoiceField(choices=NPSService.COUNTER_FIELDS, required=False)
+
+
+class OldNPSRespondSerializer(SurveyRespondSerializerMixin, serializers.ModelSerializer):
     customer = CustomerSerializer()
 
     class Meta:
@@ -107,46 +121,7 @@ class OldNPSRespondSerializer(serializers.ModelSerializer):
             'client_id': instance.customer.client_id
         }
 
-    def create(self, validated_data):
-        customer_data = validated_data.get('customer', {})
-
-        client_id = customer_data.get('client_id')
-        user_agent = validated_data.get('user_agent', None)
-
-        business = self.survey.business
-        if business.is_identified_by_email():
-            email = customer_data.get('email')
-            if not email:
-                raise ValidationError(_('Email is required'))
-            customer = CustomerService.identify_by_email(
-                business=self.survey.business, email=email, client_id=client_id, user_agent=user_agent
-            )
-        elif business.is_identified_by_mobile_number():
-            mobile_number = customer_data.get('mobile_number')
-            if not mobile_number:
-                raise ValidationError(_('Mobile number is required'))
-            customer = CustomerService.identify_by_mobile_number(
-                business=self.survey.business, mobile_number=mobile_number, client_id=client_id, user_agent=user_agent
-            )
-        elif business.is_identified_by_bizz_user_id():
-            bizz_user_id = customer_data.get('bizz_user_id')
-            if not bizz_user_id:
-                raise ValidationError(_('Business UserID is required'))
-            customer = CustomerService.identify_by_bizz_user_id(
-                business=self.survey.business, bizz_user_id=bizz_user_id, client_id=client_id, user_agent=user_agent
-            )
-        else:
-            customer = CustomerService.identify_anonymous(
-                business=self.survey.business, client_id=client_id
-            )
-        last_response = NPSService.get_last_response(customer)
-        if SurveyService.is_duplicate_response(last_response):
-            raise ValidationError(
-                {
-                    "non_field_errors": [_("You could not submit responses within specific time !")]
-                }
-            )
-
+    def respond(self, customer, validated_data):
         score = validated_data['score']
         contra_options = validated_data.get('contra_options')
         return NPSService.respond(
@@ -156,9 +131,20 @@ class OldNPSRespondSerializer(serializers.ModelSerializer):
             contra_options_ids=contra_options
         )
 
-    def save(self, **kwargs):
-        SurveyInsightCacheService.delete(self.survey.type, self.survey.uuid)
-        return super(OldNPSRespondSerializer, self).save(**kwargs)
+    def get_last_response(self, customer):
+        return NPSService.get_last_response(customer, self.survey.uuid)
+
+    def get_recent_customer_uuids(self, customer_uuids):
+        return NPSService.get_recent_customer_uuids(
+            customer_uuids, SurveyService.get_duplicate_block_start(), self.survey.uuid
+        )
+
+    def bulk_respond(self, entries):
+        responses = [
+            (customer.uuid, validated_data['score'], validated_data.get('contra_options'))
+            for customer, validated_data in entries
+        ]
+        return NPSService.bulk_respond(self.survey, responses)
 
 
 class NPSRespondSerializer(OldNPSRespondSerializer):
@@ -168,7 +154,9 @@ class NPSRespondSerializer(OldNPSRespondSerializer):
         c_kwargs = copy(kwargs)
         self.survey = c_kwargs.pop('survey')
         super(OldNPSRespondSerializer, self).__init__(instance, data, **c_kwargs)
-        self.fields["contra_options"] = MultipleChoiceRespondSerializer(mc_id=self.survey.contra_id, required=False)
+        self.fields["contra_options"] = MultipleChoiceRespondSerializer(
+            mc_id=self.survey.contra_id, contra=self.survey.contra, required=False
+        )
 
     class Meta:
         model = NPSResponse
@@ -1,16 +1,26 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+import time
+from itertools import chain
+
+from django.conf import settings
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Count, F, Q
 
 from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
-from ..models import NPSSurvey, NPSResponse
+from cx_metrics.surveys.models import SurveyRollup
+from cx_metrics.surveys.services import (
+    BufferedCounterService, ShardedCounterService, SurveyInsightCacheService, SurveyRollupService, SurveyService
+)
+from ..models import NPSSurvey, NPSResponse, NPSCounterShard
 
 
 class NPSService(object):
     PROMOTERS = 'promoters'
     PASSIVE = 'passives'
     DETRACTORS = 'detractors'
+    COUNTER_FIELDS = (PROMOTERS, PASSIVE, DETRACTORS)
+    COUNTER_BUFFER_KIND = 'nps'
 
     @staticmethod
     def create_nps_survey(name, business, text, question, message, text_enabled=True):
@@ -51,27 +61,314 @@ class NPSService(object):
         return NPSSurvey.objects.filter(uuid=survey_uuid).update(**kwargs)
 
     @staticmethod
-    def respond(survey, customer_uuid, score, contra_options_ids=None):
-        field_name = NPSService.PROMOTERS
+    def change_overall_scores(survey_uuid, amounts):
+        kwargs = {field_name: F(field_name) + amount for field_name, amount in amounts.items()}
+        return NPSSurvey.objects.filter(uuid=survey_uuid).update(**kwargs)
+
+    @staticmethod
+    def get_counter_shards(survey):
+        return ShardedCounterService.get_shard_count(getattr(survey, 'counter_shards', 0))
+
+    @staticmethod
+    def increment_counters(survey, amounts):
+        """
+        Add {field_name: amount} amounts to the survey counters, to one of
+        its counter shards when sharding is enabled or to the cache buffer
+        in write-behind mode. Returns the number of updated rows, 0 if the
+        survey does not exist.
+        """
+        if BufferedCounterService.is_enabled():
+            if not NPSSurvey.objects.filter(uuid=survey.uuid).exists():
+                return 0
+            amounts = NPSService.buffer_counters(survey.uuid, amounts)
+            if not amounts:
+                return 1
+
+        shards = NPSService.get_counter_shards(survey)
+        if ShardedCounterService.is_sharded(shards):
+            return ShardedCounterService.increment(
+                NPSCounterShard, shards, amounts,
+                parent=NPSSurvey.objects.filter(uuid=survey.uuid), survey_uuid=survey.uuid
+            )
+        return NPSService.change_overall_scores(survey.uuid, amounts)
+
+    @staticmethod
+    def get_counter_buffer_name(survey_uuid, field_name):
+        return '%s:%s' % (survey_uuid, field_name)
+
+    @staticmethod
+    def buffer_counters(survey_uuid, amounts):
+        """
+        Buffer the amounts in the cache and return the ones that could not be buffered
+        """
+        return {
+            field_name: amount for field_name, amount in amounts.items()
+            if not BufferedCounterService.increment(
+                NPSService.COUNTER_BUFFER_KIND, NPSService.get_counter_buffer_name(survey_uuid, field_name), amount
+            )
+        }
+
+    @staticmethod
+    def get_buffered_counters(survey_uuid):
+        return {
+            field_name: BufferedCounterService.get(
+                NPSService.COUNTER_BUFFER_KIND, NPSService.get_counter_buffer_name(survey_uuid, field_name)
+            )
+            for field_name in NPSService.COUNTER_FIELDS
+        }
+
+    @staticmethod
+    def flush_buffered_counters(batch_size=None):
+        """
+        Write the counter increments buffered in the cache to the database
+        and return the number of updated surveys.
+        """
+        kind = NPSService.COUNTER_BUFFER_KIND
+        batch_size = batch_size or int(settings.SURVEY_COUNTER_FLUSH_BATCH_SIZE)
+        if not BufferedCounterService.acquire_flush_lock(kind):
+            return 0
+
+        flushed = 0
+        try:
+            names = BufferedCounterService.pop_dirty_names(kind, batch_size)
+            while names:
+                amounts = {}
+                taken = set()
+                try:
+                    for name in names:
+                        amount = BufferedCounterService.take(kind, name)
+                        taken.add(name)
+                        if amount:
+                            survey_uuid, field_name = name.split(':')
+                            amounts.setdefault(survey_uuid, {})[field_name] = amount
+                except Exception:
+                    # Write what was taken already, the other names stay buffered
+                    BufferedCounterService.restore_dirty_names(kind, names - taken)
+                    NPSService.apply_buffered_counters(amounts)
+                    raise
+
+                NPSService.apply_buffered_counters(amounts)
+                flushed += len(amounts)
+                if len(names) < batch_size:
+                    break
+                names = BufferedCounterService.pop_dirty_names(kind, batch_size)
+        finally:
+            BufferedCounterService.release_flush_lock(kind)
+        return flushed
+
+    @staticmethod
+    def apply_buffered_counters(amounts):
+        try:
+            with transaction.atomic():
+                for survey_uuid, survey_amounts in amounts.items():
+                    NPSService.change_overall_scores(survey_uuid, survey_amounts)
+        except Exception:
+            for survey_uuid, survey_amounts in amounts.items():
+                NPSService.buffer_counters(survey_uuid, survey_amounts)
+            raise
+
+        for survey_uuid in amounts:
+            SurveyInsightCacheService.delete('NPS', survey_uuid)
+
+    @staticmethod
+    def count_responses(survey_uuid):
+        return NPSResponse.objects.filter(survey_uuid=survey_uuid).aggregate(
+            promoters=Count('id', filter=Q(score__gte=9)),
+            passives=Count('id', filter=Q(score__gte=7, score__lte=8)),
+            detractors=Count('id', filter=Q(score__lte=6)),
+        )
+
+    @staticmethod
+    def get_counters(survey):
+        """
+        Counters of the survey including counter shards and increments
+        still buffered in the cache.
+        """
+        buffered = NPSService.get_buffered_counters(survey.uuid)
+        return {field_name: count + buffered[field_name] for field_name, count in survey.counters.items()}
+
+    @staticmethod
+    def rebuild_counters(survey):
+        """
+        Recount the counters of the given survey from its responses, folding
+        counter shards and buffered increments into the survey row.
+        """
+        with transaction.atomic():
+            NPSSurvey.objects.select_for_update().filter(uuid=survey.uuid).only('id').first()
+            for field_name in NPSService.COUNTER_FIELDS:
+                BufferedCounterService.take(
+                    NPSService.COUNTER_BUFFER_KIND, NPSService.get_counter_buffer_name(survey.uuid, field_name)
+                )
+            NPSCounterShard.objects.filter(survey_uuid=survey.uuid).delete()
+            counts = NPSService.count_responses(survey.uuid)
+            NPSSurvey.objects.filter(uuid=survey.uuid).update(**counts)
+        SurveyInsightCacheService.delete('NPS', survey.uuid)
+        return counts
+
+    @staticmethod
+    def get_score_field_name(score):
         if score <= 6:
-            field_name = NPSService.DETRACTORS
+            return NPSService.DETRACTORS
         elif score <= 8:
-            field_name = NPSService.PASSIVE
+            return NPSService.PASSIVE
+        return NPSService.PROMOTERS
 
+    @staticmethod
+    def count_option_texts(option_texts):
+        texts = [option_text.text for option_text in option_texts]
+        return SurveyRollupService.count(SurveyRollup.DIMENSION_OPTION, texts)
+
+    @staticmethod
+    def respond(survey, customer_uuid, score, contra_options_ids=None):
+        field_name = NPSService.get_score_field_name(score)
+        contra_mask = 0
+        if contra_options_ids:
+            contra_mask = OptionResponseService.get_contra_mask(survey.contra, contra_options_ids)
+
+        started = time.time()
         with transaction.atomic():
-            rows = NPSService.change_overall_score(survey.uuid, field_name, 1)
+            rows = NPSService.increment_counters(survey, {field_name: 1})
             if rows > 0:
                 nps_response = NPSResponse.objects.create(
                     survey_uuid=survey.uuid,
                     customer_uuid=customer_uuid,
-                    score=score
+                    score=score,
+                    contra_mask=contra_mask
                 )
 
+                rollup_counts = SurveyRollupService.count(SurveyRollup.DIMENSION_SCORE, [score])
+                cross_tab_counts = {}
                 if contra_options_ids:
-                    OptionResponseService.store_option_response(survey.contra, customer_uuid, contra_options_ids)
-                return nps_response
-            return None
+                    option_texts = OptionResponseService.store_option_response(
+                        survey.contra, customer_uuid, contra_options_ids, NPSService.get_counter_shards(survey),
+                        mask=contra_mask, survey_response=nps_response, key=field_name
+                    )
+                    rollup_counts.update(NPSService.count_option_texts(option_texts))
+                    cross_tab_counts = OptionResponseService.count_cross_tabs([option_texts], [field_name])
+                SurveyRollupService.increment(
+                    survey.uuid, rollup_counts, nps_response.created, NPSService.get_counter_shards(survey)
+                )
+            else:
+                return None
+
+        NPSService.update_insights(survey.uuid, rollup_counts, cross_tab_counts, started)
+        return nps_response
+
+    @staticmethod
+    def backfill_rollups(survey):
+        """
+        Rebuild the score and contra option rollups of the survey from its responses
+        """
+        rows = list(SurveyRollupService.get_rows(
+            NPSResponse.objects.filter(survey_uuid=survey.uuid), SurveyRollup.DIMENSION_SCORE, 'score'
+        ))
+        if survey.contra_id:
+            rows.extend(SurveyRollupService.get_rows(
+                OptionResponseService.get_option_responses(survey.contra_id), SurveyRollup.DIMENSION_OPTION,
+                'option_text__text'
+            ))
+            rows.extend(SurveyRollupService.get_mask_rows(
+                NPSResponse.objects.filter(survey_uuid=survey.uuid), SurveyRollup.DIMENSION_OPTION,
+                OptionResponseService.get_option_texts_by_bit(survey.contra_id)
+            ))
+        SurveyRollupService.rebuild(survey.uuid, rows)
+        return len(rows)
+
+    @staticmethod
+    def get_last_response(customer, survey_uuid=None):
+        responses = NPSResponse.objects.filter(customer_uuid=customer.uuid)
+        if survey_uuid is not None:
+            responses = responses.filter(survey_uuid=survey_uuid)
+        return responses.order_by('-created').first()
+
+    @staticmethod
+    def get_recent_customer_uuids(customer_uuids, since, survey_uuid=None):
+        responses = NPSResponse.objects.filter(customer_uuid__in=customer_uuids, created__gt=since)
+        if survey_uuid is not None:
+            responses = responses.filter(survey_uuid=survey_uuid)
+        return responses.values_list('customer_uuid', flat=True).distinct()
 
     @staticmethod
-    def get_last_response(customer):
-        return NPSResponse.objects.filter(customer_uuid=customer.uuid).order_by('-created').first()
+    def bulk_respond(survey, responses):
+        """
+        Store (customer_uuid, score, contra_options_ids) tuples with a single
+        INSERT and apply their counter deltas with one UPDATE of the survey
+        or one of its counter shards.
+        Returns None for every response if the survey does not exist.
+        """
+        amounts = {}
+        nps_responses = []
+        for customer_uuid, score, contra_options_ids in responses:
+            field_name = NPSService.get_score_field_name(score)
+            amounts[field_name] = amounts.get(field_name, 0) + 1
+            contra_mask = 0
+            if contra_options_ids:
+                contra_mask = OptionResponseService.get_contra_mask(survey.contra, contra_options_ids)
+            nps_responses.append(NPSResponse(
+                survey_uuid=survey.uuid, customer_uuid=customer_uuid, score=score, contra_mask=contra_mask
+            ))
+
+        if not nps_responses:
+            return []
+
+        started = time.time()
+        with transaction.atomic():
+            rows = NPSService.increment_counters(survey, amounts)
+            if rows == 0:
+                return [None] * len(nps_responses)
+
+            nps_responses = NPSResponse.objects.bulk_create(nps_responses)
+            rollup_counts = SurveyRollupService.count(SurveyRollup.DIMENSION_SCORE, [item[1] for item in responses])
+            contra_responses = [
+                (customer_uuid, contra_options_ids)
+                for customer_uuid, _score, contra_options_ids in responses if contra_options_ids
+            ]
+            survey_responses = [response for response, item in zip(nps_responses, responses) if item[2]]
+            keys = [NPSService.get_score_field_name(item[1]) for item in responses if item[2]]
+            cross_tab_counts = {}
+            if contra_responses:
+                SurveyService.set_missing_response_ids(survey_responses)
+                option_texts = OptionResponseService.store_option_responses(
+                    survey.contra, contra_responses, NPSService.get_counter_shards(survey),
+                    [response.contra_mask for response in survey_responses], survey_responses, keys
+                )
+                rollup_counts.update(NPSService.count_option_texts(chain.from_iterable(option_texts)))
+                cross_tab_counts = OptionResponseService.count_cross_tabs(option_texts, keys)
+            SurveyRollupService.increment(survey.uuid, rollup_counts, shards=NPSService.get_counter_shards(survey))
+
+        NPSService.update_insights(survey.uuid, rollup_counts, cross_tab_counts, started)
+        return nps_responses
+
+    @staticmethod
+    def update_insights(survey_uuid, rollup_counts, cross_tab_counts=None, since=None):
+        """
+        Apply the score and contra option counts of new responses and their
+        {text: {group: amount}} cross tab counts to the cached insights of
+        the survey.
+        """
+        amounts = {}
+        option_amounts = {}
+        for (dimension, key), amount in rollup_counts.items():
+            if dimension == SurveyRollup.DIMENSION_SCORE:
+                field_name = NPSService.get_score_field_name(int(key))
+                amounts[field_name] = amounts.get(field_name, 0) + amount
+            elif dimension == SurveyRollup.DIMENSION_OPTION:
+                option_amounts[key] = amount
+
+        def update(data):
+            if any(field_name not in data for field_name in amounts):
+                # Cached with an older layout, recompute
+                return None
+            for field_name, amount in amounts.items():
+                data[field_name] += amount
+            if option_amounts:
+                data['contra_options'] = SurveyInsightCacheService.add_counts(
+                    data.get('contra_options'), 'text', option_amounts
+                )
+            if cross_tab_counts:
+                data['contra_options'] = SurveyInsightCacheService.add_breakdowns(
+                    data.get('contra_options'), cross_tab_counts
+                )
+            return data
+
+        SurveyInsightCacheService.update('NPS', survey_uuid, update, since)
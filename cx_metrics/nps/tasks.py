@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from celery import shared_task
+
+from .services import NPSService
+
+
+@shared_task
+def flush_nps_counters():
+    return NPSService.flush_buffered_counters()
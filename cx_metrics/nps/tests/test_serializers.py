@@ -2,7 +2,8 @@
 # vim: ai ts=4 sts=4 et sw=4
 from django.forms import model_to_dict
 from django.http import Http404
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from mock import patch
 from rest_framework.exceptions import ValidationError
 from upkook_core.businesses.models import Business, Settings
 from upkook_core.businesses.services import BusinessService
@@ -11,6 +12,7 @@ from upkook_core.customers.services import CustomerService
 from cx_metrics.multiple_choices.models import Option, MultipleChoice
 from cx_metrics.multiple_choices.services import MultipleChoiceService
 from cx_metrics.surveys.models import Survey
+from cx_metrics.surveys.services import SurveyResponseGuardCacheService
 from ..models import NPSSurvey, NPSResponse
 from ..serializers import OldNPSSerializer, NPSSerializer, OldNPSRespondSerializer, NPSRespondSerializer
 from ..services import NPSService
@@ -535,6 +537,13 @@ class NPSRespondSerializerV11TestCase(TestCase):
         serializer.is_valid()
         self.assertEqual(serializer.validated_data['contra_options'], [])
 
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }
+        }
+    )
     def test_duplicate_response(self):
         nps_survey = NPSService.get_nps_survey_by_id(1)
         mc = MultipleChoiceService.get_by_id(1)
@@ -561,3 +570,72 @@ class NPSRespondSerializerV11TestCase(TestCase):
             serializer.create,
             v_data
         )
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }
+        }
+    )
+    def test_duplicate_response_other_survey(self):
+        nps_survey = NPSService.get_nps_survey_by_id(1)
+        other_survey = NPSService.create_nps_survey(
+            name=self.id(),
+            business=nps_survey.business,
+            text="text",
+            question="question",
+            message="message"
+        )
+        customer = CustomerService.create_customer()
+        v_data = {
+            'customer': {
+                "client_id": customer.client_id
+            },
+            'score': 10,
+        }
+        NPSRespondSerializer(survey=nps_survey).create(v_data)
+        response = NPSRespondSerializer(survey=other_survey).create(v_data)
+
+        self.assertIsInstance(response, NPSResponse)
+        self.assertEqual(response.survey_uuid, other_survey.uuid)
+
+    def test_duplicate_response_cache_unavailable(self):
+        nps_survey = NPSService.get_nps_survey_by_id(1)
+        customer = CustomerService.create_customer()
+        v_data = {
+            'customer': {
+                "client_id": customer.client_id
+            },
+            'score': 10,
+        }
+        serializer = NPSRespondSerializer(survey=nps_survey)
+        with patch.object(SurveyResponseGuardCacheService, 'acquire', return_value=None):
+            self.assertIsInstance(serializer.create(v_data), NPSResponse)
+            self.assertRaisesMessage(
+                ValidationError,
+                "You could not submit responses within specific time !",
+                serializer.create,
+                v_data
+            )
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }
+        }
+    )
+    def test_duplicate_response_released_on_failure(self):
+        nps_survey = NPSService.get_nps_survey_by_id(1)
+        customer = CustomerService.create_customer()
+        v_data = {
+            'customer': {
+                "client_id": customer.client_id
+            },
+            'score': 10,
+        }
+        serializer = NPSRespondSerializer(survey=nps_survey)
+        with patch.object(NPSService, 'respond', return_value=None):
+            self.assertIsNone(serializer.create(v_data))
+        self.assertIsInstance(serializer.create(v_data), NPSResponse)
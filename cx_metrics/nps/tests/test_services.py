@@ -2,15 +2,23 @@
 # vim: ai ts=4 sts=4 et sw=4
 from uuid import uuid4
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from mock import patch
 from upkook_core.businesses.models import Business
 from upkook_core.businesses.services import BusinessService
 from upkook_core.customers.services import CustomerService
 from upkook_core.industries.services import IndustryService
 
-from cx_metrics.multiple_choices.models import MultipleChoice
-from ..models import NPSSurvey
+from cx_metrics.multiple_choices.models import MultipleChoice, Option, OptionText
+from cx_metrics.multiple_choices.services import MultipleChoiceService
+from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
+from cx_metrics.surveys.models import SurveyRollup
+from cx_metrics.surveys.services import BufferedCounterService, SurveyService
+from ..models import NPSSurvey, NPSResponse, NPSCounterShard
 from ..services import NPSService
+from ..tasks import flush_nps_counters
 
 
 class NPSSurveyServiceTestCase(TestCase):
@@ -130,3 +138,359 @@ class NPSSurveyServiceTestCase(TestCase):
         self.assertEqual(response.score, score)
         self.assertEqual(response.customer_uuid, customer.uuid)
         self.assertEqual(response.survey_uuid, nps_survey.uuid)
+
+    def test_bulk_respond(self):
+        nps_survey = self._create_survey(self.id())
+        customers = [CustomerService.create_customer() for i in range(3)]
+        scores = [10, 7, 3]
+
+        responses = NPSService.bulk_respond(
+            nps_survey, [(customer.uuid, score, None) for customer, score in zip(customers, scores)]
+        )
+
+        nps_survey.refresh_from_db()
+        self.assertEqual(nps_survey.promoters, 1)
+        self.assertEqual(nps_survey.passives, 1)
+        self.assertEqual(nps_survey.detractors, 1)
+        self.assertEqual(len(responses), 3)
+        self.assertEqual([response.score for response in responses], scores)
+        self.assertEqual(NPSResponse.objects.filter(survey_uuid=nps_survey.uuid).count(), 3)
+
+    def test_respond_rollups(self):
+        nps_survey = self._create_survey(self.id())
+        NPSService.respond(nps_survey, CustomerService.create_customer().uuid, 10)
+        NPSService.bulk_respond(nps_survey, [(CustomerService.create_customer().uuid, 10, None)])
+
+        rollups = SurveyRollup.objects.filter(survey_uuid=nps_survey.uuid, dimension=SurveyRollup.DIMENSION_SCORE)
+        self.assertEqual(
+            sorted(rollups.values_list('granularity', 'key', 'count')), [('D', '10', 2), ('H', '10', 2)]
+        )
+
+    def test_backfill_nps_rollups_command(self):
+        nps_survey = self._create_survey(self.id())
+        NPSService.respond(nps_survey, CustomerService.create_customer().uuid, 3)
+        SurveyRollup.objects.filter(survey_uuid=nps_survey.uuid).update(count=7)
+
+        call_command('backfill_nps_rollups', str(nps_survey.uuid))
+
+        rollups = SurveyRollup.objects.filter(survey_uuid=nps_survey.uuid)
+        self.assertEqual(sorted(rollups.values_list('granularity', 'key', 'count')), [('D', '3', 1), ('H', '3', 1)])
+
+    def test_bulk_respond_empty(self):
+        nps_survey = self._create_survey(self.id())
+        self.assertEqual(NPSService.bulk_respond(nps_survey, []), [])
+
+    def test_bulk_respond_survey_not_found(self):
+        nps = NPSSurvey(
+            name='test',
+            business=Business.objects.first(),
+            text='text',
+            question="question",
+            message="message",
+        )
+        responses = NPSService.bulk_respond(nps, [(uuid4(), 10, None), (uuid4(), 0, None)])
+        self.assertEqual(responses, [None, None])
+        self.assertFalse(NPSResponse.objects.filter(survey_uuid=nps.uuid).exists())
+
+    def test_get_recent_customer_uuids(self):
+        nps_survey = self._create_survey(self.id())
+        customer = CustomerService.create_customer()
+        NPSService.respond(nps_survey, customer.uuid, 10)
+
+        since = SurveyService.get_duplicate_block_start()
+        customer_uuids = NPSService.get_recent_customer_uuids([customer.uuid, uuid4()], since)
+        self.assertEqual(list(customer_uuids), [customer.uuid])
+
+    @override_settings(SURVEY_COUNTER_SHARDS=4)
+    def test_respond_sharded(self):
+        nps_survey = self._create_survey(self.id())
+        for score in (10, 9, 7, 2):
+            NPSService.respond(nps_survey, CustomerService.create_customer().uuid, score)
+
+        nps_survey = NPSService.get_nps_survey_by_uuid(nps_survey.uuid)
+        self.assertEqual((nps_survey.promoters, nps_survey.passives, nps_survey.detractors), (0, 0, 0))
+        self.assertEqual(nps_survey.counters, {'promoters': 2, 'passives': 1, 'detractors': 1})
+        self.assertLessEqual(NPSCounterShard.objects.filter(survey_uuid=nps_survey.uuid).count(), 4)
+
+    def test_respond_sharded_per_survey(self):
+        nps_survey = self._create_survey(self.id())
+        nps_survey.counter_shards = 2
+        nps_survey.save()
+        NPSService.respond(nps_survey, CustomerService.create_customer().uuid, 10)
+
+        nps_survey = NPSService.get_nps_survey_by_uuid(nps_survey.uuid)
+        self.assertEqual(nps_survey.promoters, 0)
+        self.assertEqual(nps_survey.counters['promoters'], 1)
+
+    @override_settings(SURVEY_COUNTER_SHARDS=4)
+    def test_respond_sharded_disabled_per_survey(self):
+        nps_survey = self._create_survey(self.id())
+        nps_survey.counter_shards = 1
+        nps_survey.save()
+        NPSService.respond(nps_survey, CustomerService.create_customer().uuid, 10)
+
+        nps_survey.refresh_from_db()
+        self.assertEqual(nps_survey.promoters, 1)
+        self.assertFalse(NPSCounterShard.objects.filter(survey_uuid=nps_survey.uuid).exists())
+
+    @override_settings(SURVEY_COUNTER_SHARDS=4)
+    def test_respond_sharded_survey_not_found(self):
+        nps_survey = self._create_survey(self.id())
+        NPSSurvey.objects.filter(pk=nps_survey.pk).delete()
+
+        self.assertIsNone(NPSService.respond(nps_survey, CustomerService.create_customer().uuid, 10))
+        self.assertFalse(NPSCounterShard.objects.filter(survey_uuid=nps_survey.uuid).exists())
+
+    @override_settings(SURVEY_COUNTER_SHARDS=4)
+    def test_bulk_respond_sharded(self):
+        nps_survey = self._create_survey(self.id())
+        responses = [(CustomerService.create_customer().uuid, score, None) for score in (10, 10, 0)]
+        NPSService.bulk_respond(nps_survey, responses)
+
+        nps_survey = NPSService.get_nps_survey_by_uuid(nps_survey.uuid)
+        self.assertEqual(nps_survey.counters, {'promoters': 2, 'passives': 0, 'detractors': 1})
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'counters',
+        }
+    },
+    SURVEY_COUNTER_WRITE_BEHIND=True
+)
+class NPSBufferedCountersTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'nps']
+
+    def setUp(self):
+        cache.clear()
+        self.nps_survey = NPSService.create_nps_survey(
+            name=self.id(),
+            business=Business.objects.first(),
+            text="text",
+            question="question",
+            message="message"
+        )
+
+    def test_respond(self):
+        for score in (10, 10, 0):
+            NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, score)
+
+        self.nps_survey.refresh_from_db()
+        self.assertEqual(self.nps_survey.promoters, 0)
+        self.assertEqual(
+            NPSService.get_counters(self.nps_survey), {'promoters': 2, 'passives': 0, 'detractors': 1}
+        )
+
+    def test_respond_cache_unavailable(self):
+        with patch.object(cache, 'incr', side_effect=ValueError):
+            NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10)
+
+        self.nps_survey.refresh_from_db()
+        self.assertEqual(self.nps_survey.promoters, 1)
+
+    def test_respond_survey_not_found(self):
+        NPSSurvey.objects.filter(pk=self.nps_survey.pk).delete()
+        self.assertIsNone(NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10))
+
+    def test_flush_buffered_counters(self):
+        NPSService.bulk_respond(self.nps_survey, [(CustomerService.create_customer().uuid, 8, None)])
+
+        self.assertEqual(NPSService.flush_buffered_counters(), 1)
+        self.nps_survey.refresh_from_db()
+        self.assertEqual(self.nps_survey.passives, 1)
+        self.assertEqual(NPSService.get_buffered_counters(self.nps_survey.uuid)['passives'], 0)
+        self.assertEqual(NPSService.flush_buffered_counters(), 0)
+
+    def test_flush_buffered_counters_mark_dirty_fails(self):
+        NPSService.bulk_respond(self.nps_survey, [
+            (CustomerService.create_customer().uuid, score, None) for score in (10, 8, 0)
+        ])
+
+        with patch.object(cache, 'decr', return_value=1), \
+                patch.object(BufferedCounterService, 'mark_dirty', side_effect=ValueError):
+            self.assertEqual(NPSService.flush_buffered_counters(), 1)
+
+        self.assertEqual(
+            NPSSurvey.objects.get(pk=self.nps_survey.pk).counters, {'promoters': 1, 'passives': 1, 'detractors': 1}
+        )
+
+    def test_flush_buffered_counters_take_fails(self):
+        NPSService.bulk_respond(self.nps_survey, [
+            (CustomerService.create_customer().uuid, score, None) for score in (10, 8, 0)
+        ])
+        take = BufferedCounterService.take
+        calls = []
+
+        def take_or_fail(kind, name):
+            calls.append(name)
+            if len(calls) == 2:
+                raise RuntimeError
+            return take(kind, name)
+
+        with patch.object(BufferedCounterService, 'take', side_effect=take_or_fail):
+            with self.assertRaises(RuntimeError):
+                NPSService.flush_buffered_counters()
+
+        self.assertEqual(sum(NPSSurvey.objects.get(pk=self.nps_survey.pk).counters.values()), 1)
+        self.assertEqual(NPSService.flush_buffered_counters(), 1)
+        self.assertEqual(
+            NPSSurvey.objects.get(pk=self.nps_survey.pk).counters, {'promoters': 1, 'passives': 1, 'detractors': 1}
+        )
+
+    def test_flush_buffered_counters_locked(self):
+        NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10)
+        BufferedCounterService.acquire_flush_lock(NPSService.COUNTER_BUFFER_KIND)
+
+        self.assertEqual(NPSService.flush_buffered_counters(), 0)
+        self.nps_survey.refresh_from_db()
+        self.assertEqual(self.nps_survey.promoters, 0)
+
+    def test_flush_nps_counters_task(self):
+        NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10)
+        flush_nps_counters.delay()
+
+        self.nps_survey.refresh_from_db()
+        self.assertEqual(self.nps_survey.promoters, 1)
+
+    def test_rebuild_nps_counters_command(self):
+        NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10)
+        call_command('rebuild_nps_counters', str(self.nps_survey.uuid), '--check')
+
+        NPSSurvey.objects.filter(pk=self.nps_survey.pk).update(detractors=3)
+        self.assertRaises(
+            CommandError, call_command, 'rebuild_nps_counters', str(self.nps_survey.uuid), '--check'
+        )
+
+        call_command('rebuild_nps_counters', str(self.nps_survey.uuid))
+        self.nps_survey.refresh_from_db()
+        self.assertEqual((self.nps_survey.promoters, self.nps_survey.detractors), (1, 0))
+        self.assertEqual(NPSService.get_buffered_counters(self.nps_survey.uuid)['promoters'], 0)
+
+
+@override_settings(SURVEY_CONTRA_MASK_STORAGE=True)
+class NPSContraMaskTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'nps']
+
+    def setUp(self):
+        self.contra = MultipleChoiceService.create(text=self.id(), type_=MultipleChoice.TYPE_CHECKBOX)
+        MultipleChoiceService.create_options(self.contra, [{'text': 'option %d' % index} for index in range(3)])
+        self.options = list(self.contra.options.order_by('bit'))
+        self.nps_survey = NPSService.create_nps_survey(
+            name=self.id(),
+            business=Business.objects.first(),
+            text="text",
+            question="question",
+            message="message"
+        )
+        self.nps_survey.contra = self.contra
+        self.nps_survey.save()
+
+    def get_option_text_counts(self):
+        return dict(OptionText.objects.filter(multiple_choice=self.contra).values_list('text', 'count'))
+
+    def test_respond(self):
+        response = NPSService.respond(
+            self.nps_survey, CustomerService.create_customer().uuid, 10, [self.options[0].id, self.options[2].id]
+        )
+
+        self.assertEqual(response.contra_mask, 0b101)
+        self.assertEqual(NPSResponse.objects.get(pk=response.pk).contra_mask, 0b101)
+        self.assertFalse(OptionResponseService.get_option_responses(self.contra.id).exists())
+        self.assertEqual(self.get_option_text_counts(), {'option 0': 1, 'option 2': 1})
+        rollups = SurveyRollup.objects.filter(
+            survey_uuid=self.nps_survey.uuid, dimension=SurveyRollup.DIMENSION_OPTION
+        )
+        self.assertEqual(rollups.count(), 4)
+
+    def test_respond_radio(self):
+        MultipleChoice.objects.filter(pk=self.contra.pk).update(type=MultipleChoice.TYPE_RADIO)
+        self.nps_survey.contra.type = MultipleChoice.TYPE_RADIO
+
+        response = NPSService.respond(
+            self.nps_survey, CustomerService.create_customer().uuid, 10, [self.options[0].id]
+        )
+
+        self.assertEqual(response.contra_mask, 0)
+        self.assertEqual(OptionResponseService.get_option_responses(self.contra.id).count(), 1)
+
+    def test_bulk_respond(self):
+        responses = NPSService.bulk_respond(self.nps_survey, [
+            (CustomerService.create_customer().uuid, 10, [self.options[1].id]),
+            (CustomerService.create_customer().uuid, 3, None),
+            (CustomerService.create_customer().uuid, 7, [self.options[0].id, self.options[1].id]),
+        ])
+
+        self.assertEqual([response.contra_mask for response in responses], [0b10, 0, 0b11])
+        self.assertFalse(OptionResponseService.get_option_responses(self.contra.id).exists())
+        self.assertEqual(self.get_option_text_counts(), {'option 0': 1, 'option 1': 2})
+
+    def test_get_mask_counts(self):
+        for option_ids in ([self.options[0].id], [self.options[0].id, self.options[1].id]):
+            NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10, option_ids)
+
+        self.assertEqual(OptionResponseService.get_mask_counts(self.contra), {'option 0': 2, 'option 1': 1})
+        call_command('rebuild_option_text_counters', '--check')
+
+    def test_rebuild_option_text_count(self):
+        NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10, [self.options[0].id])
+        option_text = OptionText.objects.get(multiple_choice=self.contra, text='option 0')
+        OptionText.objects.filter(pk=option_text.pk).update(count=5)
+
+        self.assertEqual(OptionResponseService.rebuild_option_text_count(option_text), 1)
+
+    def test_backfill_rollups(self):
+        NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10, [self.options[0].id])
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=False):
+            NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10, [self.options[0].id])
+        rollups = SurveyRollup.objects.filter(
+            survey_uuid=self.nps_survey.uuid, dimension=SurveyRollup.DIMENSION_OPTION
+        )
+        rollups.update(count=7)
+
+        NPSService.backfill_rollups(self.nps_survey)
+
+        self.assertEqual(
+            sorted(rollups.values_list('granularity', 'key', 'count')), [('D', 'option 0', 2), ('H', 'option 0', 2)]
+        )
+
+    def test_reuse_bits_not_in_masks(self):
+        NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 10, [self.options[1].id])
+        MultipleChoice.objects.filter(pk=self.contra.pk).update(next_bit=Option.MAX_BIT + 1)
+        MultipleChoiceService.delete_options(self.contra, [self.options[1].id, self.options[2].id])
+
+        options = MultipleChoiceService.create_options(self.contra, [{'text': 'new'}])
+
+        self.assertEqual(options[0].bit, 2)
+
+    def test_convert_assigns_bits(self):
+        self.contra.options.update(bit=None)
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=False):
+            response = NPSService.respond(
+                self.nps_survey, CustomerService.create_customer().uuid, 10, [self.options[0].id]
+            )
+
+        call_command('convert_contra_masks', 'NPS', verbosity=0)
+
+        response.refresh_from_db()
+        bit = self.contra.options.get(pk=self.options[0].pk).bit
+        self.assertIsNotNone(bit)
+        self.assertEqual(response.contra_mask, 1 << bit)
+
+    def test_convert_contra_masks_command(self):
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=False):
+            response = NPSService.respond(
+                self.nps_survey, CustomerService.create_customer().uuid, 10, [self.options[1].id, self.options[2].id]
+            )
+            other = NPSService.respond(self.nps_survey, CustomerService.create_customer().uuid, 3)
+
+        call_command('convert_contra_masks', 'NPS', verbosity=0)
+
+        response.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(response.contra_mask, 0b110)
+        self.assertEqual(other.contra_mask, 0)
+        self.assertFalse(OptionResponseService.get_option_responses(self.contra.id).exists())
+        self.assertEqual(self.get_option_text_counts(), {'option 1': 1, 'option 2': 1})
+        call_command('rebuild_option_text_counters', '--check')
@@ -2,10 +2,14 @@
 # vim: ai ts=4 sts=4 et sw=4
 import json
 
+from django.conf import settings
+from django.db import connection
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.forms import model_to_dict
 from mock import patch
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.encoding import force_text
 from rest_framework import status
@@ -17,6 +21,8 @@ from upkook_core.teams.tests import MemberPermissionTestMixin
 from cx_metrics.multiple_choices.models import MultipleChoice
 from cx_metrics.multiple_choices.services import MultipleChoiceService
 from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
+from cx_metrics.tests.budgets import QueryBudgetTestMixin
+from ..models import NPSResponse
 from ..services.nps import NPSService
 from ..serializers import NPSInsightsSerializer
 
@@ -46,7 +52,7 @@ class NPSViewTestBase(MemberPermissionTestMixin, TestCase):
         self.remove_member_permissions(self.member, self.group)
 
 
-class NPSSurveyTestCase(NPSViewTestBase):
+class NPSSurveyTestCase(QueryBudgetTestMixin, NPSViewTestBase):
     def test_post(self):
         data = {
             "name": "NPS_name",
@@ -80,6 +86,44 @@ class NPSSurveyTestCase(NPSViewTestBase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(['This field is required.'], response_data['text'])
 
+    def test_post_query_budget(self):
+        nps = NPSService.get_nps_survey_by_id(1)
+        data = {
+            "score": 10,
+            "customer": {
+                "client_id": CustomerService.create_customer().client_id
+            }
+        }
+
+        url = reverse('cx-nps:responses-create', kwargs={'uuid': str(nps.uuid)})
+        with self.assertQueryBudget('cx-nps:responses-create'):
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'snapshots',
+            }
+        }
+    )
+    def test_post_cached_survey(self):
+        nps = NPSService.get_nps_survey_by_id(1)
+        url = reverse('cx-nps:responses-create', kwargs={'uuid': str(nps.uuid)})
+        for _i in range(2):
+            data = {
+                "score": 10,
+                "customer": {
+                    "client_id": CustomerService.create_customer().client_id
+                }
+            }
+            with patch.object(NPSService, 'get_nps_survey_by_uuid', wraps=NPSService.get_nps_survey_by_uuid) as m:
+                response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertFalse(m.called)
+
     def test_post_v11(self):
         data = {
             "name": "NPS_name",
@@ -184,8 +228,70 @@ class NPSSurveyTestCase(NPSViewTestBase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(data, response_data)
 
+    def get_contra_options_put(self, count):
+        """
+        Create a survey with count contra options and return it with the URL
+        and data of a PUT changing, adding and deleting options.
+        """
+        nps = NPSService.create_nps_survey(
+            name="name", business=self.business, text="text", question="question", message="message"
+        )
+        nps.contra = MultipleChoiceService.create(text='Why?')
+        nps.save()
+        options = MultipleChoiceService.create_options(nps.contra, [
+            {'text': 'Option %d' % i, 'order': i} for i in range(count)
+        ])
+
+        options_data = [{"id": options[0].id, "text": "Option 0", "order": 0, "delete_option": True}]
+        options_data.extend({"id": option.id, "text": "Changed %d" % option.order, "order": option.order}
+                            for option in options[1:])
+        options_data.extend({"text": "New %d" % i, "order": count + i} for i in range(count))
+        data = {
+            "name": "name",
+            "text": "text",
+            "question": "question",
+            "message": "message",
+            "contra_reason": {"text": "Why not?", "options": options_data},
+        }
+        return nps, reverse('cx-nps:retrieve', kwargs={'uuid': str(nps.uuid)}), data
+
+    def put_v11(self, url, data):
+        return self.client.put(
+            url,
+            data=json.dumps(data),
+            content_type='application/json',
+            HTTP_ACCEPT='application/json; version=1.1',
+        )
+
+    def test_put_contra_options(self):
+        nps, url, data = self.get_contra_options_put(3)
+        response = self.put_v11(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        options = list(nps.contra.options.order_by('order').values_list('text', flat=True))
+        self.assertEqual(options, ['Changed 1', 'Changed 2', 'New 0', 'New 1', 'New 2'])
+
+    def test_put_contra_options_query_budget(self):
+        # Warm up the content type and permission caches
+        _nps, url, data = self.get_contra_options_put(2)
+        self.put_v11(url, data)
+
+        executed = []
+        for count in (2, 10):
+            _nps, url, data = self.get_contra_options_put(count)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.put_v11(url, data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            executed.append(len(queries))
+        self.assertEqual(executed[0], executed[1])
+
+        _nps, url, data = self.get_contra_options_put(10)
+        with self.assertQueryBudget('PUT cx-nps:retrieve'):
+            response = self.put_v11(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
 
-class NPSInsightsViewTestCase(NPSViewTestBase):
+class NPSInsightsViewTestCase(QueryBudgetTestMixin, NPSViewTestBase):
 
     def test_get(self):
         nps = NPSService.create_nps_survey(
@@ -267,8 +373,177 @@ class NPSInsightsViewTestCase(NPSViewTestBase):
         response_data.pop('contra_options')
         self.assertDictEqual(expected_data, response_data)
 
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'nps-insights',
+            }
+        }
+    )
+    def test_get_cached_after_responses(self):
+        cache.clear()
+        nps = NPSService.create_nps_survey(
+            name="name",
+            business=self.business,
+            text="text",
+            question="question",
+            message="message"
+        )
+        nps.contra = MultipleChoice.objects.first()
+        nps.save()
+        option_ids = list(nps.contra.options.values_list('id', flat=True))
+
+        url = reverse('cx-nps:insights', kwargs={'uuid': str(nps.uuid)})
+        self.client.get(url)
+        NPSService.respond(nps, CustomerService.create_customer().uuid, 10, option_ids)
+        NPSService.respond(nps, CustomerService.create_customer().uuid, 3, option_ids[:1])
+
+        with patch.object(NPSInsightsSerializer, 'to_representation') as mock_to_representation:
+            response = self.client.get(url)
+            self.assertFalse(mock_to_representation.called)
+
+        nps.refresh_from_db()
+        expected_data = json.loads(json.dumps(NPSInsightsSerializer(nps).data))
+        self.assertEqual(json.loads(force_text(response.content)), expected_data)
+        self.assertEqual((expected_data['promoters'], expected_data['detractors']), (1, 1))
+
+    def test_get_query_budget(self):
+        nps = NPSService.create_nps_survey(
+            name="name",
+            business=self.business,
+            text="text",
+            question="question",
+            message="message"
+        )
+        nps.contra = MultipleChoice.objects.first()
+        nps.save()
+
+        url = reverse('cx-nps:insights', kwargs={'uuid': str(nps.uuid)})
+        with self.assertQueryBudget('cx-nps:insights'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class NPSTimeseriesViewTestCase(NPSViewTestBase):
+    def test_get(self):
+        nps = NPSService.create_nps_survey(
+            name="name", business=self.business, text="text", question="question", message="message"
+        )
+        NPSService.respond(nps, CustomerService.create_customer().uuid, 9)
+
+        url = reverse('cx-nps:insights-timeseries', kwargs={'uuid': str(nps.uuid)})
+        response = self.client.get(url, {'granularity': 'H'})
 
-class NPSResponseAPIViewTestCase(TestCase):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response_data = json.loads(force_text(response.content))
+        self.assertEqual(response_data['id'], str(nps.uuid))
+        self.assertEqual(response_data['granularity'], 'H')
+        self.assertEqual(len(response_data['results']), 1)
+        self.assertEqual(response_data['results'][0]['score'], {'9': 1})
+
+    def test_get_invalid_range(self):
+        nps = NPSService.create_nps_survey(
+            name="name", business=self.business, text="text", question="question", message="message"
+        )
+        url = reverse('cx-nps:insights-timeseries', kwargs={'uuid': str(nps.uuid)})
+        response = self.client.get(url, {'from': '2019-02-01T00:00:00Z', 'to': '2019-01-01T00:00:00Z'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NPSResponseExportViewTestCase(NPSViewTestBase):
+    def setUp(self):
+        super(NPSResponseExportViewTestCase, self).setUp()
+        self.nps = NPSService.create_nps_survey(
+            name="name", business=self.business, text="text", question="question", message="message"
+        )
+        self.customer = CustomerService.create_customer()
+        NPSService.respond(self.nps, self.customer.uuid, 9)
+        self.url = reverse('cx-nps:responses-export', kwargs={'uuid': str(self.nps.uuid)})
+
+    def test_get_csv(self):
+        response = self.client.get(self.url)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertEqual(lines[0], 'created,customer_uuid,score,contra_options')
+        self.assertTrue(lines[1].endswith(',%s,9,' % self.customer.uuid))
+
+    def test_get_ndjson(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(json.loads(lines[0])['score'], 9)
+
+    def test_get_period(self):
+        response = self.client.get(self.url, {'format': 'ndjson', 'to': '2019-01-01T00:00:00Z'})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_get_invalid_format(self):
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(SURVEY_CONTRA_MASK_STORAGE=True)
+class NPSOptionResponsesViewTestCase(NPSViewTestBase):
+    def setUp(self):
+        super(NPSOptionResponsesViewTestCase, self).setUp()
+        self.nps = NPSService.create_nps_survey(
+            name="name", business=self.business, text="text", question="question", message="message"
+        )
+        self.nps.contra = MultipleChoiceService.create(text=self.id(), type_=MultipleChoice.TYPE_CHECKBOX)
+        self.nps.save()
+        MultipleChoiceService.create_options(self.nps.contra, [{'text': 'a'}, {'text': 'b'}])
+        self.options = list(self.nps.contra.options.order_by('bit'))
+
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=False):
+            self.responses = [
+                NPSService.respond(self.nps, CustomerService.create_customer().uuid, 3, [self.options[0].id]),
+                NPSService.respond(self.nps, CustomerService.create_customer().uuid, 10, [self.options[1].id]),
+                NPSService.respond(self.nps, CustomerService.create_customer().uuid, 9, [self.options[0].id]),
+            ]
+        self.responses.append(
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 5, [self.options[0].id])
+        )
+        self.url = reverse('cx-nps:insights-option-responses', kwargs={'uuid': str(self.nps.uuid)})
+
+    def get_ids(self, response):
+        return [item['id'] for item in json.loads(force_text(response.content))['results']]
+
+    def test_get(self):
+        response = self.client.get(self.url, {'option': 'a'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.get_ids(response), [self.responses[3].id, self.responses[2].id, self.responses[0].id]
+        )
+
+    def test_get_group(self):
+        response = self.client.get(self.url, {'option': 'a', 'group': 'detractors'})
+        self.assertEqual(self.get_ids(response), [self.responses[3].id, self.responses[0].id])
+
+    @override_settings(SURVEY_OPTION_RESPONSES_PAGE_SIZE=2)
+    def test_get_next_page(self):
+        response = self.client.get(self.url, {'option': 'a'})
+        response_data = json.loads(force_text(response.content))
+        self.assertEqual(len(response_data['results']), 2)
+
+        response = self.client.get(response_data['next'])
+        self.assertEqual(self.get_ids(response), [self.responses[0].id])
+
+    def test_get_option_not_found(self):
+        response = self.client.get(self.url, {'option': 'c'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_option_required(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NPSResponseAPIViewTestCase(QueryBudgetTestMixin, TestCase):
     fixtures = ['industries', 'businesses', 'nps']
 
     def test_post(self):
@@ -332,3 +607,110 @@ class NPSResponseAPIViewTestCase(TestCase):
         url = reverse('cx-nps:responses-create', kwargs={'uuid': none_uuid})
         response = self.client.post(url, data=json.dumps(data), content_type='application/json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class NPSBulkResponseAPIViewTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'nps']
+
+    def setUp(self):
+        self.nps = NPSService.get_nps_survey_by_id(1)
+        self.url = reverse('cx-nps:responses-bulk-create', kwargs={'uuid': str(self.nps.uuid)})
+
+    def test_post(self):
+        customer = CustomerService.create_customer()
+        other = CustomerService.create_customer()
+        data = {
+            'responses': [
+                {'score': 10, 'customer': {'client_id': customer.client_id}},
+                {'score': 11, 'customer': {'client_id': other.client_id}},
+                {'score': 3, 'customer': {'client_id': customer.client_id}},
+                {'score': 7, 'customer': {'client_id': other.client_id}},
+            ]
+        }
+        response = self.client.post(self.url, data=json.dumps(data), content_type='application/json')
+        response_data = json.loads(force_text(response.content))
+        results = response_data['results']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in results], [201, 400, 400, 201])
+        self.assertEqual(results[0]['data'], {'score': 10, 'client_id': customer.client_id})
+        self.assertIn('score', results[1]['errors'])
+        self.assertEqual(
+            results[2]['errors'],
+            {'non_field_errors': ['You could not submit responses within specific time !']}
+        )
+
+        promoters, passives, detractors = self.nps.promoters, self.nps.passives, self.nps.detractors
+        self.nps.refresh_from_db()
+        self.assertEqual(self.nps.promoters, promoters + 1)
+        self.assertEqual(self.nps.passives, passives + 1)
+        self.assertEqual(self.nps.detractors, detractors)
+
+    def test_post_list(self):
+        customer = CustomerService.create_customer()
+        data = [{'score': 10, 'customer': {'client_id': customer.client_id}}]
+        response = self.client.post(self.url, data=json.dumps(data), content_type='application/json')
+        response_data = json.loads(force_text(response.content))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_data['results'][0]['status'], status.HTTP_201_CREATED)
+
+    def test_post_not_list(self):
+        data = {'responses': {'score': 10}}
+        response = self.client.post(self.url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RESPONSE_BULK_MAX_SIZE=1)
+    def test_post_too_many_responses(self):
+        data = {'responses': [{'score': 10}, {'score': 9}]}
+        response = self.client.post(self.url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_post_survey_not_found(self):
+        url = reverse('cx-nps:responses-bulk-create', kwargs={'uuid': '76440add-0243-4eb0-a985-7c573bb2d101'})
+        response = self.client.post(url, data=json.dumps([]), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(RESPONSE_ASYNC_INGESTION=True)
+class NPSAsyncResponseAPIViewTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'nps']
+
+    def setUp(self):
+        self.nps = NPSService.get_nps_survey_by_id(1)
+
+    def test_post(self):
+        responses = NPSResponse.objects.filter(survey_uuid=self.nps.uuid)
+        count = responses.count()
+        url = reverse('cx-nps:responses-create', kwargs={'uuid': str(self.nps.uuid)})
+        response = self.client.post(url, data=json.dumps({'score': 10}), content_type='application/json')
+        response_data = json.loads(force_text(response.content))
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.client.cookies.get(settings.CLIENT_ID_COOKIE_NAME).value, response_data['client_id'])
+        self.assertEqual(responses.count(), count + 1)
+
+    def test_post_invalid(self):
+        url = reverse('cx-nps:responses-create', kwargs={'uuid': str(self.nps.uuid)})
+        with patch('cx_metrics.surveys.views.api.ingest_survey_responses') as mock_task:
+            response = self.client.post(url, data=json.dumps({'score': 11}), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(mock_task.delay.called)
+
+    @override_settings(RESPONSE_ASYNC_BATCH_SIZE=2)
+    def test_post_bulk(self):
+        url = reverse('cx-nps:responses-bulk-create', kwargs={'uuid': str(self.nps.uuid)})
+        data = [
+            {'score': 10, 'customer': {'client_id': CustomerService.create_customer().client_id}},
+            {'score': 11},
+            {'score': 7, 'customer': {'client_id': CustomerService.create_customer().client_id}},
+            {'score': 3, 'customer': {'client_id': CustomerService.create_customer().client_id}},
+        ]
+        with patch('cx_metrics.surveys.views.api.ingest_survey_responses') as mock_task:
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        response_data = json.loads(force_text(response.content))
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual([result['status'] for result in response_data['results']], [202, 400, 202, 202])
+        self.assertEqual(mock_task.delay.call_count, 2)
@@ -2,7 +2,10 @@
 # vim: ai ts=4 sts=4 et sw=4
 from django.urls import path
 
-from ..views.api import NPSAPIView, NPSInsightsView, NPSResponseAPIView
+from ..views.api import (
+    NPSAPIView, NPSInsightsView, NPSResponseAPIView, NPSBulkResponseAPIView, NPSTimeseriesView, NPSResponseExportView,
+    NPSOptionResponsesView,
+)
 
 app_name = 'nps'
 
@@ -10,5 +13,12 @@ urlpatterns = [
     path('', NPSAPIView.as_view({'post': 'create'}), name='create'),
     path('<uuid:uuid>/', NPSAPIView.as_view({'get': 'retrieve', 'put': 'update'}), name='retrieve'),
     path('<uuid:uuid>/responses/', NPSResponseAPIView.as_view(), name='responses-create'),
-    path('<uuid:uuid>/insights/', NPSInsightsView.as_view(), name='insights')
+    path('<uuid:uuid>/responses/export/', NPSResponseExportView.as_view(), name='responses-export'),
+    path('<uuid:uuid>/responses/bulk/', NPSBulkResponseAPIView.as_view(), name='responses-bulk-create'),
+    path('<uuid:uuid>/insights/', NPSInsightsView.as_view(), name='insights'),
+    path('<uuid:uuid>/insights/timeseries/', NPSTimeseriesView.as_view(), name='insights-timeseries'),
+    path(
+        '<uuid:uuid>/insights/options/responses/', NPSOptionResponsesView.as_view(),
+        name='insights-option-responses'
+    ),
 ]
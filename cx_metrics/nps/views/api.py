@@ -6,12 +6,17 @@ from rest_framework.filters import OrderingFilter
 from rest_framework.viewsets import ModelViewSet
 from upkook_core.auth.permissions import BusinessMemberPermissions
 
-from cx_metrics.surveys.views.api import SurveyResponseAPIView, SurveyInsightsView
+from cx_metrics.surveys.views.api import (
+    SurveyResponseAPIView, SurveyInsightsView, SurveyBulkResponseMixin, SurveyTimeseriesView,
+    SurveyResponseExportView, SurveyOptionResponsesView,
+)
 from ..serializers import (
     OldNPSSerializer, NPSSerializer,
     NPSInsightsSerializer,
-    OldNPSRespondSerializer, NPSRespondSerializer
+    OldNPSRespondSerializer, NPSRespondSerializer,
+    NPSResponseSerializer, NPSOptionResponsesQuerySerializer,
 )
+from ..models import NPSResponse
 from ..services.nps import NPSService
 
 
@@ -57,17 +62,69 @@ class NPSInsightsView(SurveyInsightsView):
         return NPSService.get_nps_surveys_by_business(self.request.user.business_id)
 
 
+@method_decorator(cache_control(private=True, max_age=1 * 60), name='get')  # 1 minute
+class NPSTimeseriesView(SurveyTimeseriesView):
+    permission_classes = (
+        BusinessMemberPermissions('nps', 'npssurvey'),
+    )
+
+    def get_queryset(self):
+        return NPSService.get_nps_surveys_by_business(self.request.user.business_id)
+
+
 @method_decorator(cache_control(private=True), name='post')
 @method_decorator(never_cache, name='post')
 class NPSResponseAPIView(SurveyResponseAPIView):
+    survey_type = 'NPS'
     serializer_class = OldNPSRespondSerializer
     filter_backends = (OrderingFilter,)
     ordering = ('-updated',)
 
-    def get_survey(self):
-        return NPSService.get_nps_survey_by_uuid(self.kwargs['uuid'])
+    def load_survey(self, survey_uuid):
+        return NPSService.get_nps_survey_by_uuid(survey_uuid)
 
     def get_serializer_class(self):
         if self.request.version >= '1.1':
             return NPSRespondSerializer
         return self.serializer_class
+
+
+@method_decorator(cache_control(private=True), name='post')
+@method_decorator(never_cache, name='post')
+class NPSBulkResponseAPIView(SurveyBulkResponseMixin, NPSResponseAPIView):
+    pass
+
+
+@method_decorator(cache_control(private=True), name='get')
+@method_decorator(never_cache, name='get')
+class NPSResponseExportView(SurveyResponseExportView):
+    response_field_name = 'score'
+    permission_classes = (
+        BusinessMemberPermissions('nps', 'npssurvey'),
+    )
+
+    def get_queryset(self):
+        return NPSService.get_nps_surveys_by_business(self.request.user.business_id)
+
+    def get_responses(self, survey):
+        return NPSResponse.objects.filter(survey_uuid=survey.uuid)
+
+
+@method_decorator(cache_control(private=True), name='get')
+@method_decorator(never_cache, name='get')
+class NPSOptionResponsesView(SurveyOptionResponsesView):
+    serializer_class = NPSResponseSerializer
+    query_serializer_class = NPSOptionResponsesQuerySerializer
+    permission_classes = (
+        BusinessMemberPermissions('nps', 'npssurvey'),
+    )
+
+    def get_surveys(self):
+        return NPSService.get_nps_surveys_by_business(self.request.user.business_id)
+
+    def filter_responses(self, responses, params):
+        group = params.get('group')
+        if group is None:
+            return responses
+        scores = [score for score in range(11) if NPSService.get_score_field_name(score) == group]
+        return responses.filter(score__in=scores)
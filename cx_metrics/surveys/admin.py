@@ -25,6 +25,16 @@ class SurveyAdminBase(admin.ModelAdmin):
         obj.author = request.user
         super(SurveyAdminBase, self).save_model(request, obj, form, change)
 
+    def delete_queryset(self, request, queryset):
+        """
+        Delete the selected surveys in chunks rather than loading all of them
+        at once, see SurveyModelQuerySet.delete_chunked()
+        """
+        if hasattr(queryset, 'delete_chunked'):
+            queryset.delete_chunked()
+        else:
+            super(SurveyAdminBase, self).delete_queryset(request, queryset)
+
 
 @admin.register(Survey)
 class SurveyAdmin(SurveyAdminBase):
@@ -15,3 +15,8 @@ class SurveyAppConfig(AppConfig):
         for name in dir(app_settings):
             if name.isupper() and not hasattr(settings, name):
                 setattr(settings, name, getattr(app_settings, name))
+
+        # Do not connect signals when running tests
+        if not settings.TEST:  # pragma: no cover
+            from .signals import manage_business_signal_receivers  # NOQA
+            manage_business_signal_receivers(connect=True)
@@ -46,11 +46,54 @@ class SurveyFactory:
 
         self._registry[survey_type] = survey_model
 
-    def create(self, survey_type, **kwargs):
+    def get_model(self, survey_type):
         if survey_type not in self._registry:
             raise NotRegistered('The survey type %s is not registered' % survey_type)
 
-        return self._registry[survey_type](**kwargs)
+        return self._registry[survey_type]
+
+    def create(self, survey_type, **kwargs):
+        return self.get_model(survey_type)(**kwargs)
+
+    def get_queryset(self, survey_type):
+        model = self.get_model(survey_type)
+        return model.objects.select_related(*model.LOAD_SELECT_RELATED).prefetch_related(
+            *model.LOAD_PREFETCH_RELATED
+        )
+
+    def load_many(self, surveys):
+        """
+        Load the typed survey models of the given surveys with their
+        related objects, running one query per survey type plus one per
+        prefetched relation.
+
+        Args:
+            surveys: An iterable of Survey instances
+
+        Returns:
+            A dict mapping survey ids to typed survey instances, surveys
+            without a typed row are left out.
+
+        Raises
+            NotRegistered: If the type of a survey is not registered
+        """
+        surveys_by_type = {}
+        for survey in surveys:
+            surveys_by_type.setdefault(survey.type, {})[survey.id] = survey
+
+        loaded = {}
+        for survey_type, surveys_by_id in surveys_by_type.items():
+            for instance in self.get_queryset(survey_type).filter(survey_id__in=list(surveys_by_id)):
+                instance.survey = surveys_by_id[instance.survey_id]
+                loaded[instance.survey_id] = instance
+        return loaded
+
+    def load(self, survey):
+        """
+        Load the typed survey model of the given survey, see load_many().
+        Returns None if the survey has no typed row.
+        """
+        return self.load_many([survey]).get(survey.id)
 
 
 class DefaultSurveyFactory(LazyObject):
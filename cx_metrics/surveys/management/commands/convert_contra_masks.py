@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.management.base import BaseCommand, CommandError
+
+from ...factory import NotRegistered, survey_factory
+from ...services.contra_mask import SurveyContraMaskService
+
+
+class Command(BaseCommand):
+    help = (
+        'Store the options chosen with existing responses of checkbox and multi select contra questions '
+        'in the contra_mask of the responses and delete their option responses'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_type', help='Type of the surveys to convert, e.g. NPS')
+        parser.add_argument('--survey', dest='survey_uuid', help='Only convert the survey with this UUID')
+        parser.add_argument('--chunk-size', type=int, default=SurveyContraMaskService.CHUNK_SIZE, dest='chunk_size')
+
+    def handle(self, *args, **options):
+        try:
+            model = survey_factory.get_model(options['survey_type'])
+        except NotRegistered as e:
+            raise CommandError(e)
+
+        surveys = model.objects.select_related('contra').exclude(contra=None).order_by('id')
+        if options['survey_uuid']:
+            surveys = surveys.filter(uuid=options['survey_uuid'])
+
+        for survey in surveys.iterator():
+            if not SurveyContraMaskService.can_convert(survey):
+                continue
+            converted, deleted = SurveyContraMaskService.convert(survey, options['chunk_size'])
+            if converted or options['verbosity'] > 1:
+                self.stdout.write('%s: %d responses converted, %d option responses deleted' % (
+                    survey.uuid, converted, deleted
+                ))
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.management.base import BaseCommand, CommandError
+
+from ...factory import NotRegistered, survey_factory
+from ...services.option_response import SurveyOptionResponseService
+
+
+class Command(BaseCommand):
+    help = (
+        'Link the option responses stored before they were linked to their survey responses, '
+        'matching them by customer and time'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_type', help='Type of the surveys to link, e.g. NPS')
+        parser.add_argument('--survey', dest='survey_uuid', help='Only link the option responses of this survey')
+        parser.add_argument(
+            '--chunk-size', type=int, default=SurveyOptionResponseService.CHUNK_SIZE, dest='chunk_size'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            model = survey_factory.get_model(options['survey_type'])
+        except NotRegistered as e:
+            raise CommandError(e)
+
+        surveys = model.objects.exclude(contra=None).order_by('id')
+        if options['survey_uuid']:
+            surveys = surveys.filter(uuid=options['survey_uuid'])
+
+        for survey in surveys.iterator():
+            linked = SurveyOptionResponseService.link(survey, options['chunk_size'])
+            if linked or options['verbosity'] > 1:
+                self.stdout.write('%s: %d option responses linked' % (survey.uuid, linked))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.management.base import BaseCommand, CommandError
+
+from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
+from ...factory import NotRegistered, survey_factory
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the score or rate cross tabs of the contra option texts of surveys from their responses, '
+        'run link_option_responses first for option responses stored before they were linked'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_type', help='Type of the surveys to rebuild, e.g. NPS')
+        parser.add_argument('--survey', dest='survey_uuid', help='Only rebuild the cross tabs of this survey')
+
+    def handle(self, *args, **options):
+        try:
+            model = survey_factory.get_model(options['survey_type'])
+        except NotRegistered as e:
+            raise CommandError(e)
+
+        surveys = model.objects.exclude(contra=None).select_related('contra').order_by('id')
+        if options['survey_uuid']:
+            surveys = surveys.filter(uuid=options['survey_uuid'])
+
+        for survey in surveys.iterator():
+            counts = OptionResponseService.rebuild_cross_tabs(
+                survey.contra, survey.responses, survey.get_cross_tab_filters()
+            )
+            if options['verbosity'] > 1:
+                self.stdout.write('%s: %d cross tabs rebuilt' % (survey.uuid, len(counts)))
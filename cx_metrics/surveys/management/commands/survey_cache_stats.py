@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.management.base import BaseCommand
+
+from cx_metrics.multiple_choices.services import MultipleChoiceService
+from ...services import CacheStatsService, SurveyCacheService, SurveyInsightCacheService
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the hit, miss, stale and recompute counters and the hit ratio of the survey, '
+        'insight and multiple choice caches per tier'
+    )
+    NAMES = (
+        SurveyCacheService.local.name,
+        SurveyCacheService.STATS_NAME,
+        SurveyInsightCacheService.STATS_NAME,
+        MultipleChoiceService.local_cache.name,
+        MultipleChoiceService.REPRESENTATION_STATS_NAME,
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', dest='reset',
+            help='Reset the counters after printing them',
+        )
+
+    def handle(self, *args, **options):
+        for name in self.NAMES:
+            stats = CacheStatsService.get(name)
+            lookups = stats[CacheStatsService.HIT] + stats[CacheStatsService.MISS]
+            ratio = float(stats[CacheStatsService.HIT]) / lookups if lookups else 0
+            self.stdout.write('%s: %s, hit_ratio=%.2f' % (name, ', '.join(
+                '%s=%d' % (event, stats[event]) for event in CacheStatsService.EVENTS
+            ), ratio))
+            if options['reset']:
+                CacheStatsService.reset(name)
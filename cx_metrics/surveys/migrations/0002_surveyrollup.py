@@ -0,0 +1,30 @@
+# Generated by Django 2.2 on 2026-10-17 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('survey_uuid', models.UUIDField(editable=False, verbose_name='Survey UUID')),
+                ('granularity', models.CharField(choices=[('H', 'Hourly'), ('D', 'Daily')], max_length=1, verbose_name='Granularity')),
+                ('period', models.DateTimeField(verbose_name='Period')),
+                ('dimension', models.CharField(max_length=16, verbose_name='Dimension')),
+                ('key', models.CharField(max_length=256, verbose_name='Key')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Count')),
+            ],
+            options={
+                'verbose_name': 'Survey Rollup',
+                'verbose_name_plural': 'Survey Rollups',
+                'unique_together': {('survey_uuid', 'granularity', 'period', 'dimension', 'key')},
+            },
+        ),
+    ]
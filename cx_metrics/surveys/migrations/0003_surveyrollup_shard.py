@@ -0,0 +1,22 @@
+# Generated by Django 2.2 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0002_surveyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surveyrollup',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Shard'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='surveyrollup',
+            unique_together={('survey_uuid', 'granularity', 'period', 'dimension', 'key', 'shard')},
+        ),
+    ]
@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+from collections import Counter
 from uuid import uuid4
+from django.apps import apps
 from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models, transaction
-from django.db.models import QuerySet
+from django.db.models import Q, QuerySet
 from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 from upkook_core.businesses.models import Business
@@ -47,30 +50,150 @@ class Survey(SurveyBase):
 
 
 class SurveyModelQuerySet(QuerySet):
-    def bulk_create(self, objs, batch_size=None):
-        raise NotImplementedError
+    # Survey models deleted or updated per query and transaction
+    CHUNK_SIZE = 1000
 
     @transaction.atomic
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False):
+        """
+        Insert the parent Survey rows and then the typed rows of the given
+        unsaved survey models in batches, sharing their uuids. Conflicts
+        can not be ignored as the typed rows need their parent ids.
+        """
+        if ignore_conflicts:
+            raise ValueError('Survey models can not be bulk created with ignore_conflicts.')
+
+        objs = list(objs)
+        if not objs:
+            return objs
+
+        surveys = []
+        for obj in objs:
+            obj.uuid = uuid4()
+            surveys.append(Survey(type=obj.type, uuid=obj.uuid, name=obj.name, business_id=obj.business_id))
+        Survey.objects.bulk_create(surveys, batch_size=batch_size)
+
+        if any(survey.pk is None for survey in surveys):
+            # Only some databases return the ids of bulk inserted rows
+            ids = {}
+            uuids = [survey.uuid for survey in surveys]
+            step = batch_size or len(uuids)
+            for start in range(0, len(uuids), step):
+                ids.update(Survey.objects.filter(uuid__in=uuids[start:start + step]).values_list('uuid', 'id'))
+            for survey in surveys:
+                survey.pk = ids[survey.uuid]
+
+        for obj, survey in zip(objs, surveys):
+            obj.survey = survey
+        return super(SurveyModelQuerySet, self).bulk_create(objs, batch_size=batch_size)
+
+    def get_pk_chunks(self, chunk_size=None):
+        """
+        Yield the primary keys of the queryset in ascending lists of at most
+        chunk_size, each read after the previous one was processed.
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        pks = self.order_by('pk').values_list('pk', flat=True)
+        last_pk = None
+        while True:
+            chunk = pks if last_pk is None else pks.filter(pk__gt=last_pk)
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_pk = chunk[-1]
+
+    def get_chunk(self, pks):
+        return self.model._base_manager.using(self.db).filter(pk__in=pks)
+
+    @staticmethod
+    def get_survey_values(values):
+        """
+        Values of the given survey model update copied to the parent Survey rows
+        """
+        return {field_name: values[field_name] for field_name in ['name', 'business'] if field_name in values}
+
     def delete(self):
-        sids = list(self.values_list('survey', flat=True))
-        super(SurveyModelQuerySet, self).delete()
-        Survey.objects.filter(id__in=sids).delete()
+        """
+        Delete the survey models with their parent Survey rows in a single
+        transaction, the parents are selected with a subquery and cascade to
+        the survey models. The deletion collector still loads every deleted
+        row to send signals, business wide deletes go through
+        delete_chunked() instead, see delete_business_surveys and the admin.
+        """
+        with transaction.atomic(using=self.db):
+            return Survey.objects.using(self.db).filter(id__in=self.values('survey')).delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def delete_chunked(self, chunk_size=None, progress=None):
+        """
+        Delete the survey models and their parent Survey rows in chunks of
+        at most chunk_size rows, each in its own transaction, and call
+        progress with the number of deleted survey models after each one.
+        Returns the number of deleted objects and a dict with the number
+        of deletions per model like QuerySet.delete().
+        """
+        deleted, counter = 0, Counter()
+        done = 0
+        for pks in self.get_pk_chunks(chunk_size):
+            with transaction.atomic(using=self.db):
+                chunk = self.get_chunk(pks)
+                sids = list(chunk.values_list('survey', flat=True))
+                for count, counts in (chunk.delete(), Survey.objects.using(self.db).filter(id__in=sids).delete()):
+                    deleted += count
+                    counter.update(counts)
+
+            done += len(pks)
+            if progress is not None:
+                progress(done)
+        return deleted, dict(counter)
+
+    delete_chunked.alters_data = True
+    delete_chunked.queryset_only = True
 
-    @transaction.atomic
     def update(self, **kwargs):
-        sids = list(self.values_list('survey', flat=True))
-        rows = super(SurveyModelQuerySet, self).update(**kwargs)
+        """
+        Update the survey models with a single statement, name and business
+        are copied to the parent Survey rows with a subquery in the same
+        transaction. Use update_chunked() for large querysets.
+        """
+        survey_values = self.get_survey_values(kwargs)
+        if not survey_values:
+            return super(SurveyModelQuerySet, self).update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            Survey.objects.using(self.db).filter(id__in=self.values('survey')).update(**survey_values)
+            return super(SurveyModelQuerySet, self).update(**kwargs)
+
+    update.alters_data = True
 
-        survey_kwargs = {}
-        for field_name in ['name', 'business']:
-            if field_name in kwargs:
-                survey_kwargs.update({field_name: kwargs.get(field_name)})
+    def update_chunked(self, values, chunk_size=None, progress=None):
+        """
+        Update the survey models with the given values in chunks of at most
+        chunk_size rows, each in its own transaction, copying name and
+        business to the parent Survey rows with a subquery. Calls progress
+        with the number of processed survey models after each chunk and
+        returns the number of updated rows.
+        """
+        survey_values = self.get_survey_values(values)
 
-        if survey_kwargs:
-            Survey.objects.filter(id__in=sids).update(**survey_kwargs)
+        rows, done = 0, 0
+        for pks in self.get_pk_chunks(chunk_size):
+            with transaction.atomic(using=self.db):
+                chunk = self.get_chunk(pks)
+                if survey_values:
+                    Survey.objects.using(self.db).filter(id__in=chunk.values('survey')).update(**survey_values)
+                rows += chunk.update(**values)
 
+            done += len(pks)
+            if progress is not None:
+                progress(done)
         return rows
 
+    update_chunked.alters_data = True
+
 
 class SurveyModel(SurveyBase):
     survey = models.OneToOneField(
@@ -89,6 +212,16 @@ class SurveyModel(SurveyBase):
         default=None
     )
 
+    # Fields copied to the survey snapshot used on the response path
+    SNAPSHOT_FIELDS = ()
+    # Relations loaded with the survey by SurveyFactory.load_many()
+    LOAD_SELECT_RELATED = ('business',)
+    LOAD_PREFETCH_RELATED = ()
+    # Fields copied to the clones made by SurveyCloneService
+    CLONE_FIELDS = ()
+    # Response model as 'app_label.ModelName'
+    RESPONSE_MODEL = None
+
     objects = SurveyModelQuerySet.as_manager()
 
     class Meta:
@@ -98,6 +231,10 @@ class SurveyModel(SurveyBase):
     def type(self):
         raise NotImplementedError
 
+    @property
+    def responses(self):
+        return apps.get_model(self.RESPONSE_MODEL).objects.filter(survey_uuid=self.uuid)
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         with transaction.atomic(using):
             try:
@@ -113,17 +250,104 @@ class SurveyModel(SurveyBase):
 
             super(SurveyModel, self).save(force_insert, force_update, using, update_fields)
 
+    def get_cross_tab_filters(self):
+        """
+        Return the {key: Q} filters of the responses counted in each cross
+        tab of the contra option texts, see OptionTextCrossTab.
+        """
+        return {}
+
     def delete(self, using=None, keep_parents=False):
         with transaction.atomic(using):
             super(SurveyModel, self).delete(using, keep_parents)
             self.survey.delete(using, keep_parents)
 
 
+class SurveyRateCountersBase(models.Model):
+    """
+    Number of responses per rate for surveys rated on a 1 to `scale` range.
+    Subclasses must provide the `scale` field.
+    """
+    MAX_RATE = 7
+
+    rate_1 = models.BigIntegerField(_('Rate 1 Responses'), default=0, validators=[MinValueValidator(0)])
+    rate_2 = models.BigIntegerField(_('Rate 2 Responses'), default=0, validators=[MinValueValidator(0)])
+    rate_3 = models.BigIntegerField(_('Rate 3 Responses'), default=0, validators=[MinValueValidator(0)])
+    rate_4 = models.BigIntegerField(_('Rate 4 Responses'), default=0, validators=[MinValueValidator(0)])
+    rate_5 = models.BigIntegerField(_('Rate 5 Responses'), default=0, validators=[MinValueValidator(0)])
+    rate_6 = models.BigIntegerField(_('Rate 6 Responses'), default=0, validators=[MinValueValidator(0)])
+    rate_7 = models.BigIntegerField(_('Rate 7 Responses'), default=0, validators=[MinValueValidator(0)])
+
+    class Meta:
+        abstract = True
+
+    @staticmethod
+    def get_rate_field_name(rate):
+        return 'rate_%d' % int(rate)
+
+    @classmethod
+    def get_rate_filters(cls):
+        return {str(rate): Q(rate=rate) for rate in range(1, cls.MAX_RATE + 1)}
+
+    @property
+    def rates(self):
+        return [
+            {'rate': rate, 'count': getattr(self, self.get_rate_field_name(rate))}
+            for rate in range(1, int(self.scale) + 1)
+        ]
+
+
 class SurveyResponseBase(models.Model):
     survey_uuid = models.UUIDField(_('Survey UUID'), editable=False)
     customer_uuid = models.UUIDField(_('Customer UUID'), editable=False)
+    # Bits of the chosen contra options stored with the response instead of
+    # as option responses, see SURVEY_CONTRA_MASK_STORAGE
+    contra_mask = models.BigIntegerField(_('Contra Mask'), default=0, editable=False)
     created = models.DateTimeField(_('Created at'), auto_now_add=True)
     updated = models.DateTimeField(_('Updated at'), auto_now=True)
 
     class Meta:
         abstract = True
+
+
+def response_lookup_indexes(prefix):
+    """
+    Composite indexes for the customer and survey lookups of a SurveyResponseBase subclass.
+    Index names must be unique per database, so every concrete response model
+    declares its own copies with the given name prefix.
+    """
+    return [
+        models.Index(fields=['customer_uuid', 'created'], name='%s_customer_created_idx' % prefix),
+        models.Index(fields=['survey_uuid', 'created'], name='%s_survey_created_idx' % prefix),
+    ]
+
+
+class SurveyRollup(models.Model):
+    """
+    Number of responses of a survey per hour or day, broken down by
+    dimension, e.g. per score or per contra option text. Sharded rollups
+    spread a count over several rows, see SURVEY_COUNTER_SHARDS.
+    """
+    GRANULARITY_HOUR = 'H'
+    GRANULARITY_DAY = 'D'
+    GRANULARITY_CHOICES = (
+        (GRANULARITY_HOUR, _('Hourly')),
+        (GRANULARITY_DAY, _('Daily')),
+    )
+
+    DIMENSION_SCORE = 'score'
+    DIMENSION_RATE = 'rate'
+    DIMENSION_OPTION = 'option'
+
+    survey_uuid = models.UUIDField(_('Survey UUID'), editable=False)
+    granularity = models.CharField(_('Granularity'), max_length=1, choices=GRANULARITY_CHOICES)
+    period = models.DateTimeField(_('Period'))
+    dimension = models.CharField(_('Dimension'), max_length=16)
+    key = models.CharField(_('Key'), max_length=256)
+    count = models.BigIntegerField(_('Count'), default=0)
+    shard = models.PositiveSmallIntegerField(_('Shard'), default=0)
+
+    class Meta:
+        verbose_name = _('Survey Rollup')
+        verbose_name_plural = _('Survey Rollups')
+        unique_together = ('survey_uuid', 'granularity', 'period', 'dimension', 'key', 'shard')
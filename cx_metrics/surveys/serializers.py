@@ -1,8 +1,17 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from upkook_core.customers.services import CustomerService
 
-from .models import Survey
+from .models import Survey, SurveyRollup
+from .services import SurveyService, SurveyResponseGuardCacheService
+from .services.export import SurveyResponseExportService
 
 
 class SurveySerializer(serializers.ModelSerializer):
@@ -11,3 +20,263 @@ class SurveySerializer(serializers.ModelSerializer):
     class Meta:
         model = Survey
         fields = ('id', 'type', 'name', 'url')
+
+
+class SurveyPeriodQuerySerializer(serializers.Serializer):
+    """
+    Validates the optional from and to query parameters of a period
+    """
+
+    def get_fields(self):
+        fields = super(SurveyPeriodQuerySerializer, self).get_fields()
+        # "from" is a keyword and can not be declared as a class attribute
+        fields['from'] = serializers.DateTimeField(required=False)
+        fields['to'] = serializers.DateTimeField(required=False)
+        return fields
+
+    def validate(self, attrs):
+        start, end = attrs.get('from'), attrs.get('to')
+        if start is not None and end is not None and start >= end:
+            raise ValidationError({'from': [_('Ensure this value is before to.')]})
+        return attrs
+
+
+class SurveyTimeseriesQuerySerializer(SurveyPeriodQuerySerializer):
+    """
+    Validates the from, to and granularity query parameters of survey
+    timeseries, from and to default to the latest period of DEFAULT_RANGES.
+    """
+    DEFAULT_RANGES = {
+        SurveyRollup.GRANULARITY_HOUR: timedelta(days=1),
+        SurveyRollup.GRANULARITY_DAY: timedelta(days=30),
+    }
+    MAX_RANGES = {
+        SurveyRollup.GRANULARITY_HOUR: timedelta(days=31),
+        SurveyRollup.GRANULARITY_DAY: timedelta(days=731),
+    }
+
+    granularity = serializers.ChoiceField(
+        choices=SurveyRollup.GRANULARITY_CHOICES, default=SurveyRollup.GRANULARITY_DAY
+    )
+
+    def validate(self, attrs):
+        attrs = super(SurveyTimeseriesQuerySerializer, self).validate(attrs)
+        granularity = attrs['granularity']
+        end = attrs.get('to') or timezone.now()
+        start = attrs.get('from') or end - self.DEFAULT_RANGES[granularity]
+        if start >= end:
+            raise ValidationError({'from': [_('Ensure this value is before to.')]})
+        if end - start > self.MAX_RANGES[granularity]:
+            raise ValidationError({'from': [_('Ensure the range is at most %(days)d days.') % {
+                'days': self.MAX_RANGES[granularity].days
+            }]})
+
+        attrs.update({'from': start, 'to': end})
+        return attrs
+
+
+class SurveyResponseExportQuerySerializer(SurveyPeriodQuerySerializer):
+    FORMAT_CHOICES = (
+        (SurveyResponseExportService.FORMAT_CSV, 'CSV'),
+        (SurveyResponseExportService.FORMAT_NDJSON, 'NDJSON'),
+    )
+
+    format = serializers.ChoiceField(choices=FORMAT_CHOICES, default=SurveyResponseExportService.FORMAT_CSV)
+
+
+class SurveyOptionResponsesQuerySerializer(SurveyPeriodQuerySerializer):
+    """
+    Validates the query parameters of the responses a contra option was
+    chosen with, subclasses add filters of their response model.
+    """
+    option = serializers.CharField(max_length=256)
+
+
+class SurveyCloneSerializer(serializers.Serializer):
+    names = serializers.ListField(child=serializers.CharField(max_length=256), allow_empty=False)
+
+    def validate_names(self, value):
+        max_count = int(settings.SURVEY_CLONE_MAX_COUNT)
+        if len(value) > max_count:
+            raise ValidationError(_('Ensure this field has no more than %(max)d names.') % {'max': max_count})
+        return value
+
+
+class SurveyRespondSerializerMixin(object):
+    """
+    Customer identification, duplicate checking and storage shared by survey
+    respond serializers. Subclasses provide respond(), bulk_respond(),
+    get_last_response() and get_recent_customer_uuids() for their response model.
+
+    Duplicate responses are blocked per survey and customer by
+    SurveyResponseGuardCacheService, the database is only queried for
+    recent responses while the cache is unavailable.
+    """
+    CUSTOMER_IDENTITY_FIELDS = ('client_id', 'email', 'mobile_number', 'bizz_user_id')
+
+    def get_duplicate_error(self):
+        return ValidationError(
+            {
+                "non_field_errors": [_("You could not submit responses within specific time !")]
+            }
+        )
+
+    def identify_customer(self, customer_data, user_agent=None):
+        client_id = customer_data.get('client_id')
+        business = self.survey.business
+        if business.is_identified_by_email():
+            email = customer_data.get('email')
+            if not email:
+                raise ValidationError(_('Email is required'))
+            return CustomerService.identify_by_email(
+                business=business, email=email, client_id=client_id, user_agent=user_agent
+            )
+        elif business.is_identified_by_mobile_number():
+            mobile_number = customer_data.get('mobile_number')
+            if not mobile_number:
+                raise ValidationError(_('Mobile number is required'))
+            return CustomerService.identify_by_mobile_number(
+                business=business, mobile_number=mobile_number, client_id=client_id, user_agent=user_agent
+            )
+        elif business.is_identified_by_bizz_user_id():
+            bizz_user_id = customer_data.get('bizz_user_id')
+            if not bizz_user_id:
+                raise ValidationError(_('Business UserID is required'))
+            return CustomerService.identify_by_bizz_user_id(
+                business=business, bizz_user_id=bizz_user_id, client_id=client_id, user_agent=user_agent
+            )
+        return CustomerService.identify_anonymous(business=business, client_id=client_id)
+
+    def check_duplicate_response(self, customer):
+        acquired = SurveyResponseGuardCacheService.acquire(self.survey.uuid, customer.uuid)
+        if acquired is None:
+            acquired = not SurveyService.is_duplicate_response(self.get_last_response(customer))
+        if not acquired:
+            raise self.get_duplicate_error()
+
+    def release_duplicate_response(self, customer):
+        SurveyResponseGuardCacheService.release(self.survey.uuid, customer.uuid)
+
+    def create(self, validated_data):
+        customer_data = validated_data.get('customer', {})
+        user_agent = validated_data.get('user_agent', None)
+
+        customer = self.identify_customer(customer_data, user_agent)
+        self.check_duplicate_response(customer)
+
+        try:
+            response = self.respond(customer, validated_data)
+        except Exception:
+            self.release_duplicate_response(customer)
+            raise
+        if response is None:
+            self.release_duplicate_response(customer)
+        return response
+
+    def respond(self, customer, validated_data):
+        raise NotImplementedError
+
+    def get_last_response(self, customer):
+        raise NotImplementedError
+
+    def get_recent_customer_uuids(self, customer_uuids):
+        raise NotImplementedError
+
+    def bulk_respond(self, entries):
+        """
+        Store the given (customer, validated_data) entries and return the
+        created responses in the same order.
+        """
+        raise NotImplementedError
+
+    def get_customer_identity(self, customer_data):
+        identity = tuple(
+            (field_name, str(customer_data[field_name]))
+            for field_name in self.CUSTOMER_IDENTITY_FIELDS if customer_data.get(field_name)
+        )
+        return identity or None
+
+    def identify_customers(self, validated_items, results, user_agent=None):
+        """
+        Identify the customer of each validated item, resolving customers
+        sharing the same identity once. Identification errors are stored
+        in results and the (index, customer) pairs of the others returned.
+        """
+        identified = {}
+        customers = []
+        for index, validated_data in enumerate(validated_items):
+            customer_data = validated_data.get('customer', {})
+            identity = self.get_customer_identity(customer_data)
+            if identity is not None and identity in identified:
+                customers.append((index, identified[identity]))
+                continue
+
+            try:
+                customer = self.identify_customer(customer_data, user_agent)
+            except ValidationError as e:
+                results[index] = e
+                continue
+
+            if identity is not None:
+                identified[identity] = customer
+            customers.append((index, customer))
+        return customers
+
+    def filter_duplicate_customers(self, customers, results):
+        """
+        Store a duplicate error in results for every customer who responded
+        recently and return the (index, customer) pairs of the others.
+        """
+        accepted = []
+        unguarded = []
+        seen = set()
+        for index, customer in customers:
+            if customer.uuid in seen:
+                results[index] = self.get_duplicate_error()
+                continue
+            seen.add(customer.uuid)
+
+            acquired = SurveyResponseGuardCacheService.acquire(self.survey.uuid, customer.uuid)
+            if acquired is None:
+                unguarded.append((index, customer))
+            elif acquired:
+                accepted.append((index, customer))
+            else:
+                results[index] = self.get_duplicate_error()
+
+        if unguarded:
+            recent_uuids = set(self.get_recent_customer_uuids([customer.uuid for _index, customer in unguarded]))
+            for index, customer in unguarded:
+                if customer.uuid in recent_uuids:
+                    results[index] = self.get_duplicate_error()
+                else:
+                    accepted.append((index, customer))
+            accepted.sort(key=lambda item: item[0])
+        return accepted
+
+    def bulk_create(self, validated_items, user_agent=None):
+        """
+        Store a batch of validated responses and return a list with either
+        the created response or a ValidationError for each item.
+        """
+        results = [None] * len(validated_items)
+        customers = self.identify_customers(validated_items, results, user_agent)
+        customers = self.filter_duplicate_customers(customers, results)
+        if not customers:
+            return results
+
+        entries = [(customer, validated_items[index]) for index, customer in customers]
+        try:
+            instances = self.bulk_respond(entries)
+        except Exception:
+            for _index, customer in customers:
+                self.release_duplicate_response(customer)
+            raise
+
+        for (index, customer), instance in zip(customers, instances):
+            if instance is None:
+                self.release_duplicate_response(customer)
+            else:
+                instance.customer = customer
+            results[index] = instance
+        return results
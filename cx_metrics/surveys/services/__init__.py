@@ -1,4 +1,10 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
 from .survey import SurveyService  # NOQA
-from .cache import SurveyCacheService, SurveyInsightCacheService  # NOQA
+from .cache import (  # NOQA
+    CacheNamespaceService, CacheStatsService, LocalCache, SingleFlightCacheService,
+    SurveyCacheService, SurveyInsightCacheService, SurveySnapshotCacheService, SurveyResponseGuardCacheService
+)
+from .counters import ShardedCounterService, BufferedCounterService  # NOQA
+from .rollup import SurveyRollupService  # NOQA
+from .snapshot import SurveySnapshot, SurveySnapshotService  # NOQA
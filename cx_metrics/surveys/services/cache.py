@@ -1,35 +1,716 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
 from django.core.cache import cache
+from django.utils import timezone
+
+
+class CacheStatsService:
+    """
+    Hit, miss, stale and recompute counters of the cached representations,
+    kept in the cache so they add up over all processes.
+    """
+    HIT = 'hit'
+    MISS = 'miss'
+    STALE = 'stale'
+    RECOMPUTE = 'recompute'
+    EVENTS = (HIT, MISS, STALE, RECOMPUTE)
+
+    @staticmethod
+    def get_key(name, event):
+        return "cache_stats-%s-%s" % (name, event)
+
+    @staticmethod
+    def incr(name, event, amount=1):
+        key = CacheStatsService.get_key(name, event)
+        try:
+            if not cache.add(key, amount, None):
+                cache.incr(key, amount)
+        except Exception:
+            pass
+
+    @staticmethod
+    def get(name):
+        keys = {CacheStatsService.get_key(name, event): event for event in CacheStatsService.EVENTS}
+        values = cache.get_many(list(keys))
+        return {event: values.get(key, 0) for key, event in keys.items()}
+
+    @staticmethod
+    def reset(name):
+        cache.delete_many([CacheStatsService.get_key(name, event) for event in CacheStatsService.EVENTS])
+
+
+class CacheNamespaceService:
+    """
+    Versions of groups of cache entries, e.g. everything cached for a
+    business. Entries store the version of their namespace when they are
+    cached and are ignored once bump() replaced it, so a whole namespace is
+    invalidated by writing one key. Versions are random, an evicted
+    version key never makes older entries valid again.
+    """
+
+    @staticmethod
+    def get_key(namespace):
+        return "cache_namespace-%s" % namespace
+
+    @staticmethod
+    def get_business_namespace(business_id):
+        return "business-%s" % business_id
+
+    @staticmethod
+    def get_version(namespace):
+        key = CacheNamespaceService.get_key(namespace)
+        version = cache.get(key)
+        if version is None:
+            version = uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key) or version
+        return version
+
+    @staticmethod
+    def is_current(namespace, version):
+        return version is not None and cache.get(CacheNamespaceService.get_key(namespace)) == version
+
+    @staticmethod
+    def bump(namespace):
+        cache.set(CacheNamespaceService.get_key(namespace), uuid4().hex, None)
+
+
+class LocalCache(object):
+    """
+    Size bounded in-process LRU cache with a short timeout in front of the
+    shared cache, see SURVEY_LOCAL_CACHE_MAX_SIZE.
+
+    invalidate(key) drops one entry in every process by bumping the version
+    of the key in the shared cache, entries are stored with the version of
+    their key read by get_key_version() before the value was read from the
+    shared cache. invalidate() without a key drops all entries by bumping
+    the version of the cache, meant for rare writes like business changes.
+    Processes read the versions at most every VERSION_CHECK_INTERVAL
+    seconds, per cache and per entry, so most hits cost no round trip.
+    Hits and misses are added to CacheStatsService every
+    STATS_FLUSH_INTERVAL seconds.
+    """
+    VERSION_CHECK_INTERVAL = 1
+    STATS_FLUSH_INTERVAL = 60
+
+    def __init__(self, name):
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0
+        self._stats = Counter()
+        self._stats_flushed = time.time()
+
+    @property
+    def max_size(self):
+        return int(settings.SURVEY_LOCAL_CACHE_MAX_SIZE)
+
+    def get_version_key(self):
+        return "local_cache_version-%s" % self.name
+
+    def get_key_version_key(self, key):
+        return "local_cache_version-%s-%s" % (self.name, key)
+
+    def get_key_version(self, key):
+        if self.max_size <= 0:
+            return None
+        try:
+            return cache.get(self.get_key_version_key(key))
+        except Exception:
+            return None
+
+    def check_version(self, now):
+        if now - self._version_checked < self.VERSION_CHECK_INTERVAL:
+            return
+        self._version_checked = now
+        try:
+            version = cache.get(self.get_version_key())
+        except Exception:
+            return
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def check_key_version(self, key, entry, now):
+        """
+        Return False if the key was invalidated since the entry was stored,
+        reading its version at most every VERSION_CHECK_INTERVAL seconds.
+        """
+        value, expires, version, checked = entry
+        if now - checked < self.VERSION_CHECK_INTERVAL:
+            return True
+        try:
+            current = cache.get(self.get_key_version_key(key))
+        except Exception:
+            return True
+        if current != version:
+            return False
+        with self._lock:
+            if self._entries.get(key) is entry:
+                self._entries[key] = (value, expires, version, now)
+        return True
+
+    def get(self, key):
+        if self.max_size <= 0:
+            return None
+
+        now = time.time()
+        self.check_version(now)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and (entry[1] <= now or not self.check_key_version(key, entry, now)):
+            entry = None
+
+        with self._lock:
+            if entry is not None:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self._stats[CacheStatsService.HIT] += 1
+                value = entry[0]
+            else:
+                self._entries.pop(key, None)
+                self._stats[CacheStatsService.MISS] += 1
+                value = None
+        self.flush_stats(now)
+        return value
+
+    def set(self, key, value, version=None):
+        """
+        Store the value with the version of the key read before the value
+        was, see get_key_version().
+        """
+        max_size = self.max_size
+        if max_size <= 0:
+            return
+
+        now = time.time()
+        expires = now + int(settings.SURVEY_LOCAL_CACHE_TIMEOUT)
+        with self._lock:
+            self._entries[key] = (value, expires, version, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Drop the entry of the key, or all entries without a key, in every
+        process.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        version_key = self.get_version_key() if key is None else self.get_key_version_key(key)
+        try:
+            if not cache.add(version_key, 1, None):
+                cache.incr(version_key)
+        except Exception:
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def flush_stats(self, now):
+        if now - self._stats_flushed < self.STATS_FLUSH_INTERVAL:
+            return
+        with self._lock:
+            stats, self._stats = self._stats, Counter()
+            self._stats_flushed = now
+        for event, amount in stats.items():
+            CacheStatsService.incr(self.name, event, amount)
+
+
+class SingleFlightCacheService:
+    """
+    Cache reads that recompute a missing value in a single request at a time.
+
+    The value is stored under its key and, with its expiry time and the
+    time it took to compute, under a stale key living
+    SURVEY_CACHE_STALE_TIMEOUT seconds longer. Deleting the key keeps the
+    stale copy, so while one request holds the lock and recomputes, the
+    others are served the previous value. Before expiry values are
+    recomputed early with a probability growing as expiry gets closer and
+    the longer they take to compute (XFetch), so popular keys rarely expire
+    at all.
+
+    Namespaced values are computed with their namespace, see
+    CacheNamespaceService, which is checked on every read. They are only
+    served while the stale copy holding the namespace version is cached.
+    """
+    LOCK_POLL_INTERVAL = 0.05
+    LOCK_WAIT = 2
+    INVALIDATIONS_TIMEOUT = 60 * 60
+
+    @staticmethod
+    def get_stale_key(key):
+        return "%s-stale" % key
+
+    @staticmethod
+    def get_lock_key(key):
+        return "%s-lock" % key
+
+    @staticmethod
+    def get_invalidations_key(key):
+        return "%s-invalidations" % key
+
+    @staticmethod
+    def get_invalidations(key):
+        try:
+            return cache.get(SingleFlightCacheService.get_invalidations_key(key))
+        except Exception:
+            return None
+
+    @staticmethod
+    def invalidate(key):
+        """
+        Delete the key and count an invalidation of it, computations of the
+        key running meanwhile do not keep their value, see compute().
+        """
+        invalidations_key = SingleFlightCacheService.get_invalidations_key(key)
+        try:
+            if not cache.add(invalidations_key, 1, SingleFlightCacheService.INVALIDATIONS_TIMEOUT):
+                cache.incr(invalidations_key)
+        except Exception:
+            pass
+        SingleFlightCacheService.delete(key)
+
+    @staticmethod
+    def set(key, value, timeout, delta=0, namespace=None, version=None, computed=None):
+        """
+        Cache the value, computed is the time its computation started and
+        defaults to now.
+        """
+        if namespace is not None and version is None:
+            version = CacheNamespaceService.get_version(namespace)
+        now = time.time()
+        stale = {
+            'value': value, 'expires': now + timeout, 'delta': delta,
+            'namespace': namespace, 'version': version, 'computed': computed if computed is not None else now,
+        }
+        cache.set(key, value, timeout)
+        cache.set(SingleFlightCacheService.get_stale_key(key), stale, timeout + settings.SURVEY_CACHE_STALE_TIMEOUT)
+
+    @staticmethod
+    def read(key, namespaced=False):
+        """
+        Return the (value, stale) pair of the key, both None if the
+        namespace of the value was invalidated since it was cached.
+        """
+        stale_key = SingleFlightCacheService.get_stale_key(key)
+        values = cache.get_many([key, stale_key])
+        value, stale = values.get(key), values.get(stale_key)
+
+        namespace = stale.get('namespace') if stale is not None else None
+        if namespace is None:
+            return (None, None) if namespaced else (value, stale)
+        if not CacheNamespaceService.is_current(namespace, stale['version']):
+            return None, None
+        return value, stale
+
+    @staticmethod
+    def delete(key):
+        cache.delete(key)
+
+    @staticmethod
+    def update(key, update, since=None):
+        """
+        Replace the cached value of the key with update(value), keeping its
+        expiry time so it is still recomputed once per timeout. Returns True
+        if the value was updated.
+
+        The key is deleted instead when its expiry is unknown, update() fails
+        or returns None, or, with since, when the value was computed at or
+        after since and may already include the changes applied by update().
+        Callers pass the time their changes started, before the transaction
+        writing them. When the key is being recomputed it is invalidated, the
+        recomputed value may have been read before the changes.
+        """
+        if not SingleFlightCacheService.acquire(key):
+            SingleFlightCacheService.invalidate(key)
+            return False
+
+        try:
+            value, stale = SingleFlightCacheService.read(key)
+            if value is None:
+                return False
+
+            timeout = int(stale['expires'] - time.time()) if stale is not None else 0
+            if timeout <= 0 or (since is not None and stale.get('computed', since) >= since):
+                SingleFlightCacheService.delete(key)
+                return False
+
+            value = update(value)
+            if value is None:
+                SingleFlightCacheService.delete(key)
+                return False
+
+            SingleFlightCacheService.set(
+                key, value, timeout, stale['delta'], stale.get('namespace'), stale.get('version'),
+                stale.get('computed')
+            )
+            return True
+        except Exception:
+            # The change is stored already, drop the value rather than failing the request
+            try:
+                SingleFlightCacheService.delete(key)
+            except Exception:
+                pass
+            return False
+        finally:
+            SingleFlightCacheService.release(key)
+
+    @staticmethod
+    def should_refresh(stale):
+        """
+        Return True if a value that is still cached should be recomputed
+        before it expires.
+        """
+        beta = float(settings.SURVEY_CACHE_EARLY_REFRESH_BETA)
+        if stale is None or beta <= 0:
+            return False
+        return time.time() - stale['delta'] * beta * math.log(1 - random.random()) >= stale['expires']
+
+    @staticmethod
+    def acquire(key):
+        try:
+            return cache.add(SingleFlightCacheService.get_lock_key(key), 1, settings.SURVEY_CACHE_LOCK_TIMEOUT)
+        except Exception:
+            # Recompute without a lock rather than failing the request
+            return True
+
+    @staticmethod
+    def release(key):
+        try:
+            cache.delete(SingleFlightCacheService.get_lock_key(key))
+        except Exception:
+            pass
+
+    @staticmethod
+    def compute(key, compute, timeout, name, namespaced=False):
+        """
+        Compute and cache the value of the key. The value is returned but not
+        kept if the key is invalidated while it is computed, checked before
+        and once more after storing it.
+        """
+        CacheStatsService.incr(name, CacheStatsService.RECOMPUTE)
+        invalidations = SingleFlightCacheService.get_invalidations(key)
+        start = time.time()
+        value, namespace = compute() if namespaced else (compute(), None)
+        if SingleFlightCacheService.get_invalidations(key) != invalidations:
+            return value
+
+        SingleFlightCacheService.set(key, value, timeout, time.time() - start, namespace, computed=start)
+        if SingleFlightCacheService.get_invalidations(key) != invalidations:
+            SingleFlightCacheService.delete(key)
+        return value
+
+    @staticmethod
+    def wait(key):
+        """
+        Wait up to LOCK_WAIT seconds for the request holding the lock of the
+        key to store its value, returns None if it does not.
+        """
+        deadline = time.time() + SingleFlightCacheService.LOCK_WAIT
+        while time.time() < deadline:
+            time.sleep(SingleFlightCacheService.LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return None
+
+    @staticmethod
+    def get_or_compute(key, compute, timeout, name, namespaced=False):
+        """
+        Return the cached value of the key, calling compute() to build and
+        cache it when it is missing or due for an early refresh. Hits,
+        misses, stale reads and recomputations are counted under name.
+        With namespaced compute() returns a (value, namespace) pair.
+        """
+        value, stale = SingleFlightCacheService.read(key, namespaced)
+
+        if value is not None:
+            CacheStatsService.incr(name, CacheStatsService.HIT)
+            if SingleFlightCacheService.should_refresh(stale) and SingleFlightCacheService.acquire(key):
+                try:
+                    value = SingleFlightCacheService.compute(key, compute, timeout, name, namespaced)
+                finally:
+                    SingleFlightCacheService.release(key)
+            return value
+
+        CacheStatsService.incr(name, CacheStatsService.MISS)
+        if SingleFlightCacheService.acquire(key):
+            try:
+                return SingleFlightCacheService.compute(key, compute, timeout, name, namespaced)
+            finally:
+                SingleFlightCacheService.release(key)
+
+        if stale is not None:
+            CacheStatsService.incr(name, CacheStatsService.STALE)
+            return stale['value']
+
+        value = SingleFlightCacheService.wait(key)
+        if value is None:
+            value = SingleFlightCacheService.compute(key, compute, timeout, name, namespaced)
+        return value
 
 
 class SurveyCacheService:
+    """
+    Caches public survey representations in the shared cache, with the
+    local tier in front of it. Representations are cached in the namespace
+    of the business of the survey, see invalidate_business().
+    """
     TIMEOUT = 4 * 60 * 60  # 4 hours
+    STATS_NAME = 'survey'
+    local = LocalCache('survey_local')
+
+    @staticmethod
+    def get_key(survey_uuid):
+        return "survey-%s" % survey_uuid
 
     @staticmethod
     def get(survey_uuid):
-        return cache.get("survey-%s" % survey_uuid)
+        key = SurveyCacheService.get_key(survey_uuid)
+        data = SurveyCacheService.local.get(key)
+        if data is None:
+            version = SurveyCacheService.local.get_key_version(key)
+            data, _stale = SingleFlightCacheService.read(key)
+            if data is not None:
+                SurveyCacheService.local.set(key, data, version)
+        return data
+
+    @staticmethod
+    def get_or_compute(survey_uuid, compute, timeout=TIMEOUT):
+        """
+        Return the cached representation of the survey, compute() returns
+        a (data, business_id) pair.
+        """
+        def compute_namespaced():
+            data, business_id = compute()
+            return data, CacheNamespaceService.get_business_namespace(business_id)
+
+        key = SurveyCacheService.get_key(survey_uuid)
+        data = SurveyCacheService.local.get(key)
+        if data is None:
+            version = SurveyCacheService.local.get_key_version(key)
+            data = SingleFlightCacheService.get_or_compute(
+                key, compute_namespaced, timeout, SurveyCacheService.STATS_NAME, namespaced=True
+            )
+            SurveyCacheService.local.set(key, data, version)
+        return data
+
+    @staticmethod
+    def get_rendered_key(survey_uuid):
+        return "survey_json-%s" % survey_uuid
+
+    @staticmethod
+    def get_etag(content):
+        return '"%s"' % hashlib.sha1(content).hexdigest()
+
+    @staticmethod
+    def get_or_render(survey_uuid, render, timeout=TIMEOUT):
+        """
+        Return the (etag, content) pair of the rendered JSON representation
+        of the survey, calling render() to build the (content, business_id)
+        pair when it is not cached. See SURVEY_CACHE_RENDERED_JSON.
+        """
+        def compute():
+            content, business_id = render()
+            rendered = SurveyCacheService.get_etag(content), content
+            return rendered, CacheNamespaceService.get_business_namespace(business_id)
+
+        key = SurveyCacheService.get_rendered_key(survey_uuid)
+        rendered = SurveyCacheService.local.get(key)
+        if rendered is None:
+            version = SurveyCacheService.local.get_key_version(key)
+            rendered = SingleFlightCacheService.get_or_compute(
+                key, compute, timeout, SurveyCacheService.STATS_NAME, namespaced=True
+            )
+            SurveyCacheService.local.set(key, rendered, version)
+        return rendered
 
     @staticmethod
     def set(survey_uuid, data, timeout=TIMEOUT):
-        cache.set("survey-%s" % survey_uuid, data, timeout)
+        SingleFlightCacheService.set(SurveyCacheService.get_key(survey_uuid), data, timeout)
+        SingleFlightCacheService.delete(SurveyCacheService.get_rendered_key(survey_uuid))
+        SurveyCacheService.invalidate_local(survey_uuid)
 
     @staticmethod
     def delete(survey_uuid):
-        cache.delete("survey-%s" % survey_uuid)
+        cache.delete_many([SurveyCacheService.get_key(survey_uuid), SurveyCacheService.get_rendered_key(survey_uuid)])
+        SurveyCacheService.invalidate_local(survey_uuid)
+
+    @staticmethod
+    def invalidate_local(survey_uuid):
+        SurveyCacheService.local.invalidate(SurveyCacheService.get_key(survey_uuid))
+        SurveyCacheService.local.invalidate(SurveyCacheService.get_rendered_key(survey_uuid))
+
+    @staticmethod
+    def invalidate_business(business_id):
+        """
+        Invalidate the cached representations, insights and snapshots of
+        all surveys of the business at once.
+        """
+        CacheNamespaceService.bump(CacheNamespaceService.get_business_namespace(business_id))
+        SurveyCacheService.local.invalidate()
 
 
 class SurveyInsightCacheService:
     TIMEOUT = 4 * 60 * 60  # 4 hours
+    STATS_NAME = 'insight'
+
+    @staticmethod
+    def get_key(survey_type, survey_uuid):
+        return "%s_insight-%s" % (survey_type.lower(), survey_uuid)
 
     @staticmethod
     def get(survey_type, survey_uuid):
-        return cache.get("%s_insight-%s" % (survey_type.lower(), survey_uuid))
+        data, _stale = SingleFlightCacheService.read(SurveyInsightCacheService.get_key(survey_type, survey_uuid))
+        return data
+
+    @staticmethod
+    def get_or_compute(survey_type, survey_uuid, compute, timeout=TIMEOUT):
+        """
+        Return the cached insights of the survey, compute() returns a
+        (data, business_id) pair.
+        """
+        def compute_namespaced():
+            data, business_id = compute()
+            return data, CacheNamespaceService.get_business_namespace(business_id)
+
+        return SingleFlightCacheService.get_or_compute(
+            SurveyInsightCacheService.get_key(survey_type, survey_uuid), compute_namespaced, timeout,
+            SurveyInsightCacheService.STATS_NAME, namespaced=True
+        )
 
     @staticmethod
-    def set(survey_type, survey_uuid, data, timeout=TIMEOUT):
-        cache.set("%s_insight-%s" % (survey_type.lower(), survey_uuid), data, timeout)
+    def set(survey_type, survey_uuid, data, timeout=TIMEOUT, business_id=None):
+        namespace = CacheNamespaceService.get_business_namespace(business_id) if business_id is not None else None
+        SingleFlightCacheService.set(
+            SurveyInsightCacheService.get_key(survey_type, survey_uuid), data, timeout, namespace=namespace
+        )
 
     @staticmethod
     def delete(survey_type, survey_uuid):
-        cache.delete("%s_insight-%s" % (survey_type.lower(), survey_uuid))
+        SingleFlightCacheService.delete(SurveyInsightCacheService.get_key(survey_type, survey_uuid))
+
+    @staticmethod
+    def update(survey_type, survey_uuid, update, since=None):
+        """
+        Apply update(data) to the cached insights of the survey, e.g. the
+        counter deltas of new responses, instead of recomputing them. See
+        SingleFlightCacheService.update() for since.
+        """
+        return SingleFlightCacheService.update(
+            SurveyInsightCacheService.get_key(survey_type, survey_uuid), update, since
+        )
+
+    @staticmethod
+    def add_counts(items, key_name, amounts):
+        """
+        Add the {key: amount} amounts to the counts of [{key_name: key,
+        'count': count}] insight items, appending items of new keys.
+        """
+        items = list(items or [])
+        amounts = dict(amounts)
+        for item in items:
+            item['count'] += amounts.pop(item[key_name], 0)
+        items.extend({key_name: key, 'count': amount} for key, amount in amounts.items())
+        return items
+
+    @staticmethod
+    def add_breakdowns(items, amounts):
+        """
+        Add the {text: {key: amount}} amounts to the breakdowns of [{'text':
+        text, 'breakdown': {key: count}}] contra option insight items.
+        """
+        items = list(items or [])
+        for item in items:
+            breakdown = item.setdefault('breakdown', {})
+            for key, amount in amounts.get(item['text'], {}).items():
+                breakdown[key] = breakdown.get(key, 0) + amount
+        return items
+
+
+class SurveySnapshotCacheService:
+    """
+    Caches survey snapshots with the version of the namespace of their
+    business, VERSION is part of the key so snapshots of an older layout
+    are never read after a deploy.
+    """
+    TIMEOUT = 4 * 60 * 60  # 4 hours
+    VERSION = 2
+
+    @staticmethod
+    def get_key(survey_type, survey_uuid):
+        return "survey_snapshot-%d-%s-%s" % (SurveySnapshotCacheService.VERSION, survey_type.lower(), survey_uuid)
+
+    @staticmethod
+    def get(survey_type, survey_uuid):
+        value = cache.get(SurveySnapshotCacheService.get_key(survey_type, survey_uuid))
+        if value is None:
+            return None
+
+        version, snapshot = value
+        namespace = CacheNamespaceService.get_business_namespace(snapshot.business_id)
+        if not CacheNamespaceService.is_current(namespace, version):
+            return None
+        return snapshot
+
+    @staticmethod
+    def set(survey_type, survey_uuid, snapshot, timeout=TIMEOUT):
+        version = CacheNamespaceService.get_version(CacheNamespaceService.get_business_namespace(snapshot.business_id))
+        cache.set(SurveySnapshotCacheService.get_key(survey_type, survey_uuid), (version, snapshot), timeout)
+
+    @staticmethod
+    def delete(survey_type, survey_uuid):
+        cache.delete(SurveySnapshotCacheService.get_key(survey_type, survey_uuid))
+
+
+class SurveyResponseGuardCacheService:
+    """
+    Blocks duplicate responses of a customer to a survey for
+    RESPONSE_DUPLICATE_BLOCK_TIME seconds using an atomic cache add.
+    """
+
+    @staticmethod
+    def get_key(survey_uuid, customer_uuid):
+        return "response_guard-%s-%s" % (survey_uuid, customer_uuid)
+
+    @staticmethod
+    def acquire(survey_uuid, customer_uuid):
+        """
+        Return True if the customer may respond, False if the customer already
+        responded to the survey recently and None if the cache is unavailable.
+        """
+        key = SurveyResponseGuardCacheService.get_key(survey_uuid, customer_uuid)
+        try:
+            if cache.add(key, timezone.now().timestamp(), int(settings.RESPONSE_DUPLICATE_BLOCK_TIME)):
+                return True
+            # add() also fails when the cache server is down, tell both apart
+            if cache.get(key) is not None:
+                return False
+        except Exception:
+            pass
+        return None
+
+    @staticmethod
+    def release(survey_uuid, customer_uuid):
+        try:
+            cache.delete(SurveyResponseGuardCacheService.get_key(survey_uuid, customer_uuid))
+        except Exception:
+            pass
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.conf import settings
+from django.db import transaction
+
+from cx_metrics.multiple_choices.services import MultipleChoiceService
+from ..factory import survey_factory
+
+
+class SurveyCloneService(object):
+    @staticmethod
+    def clone(survey, names, author=None):
+        """
+        Create a copy of the survey in its business for each of the given
+        names, with the CLONE_FIELDS of its survey model, zeroed counters
+        and a copy of its contra question. The parent and typed rows are
+        inserted with bulk_create, so no signals are sent.
+
+        Args:
+            survey: A Survey instance
+            names: The names of the copies
+            author: The author of the copies
+
+        Returns:
+            The created survey model instances, an empty list if the survey
+            has no typed row.
+        """
+        instance = survey_factory.load(survey)
+        if instance is None or not names:
+            return []
+
+        model = type(instance)
+        kwargs = {field_name: getattr(instance, field_name) for field_name in model.CLONE_FIELDS}
+        contra = getattr(instance, 'contra', None)
+
+        with transaction.atomic():
+            clones = [model(name=name, business_id=instance.business_id, author=author, **kwargs) for name in names]
+            if contra is not None:
+                for clone, contra_clone in zip(clones, MultipleChoiceService.clone(contra, len(clones))):
+                    clone.contra = contra_clone
+            return model.objects.bulk_create(clones, batch_size=int(settings.SURVEY_CLONE_BATCH_SIZE))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from itertools import chain
+
+from django.db import transaction
+
+from cx_metrics.multiple_choices.models import MultipleChoice, OptionResponse
+from cx_metrics.multiple_choices.services.multiple_choice import MultipleChoiceService, OptionResponseService
+from .option_response import SurveyOptionResponseService
+
+
+class SurveyContraMaskService(object):
+    """
+    Converts the option responses of existing responses of checkbox and multi
+    select contra questions to contra masks, see SURVEY_CONTRA_MASK_STORAGE.
+    """
+    CHUNK_SIZE = 1000
+
+    @staticmethod
+    def can_convert(survey):
+        contra = survey.contra
+        return contra is not None and contra.type in MultipleChoice.MASK_TYPES
+
+    @staticmethod
+    def get_masks(contra_id, model, bits, chunk):
+        """
+        Return the {response id: contra_mask} masks of the (id, created,
+        customer_uuid) responses of the chunk and the ids of the option
+        responses they were built from, see SurveyOptionResponseService.match().
+        Responses with options without a bit are skipped.
+        """
+        masks = {}
+        option_response_ids = {}
+        skipped = set()
+        for option_response_id, response_id, text in SurveyOptionResponseService.match(contra_id, model, chunk):
+            if text not in bits:
+                skipped.add(response_id)
+                continue
+            masks[response_id] = masks.get(response_id, 0) | 1 << bits[text]
+            option_response_ids.setdefault(response_id, []).append(option_response_id)
+
+        for response_id in skipped:
+            masks.pop(response_id, None)
+            option_response_ids.pop(response_id, None)
+        return masks, list(chain.from_iterable(option_response_ids.values()))
+
+    @staticmethod
+    def convert(survey, chunk_size=None, progress=None):
+        """
+        Store the options chosen with the responses of the survey without a
+        contra_mask in their contra_mask and delete their option responses,
+        one transaction per chunk of responses. Option text counts are kept.
+        Options without a bit are given one first, see
+        MultipleChoiceService.assign_bits().
+        Returns the numbers of converted responses and deleted option responses.
+        """
+        if not SurveyContraMaskService.can_convert(survey):
+            return 0, 0
+
+        MultipleChoiceService.assign_bits(survey.contra)
+
+        chunk_size = chunk_size or SurveyContraMaskService.CHUNK_SIZE
+        bits = {text: bit for bit, text in OptionResponseService.get_option_texts_by_bit(survey.contra_id).items()}
+        queryset = survey.responses.filter(contra_mask=0)
+        rows = queryset.order_by('id').values_list('id', 'created', 'customer_uuid')
+
+        converted = deleted = 0
+        last_id = 0
+        while bits:
+            chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+
+            masks, option_response_ids = SurveyContraMaskService.get_masks(
+                survey.contra_id, queryset.model, bits, chunk
+            )
+            ids = {}
+            for response_id, mask in masks.items():
+                ids.setdefault(mask, []).append(response_id)
+            with transaction.atomic():
+                for mask, response_ids in ids.items():
+                    queryset.filter(id__in=response_ids).update(contra_mask=mask)
+                OptionResponse.objects.filter(id__in=option_response_ids).delete()
+
+            converted += len(masks)
+            deleted += len(option_response_ids)
+            if progress is not None:
+                progress(converted)
+        return converted, deleted
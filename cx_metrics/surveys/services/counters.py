@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+
+class ShardedCounterService(object):
+    """
+    Counters spread over several rows of a shard model, a model with a `shard`
+    field and a unique constraint on the lookup fields and `shard`. Writers
+    increment a random shard, so concurrent writers rarely wait on the same
+    row lock, and readers sum all shards.
+    """
+
+    @staticmethod
+    def get_shard_count(counter_shards=0):
+        return int(counter_shards or settings.SURVEY_COUNTER_SHARDS or 0)
+
+    @staticmethod
+    def is_sharded(shards):
+        return shards > 1
+
+    @staticmethod
+    def increment(shard_model, shards, amounts, parent=None, **lookup):
+        """
+        Add the given {field_name: amount} amounts to a random shard and return
+        the number of updated rows. Missing shards are created on first use,
+        unless the optional parent queryset is empty.
+        """
+        shard = random.randrange(shards)
+        kwargs = {field_name: F(field_name) + amount for field_name, amount in amounts.items()}
+        rows = shard_model.objects.filter(shard=shard, **lookup).update(**kwargs)
+        if rows > 0:
+            return rows
+
+        if parent is not None and not parent.exists():
+            return 0
+
+        create_kwargs = dict(lookup)
+        create_kwargs.update(amounts)
+        try:
+            with transaction.atomic():
+                shard_model.objects.create(shard=shard, **create_kwargs)
+        except IntegrityError:
+            # Created by a concurrent writer meanwhile
+            return shard_model.objects.filter(shard=shard, **lookup).update(**kwargs)
+        return 1
+
+    @staticmethod
+    def get_totals(shard_model, field_names, **lookup):
+        totals = shard_model.objects.filter(**lookup).aggregate(
+            **{field_name: Sum(field_name) for field_name in field_names}
+        )
+        return {field_name: totals[field_name] or 0 for field_name in field_names}
+
+
+class BufferedCounterService(object):
+    """
+    Write-behind counters: increments are accumulated in the cache and
+    periodically flushed to the database by a Celery task, so responses do
+    not lock the counter rows.
+
+    Counters are grouped by kind. An increment of a counter without a
+    pending registration registers its name in the dirty list of its kind,
+    a sequence of cache keys consumed by pop_dirty_names(). Registrations
+    stay pending until their name is popped, or PENDING_TIMEOUT in case a
+    registration got lost.
+    """
+    TIMEOUT = 7 * 24 * 60 * 60  # 1 week
+    PENDING_TIMEOUT = 60 * 60  # 1 hour
+    LOCK_TIMEOUT = 5 * 60  # 5 minutes
+
+    @staticmethod
+    def is_enabled():
+        return bool(settings.SURVEY_COUNTER_WRITE_BEHIND)
+
+    @staticmethod
+    def get_key(kind, name):
+        return "counter_buffer-%s-%s" % (kind, name)
+
+    @staticmethod
+    def get_pending_key(kind, name):
+        return "counter_buffer_pending-%s-%s" % (kind, name)
+
+    @staticmethod
+    def get_sequence_key(kind):
+        return "counter_buffer_seq-%s" % kind
+
+    @staticmethod
+    def get_flushed_key(kind):
+        return "counter_buffer_flushed-%s" % kind
+
+    @staticmethod
+    def get_missing_key(kind):
+        return "counter_buffer_missing-%s" % kind
+
+    @staticmethod
+    def get_dirty_key(kind, index):
+        return "counter_buffer_dirty-%s-%d" % (kind, index)
+
+    @staticmethod
+    def register(kind, name):
+        """
+        Append the name to the dirty list of the kind. The index is reserved
+        before the slot is written, pop_dirty_names() waits for empty slots.
+        """
+        sequence_key = BufferedCounterService.get_sequence_key(kind)
+        cache.add(sequence_key, 0, None)
+        index = cache.incr(sequence_key)
+        cache.set(BufferedCounterService.get_dirty_key(kind, index), name, BufferedCounterService.TIMEOUT)
+
+    @staticmethod
+    def mark_dirty(kind, name):
+        """
+        Register the name unless it has a pending registration already.
+        Raises ValueError if the cache is unavailable.
+        """
+        pending_key = BufferedCounterService.get_pending_key(kind, name)
+        if not cache.add(pending_key, 1, BufferedCounterService.PENDING_TIMEOUT):
+            return
+        try:
+            BufferedCounterService.register(kind, name)
+        except ValueError:
+            cache.delete(pending_key)
+            raise
+
+    @staticmethod
+    def increment(kind, name, amount):
+        """
+        Buffer the amount and return True, or return False if the cache is
+        unavailable and the caller has to write to the database itself.
+        """
+        key = BufferedCounterService.get_key(kind, name)
+        try:
+            cache.add(key, 0, BufferedCounterService.TIMEOUT)
+            cache.incr(key, amount)
+        except ValueError:
+            return False
+
+        try:
+            BufferedCounterService.mark_dirty(kind, name)
+        except ValueError:
+            cache.decr(key, amount)
+            return False
+        return True
+
+    @staticmethod
+    def get(kind, name):
+        return cache.get(BufferedCounterService.get_key(kind, name)) or 0
+
+    @staticmethod
+    def take(kind, name):
+        """
+        Remove and return the buffered amount of a counter. Counters
+        incremented meanwhile are marked as dirty again, if the cache fails
+        to they are registered again by their next increment.
+        """
+        key = BufferedCounterService.get_key(kind, name)
+        value = cache.get(key) or 0
+        if not value:
+            return 0
+        try:
+            remainder = cache.decr(key, value)
+        except ValueError:
+            # Evicted since it was read, the amount read is all there is
+            return value
+        if remainder > 0:
+            try:
+                BufferedCounterService.mark_dirty(kind, name)
+            except ValueError:
+                pass
+        return value
+
+    @staticmethod
+    def restore_dirty_names(kind, names):
+        """
+        Mark popped names whose amounts were not taken as dirty again, as far
+        as the cache allows, when a flush fails.
+        """
+        for name in names:
+            try:
+                BufferedCounterService.mark_dirty(kind, name)
+            except Exception:
+                pass
+
+    @staticmethod
+    def pop_dirty_names(kind, limit):
+        """
+        Return the names of at most `limit` dirty counters of the given kind
+        and mark them as consumed, clearing their pending registrations so
+        the next increment registers them again.
+
+        Stops at the first empty slot, its index may have been reserved by
+        a register() still writing it. A slot still empty on the next call
+        was lost and is skipped.
+        """
+        last = cache.get(BufferedCounterService.get_sequence_key(kind)) or 0
+        flushed = cache.get(BufferedCounterService.get_flushed_key(kind)) or 0
+        if flushed > last:
+            # The sequence was evicted and started over
+            flushed = 0
+
+        upto = min(last, flushed + limit)
+        keys = [BufferedCounterService.get_dirty_key(kind, index) for index in range(flushed + 1, upto + 1)]
+        if not keys:
+            return set()
+
+        values = cache.get_many(keys)
+        missing_key = BufferedCounterService.get_missing_key(kind)
+        consumed = []
+        for index, key in enumerate(keys, flushed + 1):
+            if key not in values and cache.get(missing_key) != index:
+                cache.set(missing_key, index, BufferedCounterService.TIMEOUT)
+                break
+            consumed.append(key)
+        if not consumed:
+            return set()
+
+        names = {values[key] for key in consumed if key in values}
+        cache.set(BufferedCounterService.get_flushed_key(kind), flushed + len(consumed), None)
+        cache.delete_many(consumed)
+        cache.delete_many([BufferedCounterService.get_pending_key(kind, name) for name in names])
+        return names
+
+    @staticmethod
+    def acquire_flush_lock(kind):
+        return cache.add("counter_buffer_lock-%s" % kind, 1, BufferedCounterService.LOCK_TIMEOUT)
+
+    @staticmethod
+    def release_flush_lock(kind):
+        cache.delete("counter_buffer_lock-%s" % kind)
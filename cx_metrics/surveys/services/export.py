@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+
+from cx_metrics.multiple_choices.models import Option
+from .option_response import SurveyOptionResponseService
+
+
+class Echo(object):
+    """
+    File-like object returning what is written, lets csv.writer produce
+    lines for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+class SurveyResponseExportService(object):
+    CHUNK_SIZE = 2000
+    FORMAT_CSV = 'csv'
+    FORMAT_NDJSON = 'ndjson'
+    CONTENT_TYPES = {
+        FORMAT_CSV: 'text/csv; charset=utf-8',
+        FORMAT_NDJSON: 'application/x-ndjson',
+    }
+
+    @staticmethod
+    def filter_period(queryset, start=None, end=None):
+        if start is not None:
+            queryset = queryset.filter(created__gte=start)
+        if end is not None:
+            queryset = queryset.filter(created__lt=end)
+        return queryset
+
+    @staticmethod
+    def get_chunks(queryset, field_name):
+        """
+        Yield lists of at most CHUNK_SIZE (created, customer_uuid, value,
+        contra_mask, id) tuples of the responses, read with a server-side cursor where the
+        database supports it.
+        """
+        chunk_size = SurveyResponseExportService.CHUNK_SIZE
+        rows = queryset.order_by('created', 'id').values_list(
+            'created', 'customer_uuid', field_name, 'contra_mask', 'id'
+        )
+        chunk = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def get_contra_options(contra_id, model, chunk):
+        """
+        Return a {response id: [option text]} dict of the contra options
+        chosen with the responses of the chunk, see
+        SurveyOptionResponseService.match(). Responses with a contra_mask
+        are skipped.
+        """
+        if contra_id is None:
+            return {}
+
+        responses = [
+            (id_, created, customer_uuid)
+            for created, customer_uuid, _value, contra_mask, id_ in chunk if not contra_mask
+        ]
+        contra_options = {}
+        for _id, response_id, text in SurveyOptionResponseService.match(contra_id, model, responses):
+            contra_options.setdefault(response_id, []).append(text)
+        return contra_options
+
+    @staticmethod
+    def get_option_bits(contra_id):
+        """
+        Return (bit, text) pairs of the options of the contra question in
+        their order, to decode contra masks.
+        """
+        if contra_id is None:
+            return []
+        return list(
+            Option.objects.filter(multiple_choice_id=contra_id, bit__isnull=False).values_list('bit', 'text')
+        )
+
+    @staticmethod
+    def get_rows(queryset, field_name, contra_id=None):
+        """
+        Yield {'created', 'customer_uuid', field_name, 'contra_options'} dicts
+        of the responses of the queryset in creation order. Memory use does
+        not depend on the number of responses.
+        """
+        option_bits = SurveyResponseExportService.get_option_bits(contra_id)
+        for chunk in SurveyResponseExportService.get_chunks(queryset, field_name):
+            contra_options = SurveyResponseExportService.get_contra_options(contra_id, queryset.model, chunk)
+            for created, customer_uuid, value, contra_mask, id_ in chunk:
+                if contra_mask:
+                    options = [text for bit, text in option_bits if contra_mask & 1 << bit]
+                else:
+                    options = contra_options.get(id_, [])
+                yield {
+                    'created': created,
+                    'customer_uuid': customer_uuid,
+                    field_name: value,
+                    'contra_options': options,
+                }
+
+    @staticmethod
+    def render_csv(rows, field_name):
+        writer = csv.writer(Echo())
+        yield writer.writerow(['created', 'customer_uuid', field_name, 'contra_options'])
+        for row in rows:
+            yield writer.writerow([
+                row['created'].isoformat(), row['customer_uuid'], row[field_name], '|'.join(row['contra_options'])
+            ])
+
+    @staticmethod
+    def render_ndjson(rows, field_name):
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+    @staticmethod
+    def render(rows, field_name, format_):
+        if format_ == SurveyResponseExportService.FORMAT_NDJSON:
+            return SurveyResponseExportService.render_ndjson(rows, field_name)
+        return SurveyResponseExportService.render_csv(rows, field_name)
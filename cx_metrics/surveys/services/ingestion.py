@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from rest_framework.exceptions import ValidationError
+
+from ..factory import survey_factory
+from .snapshot import SurveySnapshotService
+
+
+class SurveyIngestionService(object):
+    """
+    Stores responses accepted by the response views in asynchronous mode,
+    see RESPONSE_ASYNC_INGESTION.
+    """
+
+    @staticmethod
+    def load_survey(survey_type, survey_uuid):
+        model = survey_factory.get_model(survey_type)
+        return model.objects.filter(uuid=survey_uuid).first()
+
+    @staticmethod
+    def ingest(survey_type, survey_uuid, serializer_class, items, user_agent=None):
+        """
+        Validate and store a batch of raw response payloads through the bulk
+        path of the given respond serializer class. Returns the number of
+        created and rejected responses.
+        """
+        survey = SurveySnapshotService.get(
+            survey_type, survey_uuid, lambda uuid_: SurveyIngestionService.load_survey(survey_type, uuid_)
+        )
+        if survey is None:
+            return {'created': 0, 'rejected': len(items)}
+
+        serializer = serializer_class(survey=survey)
+        validated_items = []
+        for item in items:
+            try:
+                validated_items.append(serializer.run_validation(item))
+            except ValidationError:
+                continue
+
+        results = serializer.bulk_create(validated_items, user_agent=user_agent) if validated_items else []
+        created = sum(1 for result in results if result is not None and not isinstance(result, ValidationError))
+        return {'created': created, 'rejected': len(items) - created}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from cx_metrics.multiple_choices.models import Option, OptionResponse
+
+
+class SurveyOptionResponseService(object):
+    """
+    Relates option responses to the survey responses they were chosen with.
+    Option responses stored before they were linked are matched to the
+    latest response of the same customer created at most MATCH_WINDOW
+    before them.
+    """
+    CHUNK_SIZE = 1000
+    MATCH_WINDOW = timedelta(minutes=1)
+
+    @staticmethod
+    def get_response_type(model):
+        return ContentType.objects.get_for_model(model)
+
+    @staticmethod
+    def match(contra_id, model, chunk):
+        """
+        Return (option_response_id, response_id, text) tuples of the option
+        responses of the contra question chosen with the (id, created,
+        customer_uuid) responses of the chunk, in the order they were stored.
+        """
+        if not chunk:
+            return []
+
+        response_type = SurveyOptionResponseService.get_response_type(model)
+        option_responses = OptionResponse.objects.filter(option_text__multiple_choice_id=contra_id)
+        matched = list(option_responses.filter(
+            response_type=response_type, response_id__in=[item[0] for item in chunk]
+        ).values_list('id', 'response_id', 'option_text__text'))
+
+        window = SurveyOptionResponseService.MATCH_WINDOW
+        responses = {}
+        for id_, created, customer_uuid in chunk:
+            responses.setdefault(customer_uuid, []).append((created, id_))
+        created = [item[1] for item in chunk]
+        unlinked = option_responses.filter(
+            response_type=None,
+            customer_uuid__in=list(responses),
+            created__gte=min(created),
+            created__lt=max(created) + window,
+        ).values_list('id', 'customer_uuid', 'created', 'option_text__text')
+        for option_response_id, customer_uuid, option_created, text in unlinked:
+            matches = [item for item in responses[customer_uuid] if item[0] <= option_created < item[0] + window]
+            if matches:
+                matched.append((option_response_id, max(matches)[1], text))
+
+        matched.sort()
+        return matched
+
+    @staticmethod
+    def link(survey, chunk_size=None, progress=None):
+        """
+        Link the option responses of the survey stored before they were
+        linked to their matching responses, one UPDATE per chunk of
+        responses. Returns the number of linked option responses.
+        """
+        if survey.contra_id is None:
+            return 0
+
+        chunk_size = chunk_size or SurveyOptionResponseService.CHUNK_SIZE
+        model = survey.responses.model
+        response_type = SurveyOptionResponseService.get_response_type(model)
+        rows = survey.responses.order_by('id').values_list('id', 'created', 'customer_uuid')
+
+        linked = 0
+        last_id = 0
+        while True:
+            chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+
+            response_ids = {
+                option_response_id: response_id
+                for option_response_id, response_id, _text in SurveyOptionResponseService.match(
+                    survey.contra_id, model, chunk
+                )
+            }
+            if response_ids:
+                with transaction.atomic():
+                    linked += OptionResponse.objects.filter(id__in=list(response_ids), response_type=None).update(
+                        response_type=response_type,
+                        response_id=Case(
+                            *[When(id=key, then=Value(value)) for key, value in response_ids.items()],
+                            output_field=IntegerField()
+                        ),
+                    )
+            if progress is not None:
+                progress(linked)
+        return linked
+
+    @staticmethod
+    def filter_option_text(responses, option_text):
+        """
+        Filter the given survey responses by the option text chosen with
+        them, either as a linked option response or in their contra_mask.
+        The contra_mask is only checked if the multiple choice uses contra
+        masks, the predicate cannot use an index.
+        """
+        response_type = SurveyOptionResponseService.get_response_type(responses.model)
+        condition = Q(id__in=OptionResponse.objects.filter(
+            option_text=option_text, response_type=response_type
+        ).values('response_id'))
+        if not option_text.multiple_choice.uses_mask():
+            return responses.filter(condition)
+
+        bit = Option.objects.filter(
+            multiple_choice_id=option_text.multiple_choice_id, text=option_text.text
+        ).values_list('bit', flat=True).first()
+        if bit is not None:
+            responses = responses.annotate(contra_bit=F('contra_mask').bitand(1 << bit))
+            condition |= Q(contra_bit__gt=0)
+        return responses.filter(condition)
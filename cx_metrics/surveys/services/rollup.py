@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+import hashlib
+import random
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BigIntegerField, Case, Count, F, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from ..models import SurveyRollup
+from .counters import BufferedCounterService, ShardedCounterService
+
+
+class SurveyRollupService(object):
+    BATCH_SIZE = 1000
+    COUNTER_BUFFER_KIND = 'rollup'
+    TRUNCATE_FUNCTIONS = (
+        (SurveyRollup.GRANULARITY_HOUR, TruncHour),
+        (SurveyRollup.GRANULARITY_DAY, TruncDay),
+    )
+
+    @staticmethod
+    def get_period(value, granularity):
+        """
+        Start of the hour or day of the given datetime in the current time
+        zone, the same as TruncHour and TruncDay return.
+        """
+        period = timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+        if granularity == SurveyRollup.GRANULARITY_DAY:
+            period = period.replace(hour=0)
+        return period
+
+    @staticmethod
+    def count(dimension, keys):
+        return Counter((dimension, str(key)) for key in keys)
+
+    @staticmethod
+    def increment(survey_uuid, counts, created=None, shards=None):
+        """
+        Add the {(dimension, key): amount} counts to the hourly and daily
+        rollups of the period containing created, now by default. The counts
+        are buffered in the cache in write-behind mode, otherwise written to
+        one random shard of the rollups with a single upsert.
+        """
+        if not counts:
+            return
+        created = created or timezone.now()
+        amounts = {}
+        for granularity, _truncate in SurveyRollupService.TRUNCATE_FUNCTIONS:
+            period = SurveyRollupService.get_period(created, granularity)
+            for (dimension, key), amount in counts.items():
+                amounts[(granularity, period, dimension, key)] = amount
+
+        if BufferedCounterService.is_enabled():
+            amounts = SurveyRollupService.buffer(survey_uuid, amounts)
+            if not amounts:
+                return
+
+        if shards is None:
+            shards = ShardedCounterService.get_shard_count()
+        shard = random.randrange(shards) if ShardedCounterService.is_sharded(shards) else 0
+        SurveyRollupService.write(survey_uuid, amounts, shard)
+
+    @staticmethod
+    def write(survey_uuid, amounts, shard=0):
+        """
+        Add the {(granularity, period, dimension, key): amount} amounts to the
+        given shard of the rollups of the survey, creating the missing rows.
+        The number of queries does not depend on the number of rows.
+        """
+        if not amounts:
+            return
+        if connection.vendor == 'postgresql':
+            SurveyRollupService.upsert(survey_uuid, amounts, shard)
+            return
+
+        rollups = SurveyRollup.objects.filter(
+            survey_uuid=survey_uuid, shard=shard,
+            granularity__in={item[0] for item in amounts}, period__in={item[1] for item in amounts},
+            dimension__in={item[2] for item in amounts}, key__in={item[3] for item in amounts},
+        )
+        ids = {
+            (granularity, period, dimension, key): id_
+            for id_, granularity, period, dimension, key in rollups.values_list(
+                'id', 'granularity', 'period', 'dimension', 'key'
+            )
+        }
+        missing = [item for item in amounts if item not in ids]
+        if missing:
+            try:
+                with transaction.atomic():
+                    SurveyRollup.objects.bulk_create([
+                        SurveyRollup(
+                            survey_uuid=survey_uuid, granularity=granularity, period=period, dimension=dimension,
+                            key=key, shard=shard, count=amounts[granularity, period, dimension, key]
+                        ) for granularity, period, dimension, key in missing
+                    ])
+            except IntegrityError:
+                # Some were created by a concurrent writer meanwhile
+                for granularity, period, dimension, key in missing:
+                    rollup, _created = SurveyRollup.objects.get_or_create(
+                        survey_uuid=survey_uuid, granularity=granularity, period=period, dimension=dimension,
+                        key=key, shard=shard
+                    )
+                    ids[granularity, period, dimension, key] = rollup.id
+
+        updates = {ids[item]: amount for item, amount in amounts.items() if item in ids}
+        if updates:
+            SurveyRollup.objects.filter(id__in=list(updates)).update(count=F('count') + Case(
+                *[When(id=id_, then=Value(amount)) for id_, amount in updates.items()],
+                output_field=BigIntegerField()
+            ))
+
+    @staticmethod
+    def upsert(survey_uuid, amounts, shard=0):
+        """
+        Add the {(granularity, period, dimension, key): amount} amounts to the
+        rollups with a single INSERT ... ON CONFLICT statement. Requires
+        PostgreSQL.
+        """
+        meta = SurveyRollup._meta
+        quote_name = connection.ops.quote_name
+        field_names = ('survey_uuid', 'granularity', 'period', 'dimension', 'key', 'shard', 'count')
+        columns = {field_name: quote_name(meta.get_field(field_name).column) for field_name in field_names}
+
+        params = []
+        # Sorted to lock conflicting rows in the same order in every transaction
+        items = sorted(amounts)
+        for granularity, period, dimension, key in items:
+            params.extend([
+                survey_uuid, granularity, period, dimension, key, shard, amounts[granularity, period, dimension, key]
+            ])
+        sql = (
+            'INSERT INTO {table} ({survey_uuid}, {granularity}, {period}, {dimension}, {key}, {shard}, {count}) '
+            'VALUES {values} '
+            'ON CONFLICT ({survey_uuid}, {granularity}, {period}, {dimension}, {key}, {shard}) '
+            'DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}'
+        ).format(
+            table=quote_name(meta.db_table), values=', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(items)),
+            **columns
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @staticmethod
+    def get_buffer_name(survey_uuid, granularity, period, dimension, key):
+        identity = '|'.join([str(survey_uuid), granularity, period.isoformat(), dimension, key])
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_label_key(name):
+        return "rollup_buffer_label-%s" % name
+
+    @staticmethod
+    def buffer(survey_uuid, amounts):
+        """
+        Buffer the {(granularity, period, dimension, key): amount} amounts in
+        the cache and return the amounts that could not be buffered. Counter
+        names are hashes, the rows they count are cached under their label key.
+        """
+        names = {item: SurveyRollupService.get_buffer_name(survey_uuid, *item) for item in amounts}
+        try:
+            cache.set_many(
+                {SurveyRollupService.get_label_key(name): (survey_uuid,) + item for item, name in names.items()},
+                BufferedCounterService.TIMEOUT
+            )
+        except ValueError:
+            return amounts
+
+        unbuffered = {}
+        for item, amount in amounts.items():
+            if not BufferedCounterService.increment(SurveyRollupService.COUNTER_BUFFER_KIND, names[item], amount):
+                unbuffered[item] = amount
+        return unbuffered
+
+    @staticmethod
+    def flush_buffered_counts(batch_size=None):
+        """
+        Write the rollup increments buffered in the cache to the database, one
+        statement per survey, and return the number of updated rollups.
+        """
+        kind = SurveyRollupService.COUNTER_BUFFER_KIND
+        batch_size = batch_size or int(settings.SURVEY_COUNTER_FLUSH_BATCH_SIZE)
+        if not BufferedCounterService.acquire_flush_lock(kind):
+            return 0
+
+        flushed = 0
+        try:
+            names = BufferedCounterService.pop_dirty_names(kind, batch_size)
+            while names:
+                labels = cache.get_many([SurveyRollupService.get_label_key(name) for name in names])
+                amounts = {}
+                taken = set()
+                try:
+                    for name in names:
+                        label = labels.get(SurveyRollupService.get_label_key(name))
+                        amount = BufferedCounterService.take(kind, name)
+                        taken.add(name)
+                        if amount and label is not None:
+                            amounts.setdefault(label[0], {})[label[1:]] = amount
+                except Exception:
+                    # Write what was taken already, the other names stay buffered
+                    BufferedCounterService.restore_dirty_names(kind, names - taken)
+                    SurveyRollupService.apply_buffered_counts(amounts)
+                    raise
+
+                SurveyRollupService.apply_buffered_counts(amounts)
+                flushed += sum(len(items) for items in amounts.values())
+                if len(names) < batch_size:
+                    break
+                names = BufferedCounterService.pop_dirty_names(kind, batch_size)
+        finally:
+            BufferedCounterService.release_flush_lock(kind)
+        return flushed
+
+    @staticmethod
+    def apply_buffered_counts(amounts):
+        try:
+            with transaction.atomic():
+                for survey_uuid, items in amounts.items():
+                    SurveyRollupService.write(survey_uuid, items)
+        except Exception:
+            for survey_uuid, items in amounts.items():
+                SurveyRollupService.buffer(survey_uuid, items)
+            raise
+
+    @staticmethod
+    def get_rows(queryset, dimension, field_name):
+        """
+        Yield SurveyRollup rows of the hourly and daily response counts of the
+        queryset, grouped by the given field, for rebuild().
+        """
+        for granularity, truncate in SurveyRollupService.TRUNCATE_FUNCTIONS:
+            counts = queryset.order_by().annotate(period=truncate('created')).values_list(
+                'period', field_name
+            ).annotate(total=Count('id'))
+            for period, key, count in counts.iterator():
+                yield SurveyRollup(
+                    granularity=granularity, period=period, dimension=dimension, key=str(key), count=count
+                )
+
+    @staticmethod
+    def get_mask_rows(queryset, dimension, keys):
+        """
+        Yield SurveyRollup rows of the hourly and daily counts of the responses
+        of the queryset having each of the given {bit: key} bits set in their
+        contra_mask, for rebuild().
+        """
+        if not keys:
+            return
+        sums = {'bit_%d' % bit: Sum(F('contra_mask').bitand(1 << bit) / (1 << bit)) for bit in keys}
+        for granularity, truncate in SurveyRollupService.TRUNCATE_FUNCTIONS:
+            counts = queryset.exclude(contra_mask=0).order_by().annotate(period=truncate('created')).values(
+                'period'
+            ).annotate(**sums)
+            for row in counts.iterator():
+                for bit, key in keys.items():
+                    if row['bit_%d' % bit]:
+                        yield SurveyRollup(
+                            granularity=granularity, period=row['period'], dimension=dimension, key=str(key),
+                            count=row['bit_%d' % bit]
+                        )
+
+    @staticmethod
+    def rebuild(survey_uuid, rows):
+        """
+        Replace all rollups of the survey with the given unsaved SurveyRollup
+        rows, counts of rows of the same period, dimension and key are added.
+        """
+        merged = OrderedDict()
+        for row in rows:
+            key = (row.granularity, row.period, row.dimension, row.key)
+            if key in merged:
+                merged[key].count += row.count
+            else:
+                merged[key] = row
+
+        with transaction.atomic():
+            SurveyRollup.objects.filter(survey_uuid=survey_uuid).delete()
+            batch = []
+            for row in merged.values():
+                row.survey_uuid = survey_uuid
+                batch.append(row)
+                if len(batch) >= SurveyRollupService.BATCH_SIZE:
+                    SurveyRollup.objects.bulk_create(batch)
+                    batch = []
+            SurveyRollup.objects.bulk_create(batch)
+
+    @staticmethod
+    def get_timeseries(survey_uuid, granularity, start, end):
+        """
+        Return the rollups of the survey between start (inclusive) and end
+        (exclusive) as a list of {'period': ..., dimension: {key: count}} items.
+        """
+        rollups = SurveyRollup.objects.filter(
+            survey_uuid=survey_uuid, granularity=granularity, period__gte=start, period__lt=end
+        ).order_by('period').values_list('period', 'dimension', 'key').annotate(total=Sum('count'))
+
+        timeseries = OrderedDict()
+        for period, dimension, key, count in rollups:
+            item = timeseries.setdefault(period, {'period': period})
+            item.setdefault(dimension, {})[key] = count
+        return list(timeseries.values())
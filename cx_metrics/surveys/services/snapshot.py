@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from .cache import SurveySnapshotCacheService
+
+
+class SurveySnapshot(object):
+    """
+    Compact read-only copy of a survey model with everything validating and
+    storing a response needs: the survey fields named in SNAPSHOT_FIELDS of
+    its model, its business (identification mode) and its contra together
+    with the ids of its options.
+    """
+    FIELD_NAMES = ('id', 'uuid', 'name', 'business_id', 'contra_id')
+
+    def __init__(self, survey):
+        self.type = survey.type
+        for field_name in self.FIELD_NAMES + tuple(survey.SNAPSHOT_FIELDS):
+            setattr(self, field_name, getattr(survey, field_name, None))
+
+        self.business = survey.business
+        self.contra = getattr(survey, 'contra', None)
+        if self.contra is not None:
+            # Evaluated here to be cached with the snapshot
+            self.contra.option_ids
+
+    def __str__(self):
+        return self.name
+
+    def has_contra(self):
+        return self.contra and self.contra.enabled
+
+
+class SurveySnapshotService(object):
+    @staticmethod
+    def get(survey_type, survey_uuid, load):
+        """
+        Return the snapshot of the survey from the cache, or build and cache
+        it from the survey model returned by load(survey_uuid). Returns None
+        if the survey does not exist.
+        """
+        snapshot = SurveySnapshotCacheService.get(survey_type, survey_uuid)
+        if snapshot is not None:
+            return snapshot
+
+        survey = load(survey_uuid)
+        if survey is None:
+            return None
+
+        snapshot = SurveySnapshot(survey)
+        SurveySnapshotCacheService.set(survey_type, survey_uuid, snapshot)
+        return snapshot
@@ -2,7 +2,7 @@
 # vim: ai ts=4 sts=4 et sw=4
 from django.conf import settings
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from ..models import Survey
 
@@ -41,3 +41,24 @@ class SurveyService(object):
             if datetime.timestamp(timezone.now()) - ts < int(settings.RESPONSE_DUPLICATE_BLOCK_TIME):
                 return True
         return False
+
+    @staticmethod
+    def get_duplicate_block_start():
+        return timezone.now() - timedelta(seconds=int(settings.RESPONSE_DUPLICATE_BLOCK_TIME))
+
+    @staticmethod
+    def set_missing_response_ids(survey_responses):
+        """
+        Set the primary keys of the given responses of one survey that
+        bulk_create() could not set on this database backend, looking them up
+        by customer. Customers must be unique among the responses.
+        """
+        missing = [response for response in survey_responses if response.pk is None]
+        if not missing:
+            return
+        model = type(missing[0])
+        ids = dict(model.objects.filter(
+            survey_uuid=missing[0].survey_uuid, customer_uuid__in=[response.customer_uuid for response in missing]
+        ).order_by('id').values_list('customer_uuid', 'id'))
+        for response in missing:
+            response.pk = ids.get(response.customer_uuid)
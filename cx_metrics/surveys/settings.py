@@ -10,3 +10,55 @@ CLIENT_ID_COOKIE_DOMAIN = None
 CLIENT_ID_COOKIE_SECURE = False
 
 RESPONSE_DUPLICATE_BLOCK_TIME = 30
+
+# Maximum number of responses accepted by a single bulk response request
+RESPONSE_BULK_MAX_SIZE = 1000
+
+# Number of counter rows survey counters are spread over to reduce row lock
+# contention, counters are not sharded when it is lower than 2. Surveys with
+# a non-zero counter_shards field use their own value instead.
+SURVEY_COUNTER_SHARDS = 0
+
+# Accumulate NPS, option text and rollup counter increments in the cache and
+# write them to the database with the flush_nps_counters,
+# flush_option_text_counters and flush_rollups Celery tasks
+SURVEY_COUNTER_WRITE_BEHIND = False
+SURVEY_COUNTER_FLUSH_BATCH_SIZE = 1000
+
+# Validate responses against the cached survey snapshot only, store them with
+# the ingest_survey_responses Celery task and answer 202 Accepted. Bulk
+# requests are enqueued in batches of RESPONSE_ASYNC_BATCH_SIZE responses.
+RESPONSE_ASYNC_INGESTION = False
+RESPONSE_ASYNC_BATCH_SIZE = 100
+
+# Cached survey and insight representations are kept as stale values for
+# SURVEY_CACHE_STALE_TIMEOUT seconds after they expire or are invalidated and
+# served while a single request recomputes them under a lock held for at most
+# SURVEY_CACHE_LOCK_TIMEOUT seconds. Values are recomputed early with a
+# probability growing with SURVEY_CACHE_EARLY_REFRESH_BETA, 0 disables it.
+SURVEY_CACHE_STALE_TIMEOUT = 24 * 60 * 60  # 1 day
+SURVEY_CACHE_LOCK_TIMEOUT = 30
+SURVEY_CACHE_EARLY_REFRESH_BETA = 1.0
+
+# Survey and multiple choice representations are also kept for
+# SURVEY_LOCAL_CACHE_TIMEOUT seconds in a per process LRU cache of at most
+# SURVEY_LOCAL_CACHE_MAX_SIZE entries, 0 disables it.
+SURVEY_LOCAL_CACHE_MAX_SIZE = 1000
+SURVEY_LOCAL_CACHE_TIMEOUT = 10
+
+# Cache the rendered JSON of public survey representations with an ETag and
+# answer requests with a matching If-None-Match header with 304 Not Modified
+SURVEY_CACHE_RENDERED_JSON = False
+
+# Maximum number of copies made by one survey clone request, the copies are
+# inserted in batches of SURVEY_CLONE_BATCH_SIZE rows
+SURVEY_CLONE_MAX_COUNT = 1000
+SURVEY_CLONE_BATCH_SIZE = 500
+
+# Store the chosen options of checkbox and multi select contra questions as a
+# bitset in the contra_mask of the response instead of one option response
+# row per option. Option text counts and rollups are kept either way.
+SURVEY_CONTRA_MASK_STORAGE = False
+
+# Page size of the responses listed per contra option
+SURVEY_OPTION_RESPONSES_PAGE_SIZE = 50
@@ -1,13 +1,17 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
 from django.db.models.signals import post_save, post_delete
+from upkook_core.businesses.models import Business
+
+from cx_metrics.multiple_choices.services import MultipleChoiceService
 from .models import SurveyModel
-from .services import SurveyCacheService
+from .services import SurveyCacheService, SurveySnapshotCacheService
 
 
 def clear_cache_on_change(sender, instance, created=False, raw=False, **kwargs):
     if not raw and issubclass(sender, SurveyModel) and not created:
         SurveyCacheService.delete(instance.uuid)
+        SurveySnapshotCacheService.delete(instance.type, instance.uuid)
 
 
 def manage_signal_receivers(sender, connect=True):
@@ -19,3 +23,21 @@ def manage_signal_receivers(sender, connect=True):
             signal.connect(clear_cache_on_change, sender, dispatch_uid=dispatch_uid)
         else:
             signal.disconnect(clear_cache_on_change, sender, dispatch_uid=dispatch_uid)
+
+
+def clear_business_cache_on_change(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Activation and identification mode of a business are part of the cached
+    surveys, snapshots and insights of its surveys
+    """
+    if not raw and not created:
+        SurveyCacheService.invalidate_business(instance.id)
+        MultipleChoiceService.local_cache.invalidate()
+
+
+def manage_business_signal_receivers(connect=True):
+    dispatch_uid = 'surveys_business_post_save_clear_business_cache_on_change'
+    if connect:
+        post_save.connect(clear_business_cache_on_change, Business, dispatch_uid=dispatch_uid)
+    else:
+        post_save.disconnect(clear_business_cache_on_change, Business, dispatch_uid=dispatch_uid)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from celery import shared_task
+from django.db import DatabaseError
+from django.utils.module_loading import import_string
+
+from .factory import survey_factory
+from .services import SurveyCacheService, SurveyRollupService
+from .services.ingestion import SurveyIngestionService
+
+
+@shared_task(autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=5)
+def ingest_survey_responses(survey_type, survey_uuid, serializer_path, items, user_agent=None):
+    return SurveyIngestionService.ingest(
+        survey_type, survey_uuid, import_string(serializer_path), items, user_agent=user_agent
+    )
+
+
+@shared_task
+def flush_rollups():
+    return SurveyRollupService.flush_buffered_counts()
+
+
+def report_progress(task, total):
+    def progress(done):
+        # Eager tasks have no result backend to store their state in
+        if task.request.id is not None and not task.request.is_eager:
+            task.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+    return progress
+
+
+@shared_task(bind=True)
+def delete_business_surveys(self, survey_type, business_id):
+    """
+    Delete the surveys of the given type of a business in chunks, reporting
+    the number of deleted surveys as PROGRESS state meta data. The cached
+    surveys of the business are invalidated as no signals are sent.
+    """
+    queryset = survey_factory.get_model(survey_type).objects.filter(business_id=business_id)
+    deleted, _counts = queryset.delete_chunked(progress=report_progress(self, queryset.count()))
+    SurveyCacheService.invalidate_business(business_id)
+    return deleted
+
+
+@shared_task(bind=True)
+def update_business_surveys(self, survey_type, business_id, values):
+    """
+    Update the surveys of the given type of a business with the given field
+    values in chunks, reporting the number of updated surveys as PROGRESS
+    state meta data. The cached surveys of the business are invalidated as
+    no signals are sent.
+    """
+    queryset = survey_factory.get_model(survey_type).objects.filter(business_id=business_id)
+    rows = queryset.update_chunked(values, progress=report_progress(self, queryset.count()))
+    SurveyCacheService.invalidate_business(business_id)
+    return rows
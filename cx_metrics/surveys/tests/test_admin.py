@@ -4,9 +4,12 @@ from uuid import uuid4
 
 from django.contrib.admin.sites import AdminSite
 from django.test import TestCase
+from mock import patch
+from upkook_core.businesses.services import BusinessService
 
-from ..admin import SurveyAdmin
+from ..admin import SurveyAdmin, SurveyAdminBase
 from ..models import Survey
+from .models import TestSurvey
 
 
 class MockRequest(object):
@@ -33,3 +36,26 @@ class SurveyAdminTestCase(TestCase):
 
     def test_has_delete_permission_false(self):
         self.assertFalse(self.survey_admin.has_delete_permission(request=self.request))
+
+
+class SurveyAdminBaseTestCase(TestCase):
+    fixtures = ['users', 'industries', 'businesses']
+
+    def setUp(self):
+        self.survey_admin = SurveyAdminBase(model=TestSurvey, admin_site=AdminSite())
+        self.business = BusinessService.get_business_by_id(1)
+
+    def test_delete_queryset(self):
+        for _i in range(3):
+            TestSurvey.objects.create(name=self.id(), business=self.business)
+
+        self.survey_admin.delete_queryset(MockRequest(), TestSurvey.objects.filter(name=self.id()))
+
+        self.assertFalse(TestSurvey.objects.filter(name=self.id()).exists())
+        self.assertFalse(Survey.objects.filter(name=self.id()).exists())
+
+    def test_delete_queryset_chunked(self):
+        queryset = TestSurvey.objects.filter(name=self.id())
+        with patch.object(type(queryset), 'delete_chunked', autospec=True) as mock_delete_chunked:
+            self.survey_admin.delete_queryset(MockRequest(), queryset)
+        mock_delete_chunked.assert_called_once_with(queryset)
@@ -1,9 +1,17 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
+import time
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import override_settings, TestCase
 from django.core.cache import cache
+from mock import patch, Mock
 
-from ..services.cache import SurveyCacheService
+from ..services.cache import (
+    CacheNamespaceService, CacheStatsService, LocalCache, SingleFlightCacheService, SurveyCacheService,
+    SurveyInsightCacheService, SurveyResponseGuardCacheService
+)
 
 
 @override_settings(
@@ -29,3 +37,404 @@ class SurveyCacheServiceTestCase(TestCase):
         SurveyCacheService.set(self.id(), data)
         SurveyCacheService.delete(self.id())
         self.assertIsNone(SurveyCacheService.get(self.id()))
+
+    def test_survey_cache_miss_keeps_other_keys(self):
+        SurveyCacheService.local.clear()
+        SurveyCacheService.get_or_compute('other', Mock(return_value=({'name': 'other'}, 1)))
+        SurveyCacheService.get_or_compute(self.id(), Mock(return_value=({'name': self.id()}, 1)))
+
+        with patch('time.time', return_value=time.time() + LocalCache.VERSION_CHECK_INTERVAL):
+            with patch.object(cache, 'get_many') as mock_get_many:
+                self.assertEqual(SurveyCacheService.get_or_compute('other', Mock()), {'name': 'other'})
+            self.assertFalse(mock_get_many.called)
+
+    def test_survey_cache_set(self):
+        SurveyCacheService.local.clear()
+        SurveyCacheService.get_or_compute('other', Mock(return_value=({'name': 'other'}, 1)))
+        SurveyCacheService.get_or_compute(self.id(), Mock(return_value=({'name': self.id()}, 1)))
+
+        SurveyCacheService.set(self.id(), {'name': 'new'})
+        self.assertEqual(SurveyCacheService.get(self.id()), {'name': 'new'})
+        self.assertEqual(SurveyCacheService.local.get(SurveyCacheService.get_key('other')), {'name': 'other'})
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'single-flight',
+        }
+    },
+    SURVEY_CACHE_EARLY_REFRESH_BETA=0,
+)
+class SingleFlightCacheServiceTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.compute = Mock(return_value={'name': 'fresh'})
+
+    def get_or_compute(self):
+        return SingleFlightCacheService.get_or_compute(self.id(), self.compute, 60, self.id())
+
+    def test_miss(self):
+        self.assertEqual(self.get_or_compute(), {'name': 'fresh'})
+        self.assertEqual(cache.get(self.id()), {'name': 'fresh'})
+        self.assertEqual(self.compute.call_count, 1)
+        self.assertIsNone(cache.get(SingleFlightCacheService.get_lock_key(self.id())))
+
+    def test_hit(self):
+        self.get_or_compute()
+        self.assertEqual(self.get_or_compute(), {'name': 'fresh'})
+        self.assertEqual(self.compute.call_count, 1)
+        self.assertEqual(CacheStatsService.get(self.id()), {'hit': 1, 'miss': 1, 'stale': 0, 'recompute': 1})
+
+    def test_stale_while_revalidate(self):
+        SingleFlightCacheService.set(self.id(), {'name': 'stale'}, 60)
+        SingleFlightCacheService.delete(self.id())
+        SingleFlightCacheService.acquire(self.id())
+
+        self.assertEqual(self.get_or_compute(), {'name': 'stale'})
+        self.compute.assert_not_called()
+        self.assertEqual(CacheStatsService.get(self.id())['stale'], 1)
+
+    def test_recompute_after_delete(self):
+        SingleFlightCacheService.set(self.id(), {'name': 'stale'}, 60)
+        SingleFlightCacheService.delete(self.id())
+        self.assertEqual(self.get_or_compute(), {'name': 'fresh'})
+
+    @patch.object(SingleFlightCacheService, 'LOCK_WAIT', 0.1)
+    def test_locked_without_stale_value(self):
+        SingleFlightCacheService.acquire(self.id())
+        self.assertEqual(self.get_or_compute(), {'name': 'fresh'})
+        self.assertEqual(self.compute.call_count, 1)
+
+    def test_wait(self):
+        SingleFlightCacheService.acquire(self.id())
+        with patch.object(cache, 'get', side_effect=[None, {'name': 'other'}]), patch('time.sleep'):
+            self.assertEqual(SingleFlightCacheService.wait(self.id()), {'name': 'other'})
+
+    def test_release_on_error(self):
+        self.compute.side_effect = ValueError
+        self.assertRaises(ValueError, self.get_or_compute)
+        self.assertTrue(SingleFlightCacheService.acquire(self.id()))
+
+    @override_settings(SURVEY_CACHE_EARLY_REFRESH_BETA=1)
+    def test_early_refresh(self):
+        now = time.time()
+        SingleFlightCacheService.set(self.id(), {'name': 'old'}, 60, delta=1)
+        with patch('random.random', return_value=0.5):
+            self.assertEqual(self.get_or_compute(), {'name': 'old'})
+        # 50 seconds later -log(1 - 0.999999) times the compute time reaches the expiry
+        with patch('random.random', return_value=0.999999), patch('time.time', return_value=now + 50):
+            self.assertEqual(self.get_or_compute(), {'name': 'fresh'})
+
+    def test_update(self):
+        SingleFlightCacheService.set(self.id(), {'count': 1}, 60, delta=2)
+        expires = cache.get(SingleFlightCacheService.get_stale_key(self.id()))['expires']
+
+        self.assertTrue(SingleFlightCacheService.update(self.id(), lambda data: {'count': data['count'] + 1}))
+        self.assertEqual(cache.get(self.id()), {'count': 2})
+        stale = cache.get(SingleFlightCacheService.get_stale_key(self.id()))
+        self.assertAlmostEqual(stale['expires'], expires, delta=1)
+        self.assertEqual(stale['delta'], 2)
+
+    def test_update_missing(self):
+        update = Mock()
+        self.assertFalse(SingleFlightCacheService.update(self.id(), update))
+        update.assert_not_called()
+
+    def test_update_while_recomputing(self):
+        SingleFlightCacheService.set(self.id(), {'count': 1}, 60)
+        SingleFlightCacheService.acquire(self.id())
+
+        self.assertFalse(SingleFlightCacheService.update(self.id(), lambda data: data))
+        self.assertIsNone(cache.get(self.id()))
+
+    def test_update_during_compute(self):
+        def compute():
+            # A response stored while the value is computed from data read before it
+            self.assertFalse(SingleFlightCacheService.update(self.id(), lambda data: {'count': data['count'] + 1}))
+            return {'count': 1}
+
+        self.assertEqual(SingleFlightCacheService.get_or_compute(self.id(), compute, 60, self.id()), {'count': 1})
+        self.assertIsNone(cache.get(self.id()))
+
+        compute = Mock(return_value={'count': 2})
+        self.assertEqual(SingleFlightCacheService.get_or_compute(self.id(), compute, 60, self.id()), {'count': 2})
+        self.assertEqual(cache.get(self.id()), {'count': 2})
+
+    def test_invalidate_after_compute_stored(self):
+        invalidations = iter([None, None, 1])
+        with patch.object(SingleFlightCacheService, 'get_invalidations', side_effect=lambda key: next(invalidations)):
+            SingleFlightCacheService.get_or_compute(self.id(), Mock(return_value={'count': 1}), 60, self.id())
+        self.assertIsNone(cache.get(self.id()))
+
+    def test_update_failure(self):
+        SingleFlightCacheService.set(self.id(), {'count': 1}, 60)
+
+        self.assertFalse(SingleFlightCacheService.update(self.id(), lambda data: data['rates']))
+        self.assertIsNone(cache.get(self.id()))
+
+    def test_update_none(self):
+        SingleFlightCacheService.set(self.id(), {'count': 1}, 60)
+
+        self.assertFalse(SingleFlightCacheService.update(self.id(), lambda data: None))
+        self.assertIsNone(cache.get(self.id()))
+
+    def test_update_since(self):
+        SingleFlightCacheService.set(self.id(), {'count': 1}, 60, computed=100)
+
+        self.assertTrue(SingleFlightCacheService.update(self.id(), lambda data: {'count': data['count'] + 1}, 101))
+        self.assertEqual(cache.get(self.id()), {'count': 2})
+        self.assertEqual(cache.get(SingleFlightCacheService.get_stale_key(self.id()))['computed'], 100)
+
+    def test_update_computed_after_since(self):
+        # Recomputed after the changes started, they may be counted already
+        SingleFlightCacheService.set(self.id(), {'count': 1}, 60, computed=100)
+
+        self.assertFalse(SingleFlightCacheService.update(self.id(), lambda data: {'count': data['count'] + 1}, 100))
+        self.assertIsNone(cache.get(self.id()))
+
+    def test_add_counts(self):
+        items = [{'text': 'a', 'count': 1}, {'text': 'b', 'count': 2}]
+        self.assertEqual(SurveyInsightCacheService.add_counts(items, 'text', {'b': 3, 'c': 1}), [
+            {'text': 'a', 'count': 1}, {'text': 'b', 'count': 5}, {'text': 'c', 'count': 1}
+        ])
+        self.assertEqual(SurveyInsightCacheService.add_counts(None, 'text', {'a': 1}), [{'text': 'a', 'count': 1}])
+
+    def test_add_breakdowns(self):
+        items = [{'text': 'a', 'count': 2, 'breakdown': {'promoters': 2}}, {'text': 'b', 'count': 1}]
+        self.assertEqual(SurveyInsightCacheService.add_breakdowns(items, {'a': {'promoters': 1, 'detractors': 1}}), [
+            {'text': 'a', 'count': 2, 'breakdown': {'promoters': 3, 'detractors': 1}},
+            {'text': 'b', 'count': 1, 'breakdown': {}},
+        ])
+
+    def test_namespaced(self):
+        self.compute.return_value = ({'name': 'fresh'}, 'test')
+        SingleFlightCacheService.get_or_compute(self.id(), self.compute, 60, self.id(), namespaced=True)
+        value = SingleFlightCacheService.get_or_compute(self.id(), self.compute, 60, self.id(), namespaced=True)
+        self.assertEqual(value, {'name': 'fresh'})
+        self.assertEqual(self.compute.call_count, 1)
+
+        CacheNamespaceService.bump('test')
+        self.assertEqual(SingleFlightCacheService.read(self.id()), (None, None))
+        SingleFlightCacheService.get_or_compute(self.id(), self.compute, 60, self.id(), namespaced=True)
+        self.assertEqual(self.compute.call_count, 2)
+
+    def test_namespaced_without_namespace(self):
+        SingleFlightCacheService.set(self.id(), {'name': 'old'}, 60)
+        self.compute.return_value = ({'name': 'fresh'}, 'test')
+        value = SingleFlightCacheService.get_or_compute(self.id(), self.compute, 60, self.id(), namespaced=True)
+        self.assertEqual(value, {'name': 'fresh'})
+
+    def test_update_invalidated_namespace(self):
+        SingleFlightCacheService.set(self.id(), {'count': 1}, 60, namespace='test')
+        CacheNamespaceService.bump('test')
+        self.assertFalse(SingleFlightCacheService.update(self.id(), lambda data: data))
+
+    def test_invalidate_business(self):
+        compute = Mock(return_value=({'name': 'fresh'}, 1))
+        SurveyCacheService.get_or_compute(self.id(), compute)
+        SurveyInsightCacheService.get_or_compute('NPS', self.id(), compute)
+        SurveyCacheService.invalidate_business(2)
+        SurveyCacheService.get_or_compute(self.id(), compute)
+        self.assertEqual(compute.call_count, 2)
+
+        SurveyCacheService.invalidate_business(1)
+        self.assertIsNone(SurveyCacheService.get(self.id()))
+        self.assertIsNone(SurveyInsightCacheService.get('NPS', self.id()))
+        SurveyCacheService.get_or_compute(self.id(), compute)
+        self.assertEqual(compute.call_count, 3)
+
+    def test_should_refresh_disabled(self):
+        self.assertFalse(SingleFlightCacheService.should_refresh({'value': 1, 'expires': 0, 'delta': 1}))
+        self.assertFalse(SingleFlightCacheService.should_refresh(None))
+
+    def test_stats_command(self):
+        compute = Mock(return_value=({'name': 'fresh'}, 1))
+        SurveyCacheService.get_or_compute(self.id(), compute)
+        SurveyInsightCacheService.get_or_compute('NPS', self.id(), compute)
+        SurveyInsightCacheService.get_or_compute('NPS', self.id(), compute)
+
+        out = StringIO()
+        call_command('survey_cache_stats', '--reset', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), [
+            'survey_local: hit=0, miss=0, stale=0, recompute=0, hit_ratio=0.00',
+            'survey: hit=0, miss=1, stale=0, recompute=1, hit_ratio=0.00',
+            'insight: hit=1, miss=1, stale=0, recompute=1, hit_ratio=0.50',
+            'multiple_choice_local: hit=0, miss=0, stale=0, recompute=0, hit_ratio=0.00',
+            'multiple_choice: hit=0, miss=0, stale=0, recompute=0, hit_ratio=0.00',
+        ])
+        self.assertEqual(CacheStatsService.get('insight')['hit'], 0)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cache-namespaces',
+        }
+    }
+)
+class CacheNamespaceServiceTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_get_version(self):
+        version = CacheNamespaceService.get_version('test')
+        self.assertEqual(CacheNamespaceService.get_version('test'), version)
+        self.assertNotEqual(CacheNamespaceService.get_version('other'), version)
+        self.assertTrue(CacheNamespaceService.is_current('test', version))
+
+    def test_bump(self):
+        version = CacheNamespaceService.get_version('test')
+        CacheNamespaceService.bump('test')
+        self.assertFalse(CacheNamespaceService.is_current('test', version))
+        self.assertNotEqual(CacheNamespaceService.get_version('test'), version)
+
+    def test_evicted_version(self):
+        version = CacheNamespaceService.get_version('test')
+        cache.delete(CacheNamespaceService.get_key('test'))
+        self.assertFalse(CacheNamespaceService.is_current('test', version))
+        self.assertNotEqual(CacheNamespaceService.get_version('test'), version)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'local-cache',
+        }
+    },
+    SURVEY_LOCAL_CACHE_MAX_SIZE=2,
+    SURVEY_LOCAL_CACHE_TIMEOUT=10,
+)
+class LocalCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.local = LocalCache(self.id())
+
+    def test_get(self):
+        self.assertIsNone(self.local.get('a'))
+        self.local.set('a', 1)
+        self.assertEqual(self.local.get('a'), 1)
+
+    def test_lru(self):
+        self.local.set('a', 1)
+        self.local.set('b', 2)
+        self.local.get('a')
+        self.local.set('c', 3)
+
+        self.assertEqual(self.local.get('a'), 1)
+        self.assertIsNone(self.local.get('b'))
+        self.assertEqual(self.local.get('c'), 3)
+
+    def test_timeout(self):
+        self.local.set('a', 1)
+        with patch('time.time', return_value=time.time() + 11):
+            self.assertIsNone(self.local.get('a'))
+
+    @override_settings(SURVEY_LOCAL_CACHE_MAX_SIZE=0)
+    def test_disabled(self):
+        self.local.set('a', 1)
+        self.assertIsNone(self.local.get('a'))
+
+    def test_invalidate_other_process(self):
+        other = LocalCache(self.id())
+        self.local.set('a', 1)
+        self.local.get('a')
+
+        other.invalidate()
+        self.assertEqual(self.local.get('a'), 1)
+        with patch('time.time', return_value=time.time() + LocalCache.VERSION_CHECK_INTERVAL):
+            self.assertIsNone(self.local.get('a'))
+
+    def test_invalidate_key_other_process(self):
+        other = LocalCache(self.id())
+        self.local.set('a', 1, self.local.get_key_version('a'))
+        self.local.set('b', 2, self.local.get_key_version('b'))
+
+        other.invalidate('a')
+        self.assertEqual(self.local.get('a'), 1)
+        with patch('time.time', return_value=time.time() + LocalCache.VERSION_CHECK_INTERVAL):
+            self.assertIsNone(self.local.get('a'))
+            self.assertEqual(self.local.get('b'), 2)
+
+    def test_set_stale_version(self):
+        version = self.local.get_key_version('a')
+        LocalCache(self.id()).invalidate('a')
+        self.local.set('a', 1, version)
+        with patch('time.time', return_value=time.time() + LocalCache.VERSION_CHECK_INTERVAL):
+            self.assertIsNone(self.local.get('a'))
+
+    def test_flush_stats(self):
+        self.local.set('a', 1)
+        self.local.get('a')
+        self.local.get('b')
+        self.assertEqual(CacheStatsService.get(self.id())['hit'], 0)
+
+        with patch('time.time', return_value=time.time() + LocalCache.STATS_FLUSH_INTERVAL):
+            self.local.get('a')
+        self.assertEqual(CacheStatsService.get(self.id()), {'hit': 1, 'miss': 2, 'stale': 0, 'recompute': 0})
+
+    def test_survey_cache(self):
+        SurveyCacheService.local.clear()
+        compute = Mock(return_value=({'name': self.id()}, 1))
+        SurveyCacheService.get_or_compute(self.id(), compute)
+
+        with patch.object(cache, 'get_many') as mock_get_many:
+            self.assertEqual(SurveyCacheService.get_or_compute(self.id(), compute), {'name': self.id()})
+            self.assertFalse(mock_get_many.called)
+
+        SurveyCacheService.delete(self.id())
+        self.assertIsNone(SurveyCacheService.get(self.id()))
+
+    def test_survey_cache_miss_keeps_other_keys(self):
+        SurveyCacheService.local.clear()
+        SurveyCacheService.get_or_compute('other', Mock(return_value=({'name': 'other'}, 1)))
+        SurveyCacheService.get_or_compute(self.id(), Mock(return_value=({'name': self.id()}, 1)))
+
+        with patch('time.time', return_value=time.time() + LocalCache.VERSION_CHECK_INTERVAL):
+            with patch.object(cache, 'get_many') as mock_get_many:
+                self.assertEqual(SurveyCacheService.get_or_compute('other', Mock()), {'name': 'other'})
+            self.assertFalse(mock_get_many.called)
+
+    def test_survey_cache_set(self):
+        SurveyCacheService.local.clear()
+        SurveyCacheService.get_or_compute('other', Mock(return_value=({'name': 'other'}, 1)))
+        SurveyCacheService.get_or_compute(self.id(), Mock(return_value=({'name': self.id()}, 1)))
+
+        SurveyCacheService.set(self.id(), {'name': 'new'})
+        self.assertEqual(SurveyCacheService.get(self.id()), {'name': 'new'})
+        self.assertEqual(SurveyCacheService.local.get(SurveyCacheService.get_key('other')), {'name': 'other'})
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+)
+class SurveyResponseGuardCacheServiceTestCase(TestCase):
+    def test_acquire(self):
+        self.assertTrue(SurveyResponseGuardCacheService.acquire(self.id(), 'customer'))
+        self.assertFalse(SurveyResponseGuardCacheService.acquire(self.id(), 'customer'))
+        self.assertTrue(SurveyResponseGuardCacheService.acquire(self.id(), 'other'))
+
+    @override_settings(RESPONSE_DUPLICATE_BLOCK_TIME=60)
+    def test_acquire_timeout(self):
+        with patch.object(cache, 'add', return_value=True) as mock_add:
+            SurveyResponseGuardCacheService.acquire(self.id(), 'customer')
+        self.assertEqual(mock_add.call_args[0][0], 'response_guard-%s-customer' % self.id())
+        self.assertEqual(mock_add.call_args[0][2], 60)
+
+    def test_acquire_cache_unavailable(self):
+        with patch.object(cache, 'add', return_value=False):
+            self.assertIsNone(SurveyResponseGuardCacheService.acquire(self.id(), 'customer'))
+        with patch.object(cache, 'add', side_effect=ConnectionError):
+            self.assertIsNone(SurveyResponseGuardCacheService.acquire(self.id(), 'customer'))
+
+    def test_release(self):
+        SurveyResponseGuardCacheService.acquire(self.id(), 'customer')
+        SurveyResponseGuardCacheService.release(self.id(), 'customer')
+        self.assertTrue(SurveyResponseGuardCacheService.acquire(self.id(), 'customer'))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.cache import cache
+from django.test import override_settings, TestCase
+from mock import patch
+
+from ..services.counters import BufferedCounterService
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'counters',
+        }
+    }
+)
+class BufferedCounterServiceTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_increment(self):
+        self.assertTrue(BufferedCounterService.increment('kind', 'name', 2))
+        self.assertTrue(BufferedCounterService.increment('kind', 'name', 3))
+        self.assertEqual(BufferedCounterService.get('kind', 'name'), 5)
+
+    def test_increment_cache_unavailable(self):
+        with patch.object(cache, 'incr', side_effect=ValueError):
+            self.assertFalse(BufferedCounterService.increment('kind', 'name', 1))
+
+    def test_pop_dirty_names(self):
+        BufferedCounterService.increment('kind', 'first', 1)
+        BufferedCounterService.increment('kind', 'first', 1)
+        BufferedCounterService.increment('kind', 'second', 1)
+        BufferedCounterService.increment('other', 'third', 1)
+
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), {'first', 'second'})
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), set())
+
+    def test_pop_dirty_names_limit(self):
+        for name in ('first', 'second', 'third'):
+            BufferedCounterService.increment('kind', name, 1)
+
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 2), {'first', 'second'})
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 2), {'third'})
+
+    def test_take(self):
+        BufferedCounterService.increment('kind', 'name', 4)
+        BufferedCounterService.pop_dirty_names('kind', 10)
+
+        self.assertEqual(BufferedCounterService.take('kind', 'name'), 4)
+        self.assertEqual(BufferedCounterService.get('kind', 'name'), 0)
+
+        BufferedCounterService.increment('kind', 'name', 1)
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), {'name'})
+
+    def test_take_mark_dirty_fails(self):
+        BufferedCounterService.increment('kind', 'name', 4)
+        BufferedCounterService.pop_dirty_names('kind', 10)
+
+        # Incremented by 1 between reading and decrementing the amount
+        with patch.object(cache, 'decr', return_value=1), \
+                patch.object(BufferedCounterService, 'mark_dirty', side_effect=ValueError):
+            self.assertEqual(BufferedCounterService.take('kind', 'name'), 4)
+
+    def test_take_evicted(self):
+        BufferedCounterService.increment('kind', 'name', 4)
+        with patch.object(cache, 'decr', side_effect=ValueError):
+            self.assertEqual(BufferedCounterService.take('kind', 'name'), 4)
+
+    def test_increment_registers_once(self):
+        for _i in range(3):
+            BufferedCounterService.increment('kind', 'name', 1)
+        self.assertEqual(cache.get(BufferedCounterService.get_sequence_key('kind')), 1)
+
+    def test_pop_dirty_names_waits_for_reserved_slot(self):
+        BufferedCounterService.increment('kind', 'first', 1)
+        # A register() that reserved its index but has not written its slot yet
+        sequence_key = BufferedCounterService.get_sequence_key('kind')
+        index = cache.incr(sequence_key)
+
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), {'first'})
+        cache.set(BufferedCounterService.get_dirty_key('kind', index), 'second', BufferedCounterService.TIMEOUT)
+        BufferedCounterService.increment('kind', 'third', 1)
+
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), {'second', 'third'})
+
+    def test_pop_dirty_names_skips_lost_slot(self):
+        cache.add(BufferedCounterService.get_sequence_key('kind'), 0, None)
+        cache.incr(BufferedCounterService.get_sequence_key('kind'))
+        BufferedCounterService.increment('kind', 'name', 1)
+
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), set())
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), {'name'})
+
+    def test_increment_after_pop_registers_again(self):
+        BufferedCounterService.increment('kind', 'name', 1)
+        BufferedCounterService.increment('kind', 'name', 1)
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), {'name'})
+
+        # Incremented between popping the name and taking its amount
+        BufferedCounterService.increment('kind', 'name', 1)
+        self.assertEqual(BufferedCounterService.take('kind', 'name'), 3)
+        BufferedCounterService.increment('kind', 'name', 1)
+
+        self.assertEqual(BufferedCounterService.pop_dirty_names('kind', 10), {'name'})
+        self.assertEqual(BufferedCounterService.take('kind', 'name'), 1)
+
+    def test_flush_lock(self):
+        self.assertTrue(BufferedCounterService.acquire_flush_lock('kind'))
+        self.assertFalse(BufferedCounterService.acquire_flush_lock('kind'))
+        BufferedCounterService.release_flush_lock('kind')
+        self.assertTrue(BufferedCounterService.acquire_flush_lock('kind'))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+import json
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from mock import patch
+from upkook_core.customers.services import CustomerService
+
+from cx_metrics.multiple_choices.models import MultipleChoice
+from cx_metrics.multiple_choices.services import MultipleChoiceService
+from cx_metrics.nps.models import NPSResponse, NPSSurvey
+from cx_metrics.nps.services import NPSService
+from ..services.export import SurveyResponseExportService
+
+
+class SurveyResponseExportServiceTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'multiple_choices', 'nps']
+
+    def setUp(self):
+        self.nps = NPSSurvey.objects.first()
+        self.nps.contra = MultipleChoice.objects.first()
+        self.nps.save()
+        self.option = self.nps.contra.options.first()
+        self.customers = [CustomerService.create_customer() for _i in range(3)]
+        NPSService.respond(self.nps, self.customers[0].uuid, 3, [self.option.id])
+        NPSService.respond(self.nps, self.customers[1].uuid, 10)
+        NPSService.respond(self.nps, self.customers[2].uuid, 5, [self.option.id])
+        self.responses = NPSResponse.objects.filter(survey_uuid=self.nps.uuid)
+
+    def test_get_rows(self):
+        rows = list(SurveyResponseExportService.get_rows(self.responses, 'score', self.nps.contra_id))
+
+        self.assertEqual([row['score'] for row in rows], [3, 10, 5])
+        self.assertEqual([row['customer_uuid'] for row in rows], [customer.uuid for customer in self.customers])
+        self.assertEqual([row['contra_options'] for row in rows], [[self.option.text], [], [self.option.text]])
+
+    def test_get_rows_chunked(self):
+        with patch.object(SurveyResponseExportService, 'CHUNK_SIZE', 2):
+            chunks = list(SurveyResponseExportService.get_chunks(self.responses, 'score'))
+            rows = list(SurveyResponseExportService.get_rows(self.responses, 'score', self.nps.contra_id))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual(rows[2]['contra_options'], [self.option.text])
+
+    def test_get_rows_without_contra(self):
+        rows = list(SurveyResponseExportService.get_rows(self.responses, 'score'))
+        self.assertEqual([row['contra_options'] for row in rows], [[], [], []])
+
+    def test_filter_period(self):
+        now = timezone.now()
+        self.assertEqual(SurveyResponseExportService.filter_period(self.responses, now).count(), 0)
+        self.assertEqual(
+            SurveyResponseExportService.filter_period(self.responses, now - timedelta(hours=1), now).count(), 3
+        )
+
+    def test_render_csv(self):
+        rows = SurveyResponseExportService.get_rows(self.responses, 'score', self.nps.contra_id)
+        lines = ''.join(SurveyResponseExportService.render(rows, 'score', 'csv')).splitlines()
+
+        self.assertEqual(lines[0], 'created,customer_uuid,score,contra_options')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].endswith(',%s,3,%s' % (self.customers[0].uuid, self.option.text)))
+
+    def test_render_ndjson(self):
+        rows = SurveyResponseExportService.get_rows(self.responses, 'score', self.nps.contra_id)
+        lines = list(SurveyResponseExportService.render(rows, 'score', 'ndjson'))
+
+        self.assertEqual(len(lines), 3)
+        item = json.loads(lines[0])
+        self.assertEqual(item['customer_uuid'], str(self.customers[0].uuid))
+        self.assertEqual(item['contra_options'], [self.option.text])
+
+
+@override_settings(SURVEY_CONTRA_MASK_STORAGE=True)
+class SurveyResponseExportContraMaskTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'nps']
+
+    def setUp(self):
+        self.nps = NPSSurvey.objects.first()
+        self.nps.contra = MultipleChoiceService.create(text=self.id(), type_=MultipleChoice.TYPE_CHECKBOX)
+        self.nps.save()
+        MultipleChoiceService.create_options(self.nps.contra, [
+            {'text': 'option %d' % index, 'order': 2 - index} for index in range(3)
+        ])
+        self.options = list(self.nps.contra.options.order_by('bit'))
+        self.customers = [CustomerService.create_customer() for _i in range(2)]
+        NPSService.respond(self.nps, self.customers[0].uuid, 3, [self.options[0].id, self.options[2].id])
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=False):
+            NPSService.respond(self.nps, self.customers[1].uuid, 10, [self.options[1].id])
+        self.responses = NPSResponse.objects.filter(survey_uuid=self.nps.uuid)
+
+    def test_get_rows(self):
+        rows = list(SurveyResponseExportService.get_rows(self.responses, 'score', self.nps.contra_id))
+
+        self.assertEqual([row['contra_mask'] for row in self.responses.order_by('id').values('contra_mask')], [5, 0])
+        self.assertEqual([row['contra_options'] for row in rows], [['option 2', 'option 0'], ['option 1']])
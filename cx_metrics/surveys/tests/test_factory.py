@@ -4,9 +4,17 @@ from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 
 from upkook_core.businesses.services import BusinessService
-from ..factory import DefaultSurveyFactory, AlreadyRegistered, NotRegistered, DefaultSurveySerializerFactory
+
+from cx_metrics.csat.models import CSATSurvey
+from cx_metrics.csat.services import CSATService
+from cx_metrics.multiple_choices.models import MultipleChoice
+from cx_metrics.nps.models import NPSSurvey
+from cx_metrics.nps.services import NPSService
+from ..factory import (
+    DefaultSurveyFactory, AlreadyRegistered, NotRegistered, DefaultSurveySerializerFactory, survey_factory
+)
 from ..serializers import SurveySerializer
-from ..models import SurveyModel
+from ..models import Survey, SurveyModel
 from .models import TestSurvey
 
 
@@ -54,6 +62,50 @@ class SurveyFactoryTestCase(TestCase):
         )
 
 
+class SurveyFactoryLoadTestCase(TestCase):
+    fixtures = ['users', 'industries', 'businesses', 'multiple_choices']
+
+    def setUp(self):
+        business = BusinessService.get_business_by_id(1)
+        self.nps = NPSService.create_nps_survey(
+            name='nps', business=business, text='text', question='question', message='message'
+        )
+        self.nps.contra = MultipleChoice.objects.get(id=1)
+        self.nps.save()
+        self.csat = CSATService.create_csat_survey(
+            name='csat', business=business, text='text', question='question', message='message'
+        )
+
+    def test_load_many(self):
+        survey_ids = [self.nps.survey_id, self.csat.survey_id]
+        surveys = {survey.id: survey for survey in Survey.objects.filter(id__in=survey_ids)}
+
+        # One query per survey type and one for the options of the contras
+        with self.assertNumQueries(3):
+            loaded = survey_factory.load_many(surveys.values())
+
+        self.assertIsInstance(loaded[self.nps.survey_id], NPSSurvey)
+        self.assertIsInstance(loaded[self.csat.survey_id], CSATSurvey)
+        with self.assertNumQueries(0):
+            nps = loaded[self.nps.survey_id]
+            self.assertIs(nps.survey, surveys[self.nps.survey_id])
+            self.assertEqual(nps.business.id, 1)
+            self.assertEqual([option.id for option in nps.contra.options.all()], [1, 2])
+            self.assertIsNone(loaded[self.csat.survey_id].contra)
+
+    def test_load(self):
+        survey = Survey.objects.get(id=self.nps.survey_id)
+        self.assertEqual(survey_factory.load(survey), self.nps)
+
+    def test_load_without_typed_survey(self):
+        survey = Survey.objects.create(type='NPS', name='nps', business_id=1)
+        self.assertIsNone(survey_factory.load(survey))
+
+    def test_load_not_registered(self):
+        survey = Survey.objects.create(type=self.id(), name='survey', business_id=1)
+        self.assertRaises(NotRegistered, survey_factory.load, survey)
+
+
 class SurveySerializerFactoryTestCase(TestCase):
     fixtures = ['users', 'industries', 'businesses']
 
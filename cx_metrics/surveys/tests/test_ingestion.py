@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from uuid import uuid4
+
+from django.test import TestCase
+from upkook_core.customers.services import CustomerService
+
+from cx_metrics.nps.models import NPSResponse, NPSSurvey
+from cx_metrics.nps.serializers import NPSRespondSerializer
+from ..services.ingestion import SurveyIngestionService
+from ..tasks import ingest_survey_responses
+
+
+class SurveyIngestionServiceTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'nps']
+
+    def setUp(self):
+        self.nps = NPSSurvey.objects.first()
+
+    def test_load_survey(self):
+        self.assertEqual(SurveyIngestionService.load_survey('NPS', self.nps.uuid), self.nps)
+        self.assertIsNone(SurveyIngestionService.load_survey('NPS', uuid4()))
+
+    def test_ingest(self):
+        items = [
+            {'score': 10, 'customer': {'client_id': CustomerService.create_customer().client_id}},
+            {'score': 11, 'customer': {}},
+        ]
+        result = SurveyIngestionService.ingest('NPS', self.nps.uuid, NPSRespondSerializer, items)
+
+        self.assertEqual(result, {'created': 1, 'rejected': 1})
+        self.assertEqual(NPSResponse.objects.filter(survey_uuid=self.nps.uuid, score=10).count(), 1)
+
+    def test_ingest_survey_not_found(self):
+        result = SurveyIngestionService.ingest('NPS', uuid4(), NPSRespondSerializer, [{'score': 10}])
+        self.assertEqual(result, {'created': 0, 'rejected': 1})
+
+    def test_ingest_survey_responses_task(self):
+        items = [{'score': 3, 'customer': {'client_id': CustomerService.create_customer().client_id}}]
+        ingest_survey_responses.delay(
+            'NPS', str(self.nps.uuid), 'cx_metrics.nps.serializers.NPSRespondSerializer', items
+        )
+        self.assertTrue(NPSResponse.objects.filter(survey_uuid=self.nps.uuid, score=3).exists())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from upkook_core.customers.services import CustomerService
+
+from cx_metrics.multiple_choices.models import MultipleChoice, OptionResponse, OptionTextCrossTab
+from cx_metrics.multiple_choices.services import MultipleChoiceService
+from cx_metrics.nps.models import NPSResponse, NPSSurvey
+from cx_metrics.nps.services import NPSService
+from ..services.option_response import SurveyOptionResponseService
+
+
+class SurveyOptionResponseServiceTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'nps']
+
+    def setUp(self):
+        self.nps = NPSSurvey.objects.first()
+        self.nps.contra = MultipleChoiceService.create(text=self.id(), type_=MultipleChoice.TYPE_CHECKBOX)
+        self.nps.save()
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=True):
+            MultipleChoiceService.create_options(self.nps.contra, [{'text': 'a'}, {'text': 'b'}])
+        self.options = list(self.nps.contra.options.order_by('bit'))
+        self.option_responses = OptionResponse.objects.filter(option_text__multiple_choice=self.nps.contra)
+
+    def test_respond_links_option_responses(self):
+        response = NPSService.respond(
+            self.nps, CustomerService.create_customer().uuid, 3, [self.options[0].id, self.options[1].id]
+        )
+
+        self.assertEqual([option_response.response for option_response in self.option_responses], [response] * 2)
+
+    def test_bulk_respond_links_option_responses(self):
+        responses = NPSService.bulk_respond(self.nps, [
+            (CustomerService.create_customer().uuid, 3, [self.options[0].id]),
+            (CustomerService.create_customer().uuid, 10, None),
+            (CustomerService.create_customer().uuid, 9, [self.options[1].id]),
+        ])
+
+        self.assertEqual(
+            sorted(self.option_responses.values_list('option_text__text', 'response_id')),
+            [('a', responses[0].pk), ('b', responses[2].pk)]
+        )
+
+    def test_link_command(self):
+        responses = [
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 3, [self.options[0].id]),
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 10),
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 9, [self.options[1].id]),
+        ]
+        self.option_responses.update(response_type=None, response_id=None)
+
+        call_command('link_option_responses', 'NPS', verbosity=0)
+
+        self.assertEqual(
+            sorted(self.option_responses.values_list('option_text__text', 'response_id')),
+            [('a', responses[0].pk), ('b', responses[2].pk)]
+        )
+
+    def test_filter_option_text(self):
+        responses = [
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 3, [self.options[0].id]),
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 10, [self.options[1].id]),
+        ]
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=True):
+            responses.append(
+                NPSService.respond(self.nps, CustomerService.create_customer().uuid, 9, [self.options[0].id])
+            )
+        option_text = self.nps.contra.option_texts.get(text='a')
+
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=True):
+            filtered = SurveyOptionResponseService.filter_option_text(
+                NPSResponse.objects.filter(survey_uuid=self.nps.uuid), option_text
+            )
+
+        self.assertEqual(sorted(filtered.values_list('id', flat=True)), [responses[0].pk, responses[2].pk])
+
+    def test_filter_option_text_without_mask_storage(self):
+        responses = [
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 3, [self.options[0].id]),
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 10, [self.options[1].id]),
+        ]
+        option_text = self.nps.contra.option_texts.get(text='a')
+
+        filtered = SurveyOptionResponseService.filter_option_text(
+            NPSResponse.objects.filter(survey_uuid=self.nps.uuid), option_text
+        )
+
+        self.assertNotIn('contra_bit', filtered.query.annotations)
+        self.assertEqual(list(filtered.values_list('id', flat=True)), [responses[0].pk])
+
+
+class SurveyOptionCrossTabTestCase(TestCase):
+    fixtures = ['industries', 'businesses', 'nps']
+
+    def setUp(self):
+        self.nps = NPSSurvey.objects.first()
+        self.nps.contra = MultipleChoiceService.create(text=self.id(), type_=MultipleChoice.TYPE_CHECKBOX)
+        self.nps.save()
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=True):
+            MultipleChoiceService.create_options(self.nps.contra, [{'text': 'a'}, {'text': 'b'}])
+        self.options = list(self.nps.contra.options.order_by('bit'))
+        self.cross_tabs = OptionTextCrossTab.objects.filter(option_text__multiple_choice=self.nps.contra)
+
+    def get_cross_tabs(self):
+        return sorted(self.cross_tabs.values_list('option_text__text', 'key', 'count'))
+
+    def respond(self):
+        NPSService.respond(self.nps, CustomerService.create_customer().uuid, 3, [self.options[0].id])
+        NPSService.bulk_respond(self.nps, [
+            (CustomerService.create_customer().uuid, 10, [self.options[0].id, self.options[1].id]),
+            (CustomerService.create_customer().uuid, 9, [self.options[0].id]),
+            (CustomerService.create_customer().uuid, 7, None),
+        ])
+        with override_settings(SURVEY_CONTRA_MASK_STORAGE=True):
+            NPSService.respond(self.nps, CustomerService.create_customer().uuid, 8, [self.options[1].id])
+
+    def test_respond_increments_cross_tabs(self):
+        self.respond()
+
+        self.assertEqual(self.get_cross_tabs(), [
+            ('a', 'detractors', 1), ('a', 'promoters', 2), ('b', 'passives', 1), ('b', 'promoters', 1)
+        ])
+
+    def test_option_text_breakdown(self):
+        self.respond()
+
+        option_texts = {
+            option_text.text: option_text.breakdown for option_text in self.nps.contra_response_option_texts
+        }
+        self.assertEqual(option_texts, {
+            'a': {'detractors': 1, 'promoters': 2}, 'b': {'passives': 1, 'promoters': 1}
+        })
+
+    def test_rebuild_command(self):
+        self.respond()
+        expected = self.get_cross_tabs()
+        self.cross_tabs.delete()
+
+        call_command('rebuild_option_cross_tabs', 'NPS', verbosity=0)
+
+        self.assertEqual(self.get_cross_tabs(), expected)
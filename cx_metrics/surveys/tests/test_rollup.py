@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from datetime import timedelta
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import SurveyRollup
+from ..serializers import SurveyTimeseriesQuerySerializer
+from ..services import SurveyRollupService
+
+
+class SurveyRollupServiceTestCase(TestCase):
+    def setUp(self):
+        self.survey_uuid = uuid4()
+        self.created = timezone.now().replace(hour=10, minute=30)
+
+    def test_get_period(self):
+        hour = SurveyRollupService.get_period(self.created, SurveyRollup.GRANULARITY_HOUR)
+        day = SurveyRollupService.get_period(self.created, SurveyRollup.GRANULARITY_DAY)
+        self.assertEqual((hour.minute, hour.second, hour.microsecond), (0, 0, 0))
+        self.assertEqual((day.hour, day.minute), (0, 0))
+        self.assertLessEqual(day, hour)
+
+    def test_count(self):
+        counts = SurveyRollupService.count(SurveyRollup.DIMENSION_SCORE, [10, 10, 3])
+        self.assertEqual(counts, {('score', '10'): 2, ('score', '3'): 1})
+
+    def test_increment(self):
+        counts = SurveyRollupService.count(SurveyRollup.DIMENSION_SCORE, [10, 3])
+        SurveyRollupService.increment(self.survey_uuid, counts, self.created)
+        SurveyRollupService.increment(self.survey_uuid, counts, self.created)
+
+        rollups = SurveyRollup.objects.filter(survey_uuid=self.survey_uuid)
+        self.assertEqual(rollups.count(), 4)
+        self.assertEqual(set(rollups.values_list('count', flat=True)), {2})
+
+    def test_increment_query_count(self):
+        def increment(keys):
+            SurveyRollupService.increment(
+                self.survey_uuid, SurveyRollupService.count(SurveyRollup.DIMENSION_OPTION, keys), self.created
+            )
+
+        with CaptureQueriesContext(connection) as single:
+            increment(['a'])
+        with CaptureQueriesContext(connection) as multiple:
+            increment(['b', 'c', 'd'])
+        self.assertEqual(len(single), len(multiple))
+
+        # Existing rollups are updated with a single statement
+        with CaptureQueriesContext(connection) as single:
+            increment(['a'])
+        with CaptureQueriesContext(connection) as multiple:
+            increment(['b', 'c', 'd'])
+        self.assertEqual(len(single), len(multiple))
+
+        counts = SurveyRollup.objects.filter(survey_uuid=self.survey_uuid, granularity=SurveyRollup.GRANULARITY_DAY)
+        self.assertEqual(dict(counts.values_list('key', 'count')), {'a': 2, 'b': 2, 'c': 2, 'd': 2})
+
+    def test_increment_sharded(self):
+        counts = SurveyRollupService.count(SurveyRollup.DIMENSION_SCORE, [10])
+        for _i in range(6):
+            SurveyRollupService.increment(self.survey_uuid, counts, self.created, shards=3)
+
+        rollups = SurveyRollup.objects.filter(survey_uuid=self.survey_uuid, granularity=SurveyRollup.GRANULARITY_DAY)
+        self.assertLessEqual(rollups.count(), 3)
+        timeseries = SurveyRollupService.get_timeseries(
+            self.survey_uuid, SurveyRollup.GRANULARITY_DAY,
+            self.created - timedelta(days=1), self.created + timedelta(days=1)
+        )
+        self.assertEqual(timeseries[0]['score'], {'10': 6})
+
+    def test_rebuild(self):
+        SurveyRollupService.increment(
+            self.survey_uuid, SurveyRollupService.count(SurveyRollup.DIMENSION_SCORE, [10]), self.created
+        )
+        row = SurveyRollup(
+            granularity=SurveyRollup.GRANULARITY_DAY,
+            period=SurveyRollupService.get_period(self.created, SurveyRollup.GRANULARITY_DAY),
+            dimension=SurveyRollup.DIMENSION_SCORE,
+            key='3',
+            count=5,
+        )
+        SurveyRollupService.rebuild(self.survey_uuid, [row])
+
+        rollup = SurveyRollup.objects.get(survey_uuid=self.survey_uuid)
+        self.assertEqual((rollup.key, rollup.count), ('3', 5))
+
+    def test_get_timeseries(self):
+        counts = SurveyRollupService.count(SurveyRollup.DIMENSION_SCORE, [10, 3])
+        SurveyRollupService.increment(self.survey_uuid, counts, self.created)
+        SurveyRollupService.increment(self.survey_uuid, counts, self.created - timedelta(days=1))
+        SurveyRollupService.increment(uuid4(), counts, self.created)
+
+        timeseries = SurveyRollupService.get_timeseries(
+            self.survey_uuid, SurveyRollup.GRANULARITY_DAY,
+            self.created - timedelta(days=2), self.created + timedelta(days=1)
+        )
+        self.assertEqual(len(timeseries), 2)
+        self.assertLess(timeseries[0]['period'], timeseries[1]['period'])
+        self.assertEqual(timeseries[1]['score'], {'10': 1, '3': 1})
+
+        timeseries = SurveyRollupService.get_timeseries(
+            self.survey_uuid, SurveyRollup.GRANULARITY_HOUR,
+            self.created - timedelta(hours=1), self.created + timedelta(hours=1)
+        )
+        self.assertEqual(len(timeseries), 1)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'rollups',
+        }
+    },
+    SURVEY_COUNTER_WRITE_BEHIND=True
+)
+class SurveyRollupBufferedTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.survey_uuid = uuid4()
+        self.created = timezone.now().replace(hour=10, minute=30)
+
+    def test_increment(self):
+        counts = SurveyRollupService.count(SurveyRollup.DIMENSION_OPTION, ['a', 'b'])
+        with self.assertNumQueries(0):
+            SurveyRollupService.increment(self.survey_uuid, counts, self.created)
+            SurveyRollupService.increment(self.survey_uuid, counts, self.created)
+        self.assertFalse(SurveyRollup.objects.filter(survey_uuid=self.survey_uuid).exists())
+
+        self.assertEqual(SurveyRollupService.flush_buffered_counts(), 4)
+        rollups = SurveyRollup.objects.filter(survey_uuid=self.survey_uuid)
+        self.assertEqual(rollups.count(), 4)
+        self.assertEqual(set(rollups.values_list('count', flat=True)), {2})
+
+
+class SurveyTimeseriesQuerySerializerTestCase(TestCase):
+    def test_defaults(self):
+        serializer = SurveyTimeseriesQuerySerializer(data={})
+        self.assertTrue(serializer.is_valid())
+        data = serializer.validated_data
+        self.assertEqual(data['granularity'], SurveyRollup.GRANULARITY_DAY)
+        self.assertEqual(data['to'] - data['from'], timedelta(days=30))
+
+    def test_invalid_range(self):
+        serializer = SurveyTimeseriesQuerySerializer(data={
+            'from': '2019-02-01T00:00:00Z', 'to': '2019-01-01T00:00:00Z'
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('from', serializer.errors)
+
+    def test_range_too_long(self):
+        serializer = SurveyTimeseriesQuerySerializer(data={
+            'from': '2019-01-01T00:00:00Z', 'to': '2019-03-01T00:00:00Z', 'granularity': 'H'
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('from', serializer.errors)
@@ -7,8 +7,8 @@ from django.db.models.signals import post_save
 from upkook_core.businesses.services import BusinessService
 from upkook_core.industries.services import IndustryService
 
-from ..signals import manage_signal_receivers
-from ..services import SurveyCacheService
+from ..signals import manage_business_signal_receivers, manage_signal_receivers
+from ..services import SurveyCacheService, SurveySnapshotCacheService
 from .models import TestSurvey
 
 
@@ -46,3 +46,36 @@ class SignalsTestCase(TestCase):
         )
         post_save.send(TestSurvey, **kwargs)
         mock_cache_delete.assert_called_once_with(self.instance.uuid)
+
+    @patch.object(SurveySnapshotCacheService, 'delete')
+    def test_clear_snapshot_on_change(self, mock_cache_delete):
+        kwargs = dict(
+            instance=self.instance,
+            created=False, raw=False,
+            update_fields=[], using=None
+        )
+        post_save.send(TestSurvey, **kwargs)
+        mock_cache_delete.assert_called_once_with(self.instance.type, self.instance.uuid)
+
+
+class BusinessSignalsTestCase(TestCase):
+    def setUp(self):
+        super(BusinessSignalsTestCase, self).setUp()
+        industry = IndustryService.create_industry(name='Industry', icon='')
+        self.business = BusinessService.create_business(
+            size=5,
+            name='Business',
+            domain='www.business.com',
+            industry=industry,
+        )
+        manage_business_signal_receivers(connect=True)
+
+    def tearDown(self):
+        super(BusinessSignalsTestCase, self).tearDown()
+        manage_business_signal_receivers(connect=False)
+
+    @patch.object(SurveyCacheService, 'invalidate_business')
+    def test_clear_business_cache_on_change(self, mock_invalidate_business):
+        self.business.name = 'Renamed'
+        self.business.save()
+        mock_invalidate_business.assert_called_once_with(self.business.id)
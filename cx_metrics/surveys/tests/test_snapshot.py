@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from mock import Mock
+from upkook_core.businesses.services import BusinessService
+from upkook_core.industries.services import IndustryService
+
+from cx_metrics.multiple_choices.models import MultipleChoice
+from ..services import SurveyCacheService, SurveySnapshot, SurveySnapshotService, SurveySnapshotCacheService
+from .models import TestSurvey
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'snapshots',
+        }
+    }
+)
+class SurveySnapshotServiceTestCase(TestCase):
+    fixtures = ['multiple_choices']
+
+    def setUp(self):
+        cache.clear()
+        industry = IndustryService.create_industry(name='Industry', icon='')
+        business = BusinessService.create_business(
+            size=5,
+            name='Business',
+            domain='www.business.com',
+            industry=industry,
+        )
+        self.survey = TestSurvey.objects.create(name='test', business=business)
+
+    def test_snapshot(self):
+        snapshot = SurveySnapshot(self.survey)
+        self.assertEqual(snapshot.type, 'TEST')
+        self.assertEqual(snapshot.uuid, self.survey.uuid)
+        self.assertEqual(snapshot.business, self.survey.business)
+        self.assertIsNone(snapshot.contra)
+        self.assertFalse(snapshot.has_contra())
+
+    def test_snapshot_contra(self):
+        contra = MultipleChoice.objects.first()
+        self.survey.contra = contra
+        snapshot = SurveySnapshot(self.survey)
+
+        self.assertEqual(snapshot.contra.option_ids, set(contra.options.values_list('id', flat=True)))
+        with self.assertNumQueries(0):
+            self.assertEqual(snapshot.has_contra(), contra.enabled)
+
+    def test_get(self):
+        load = Mock(return_value=self.survey)
+        snapshot = SurveySnapshotService.get('TEST', self.survey.uuid, load)
+        cached = SurveySnapshotService.get('TEST', self.survey.uuid, load)
+
+        load.assert_called_once_with(self.survey.uuid)
+        self.assertEqual(cached.uuid, snapshot.uuid)
+        self.assertEqual(cached.business_id, self.survey.business_id)
+
+    def test_get_other_type(self):
+        load = Mock(return_value=self.survey)
+        SurveySnapshotService.get('TEST', self.survey.uuid, load)
+        SurveySnapshotService.get('NPS', self.survey.uuid, Mock(return_value=None))
+        self.assertIsNone(SurveySnapshotCacheService.get('NPS', self.survey.uuid))
+
+    def test_get_none(self):
+        self.assertIsNone(SurveySnapshotService.get('TEST', self.survey.uuid, Mock(return_value=None)))
+        self.assertIsNone(SurveySnapshotCacheService.get('TEST', self.survey.uuid))
+
+    def test_invalidate_business(self):
+        load = Mock(return_value=self.survey)
+        SurveySnapshotService.get('TEST', self.survey.uuid, load)
+        SurveyCacheService.invalidate_business(self.survey.business_id)
+        SurveySnapshotService.get('TEST', self.survey.uuid, load)
+
+        self.assertEqual(load.call_count, 2)
+
+    def test_delete(self):
+        SurveySnapshotService.get('TEST', self.survey.uuid, Mock(return_value=self.survey))
+        SurveySnapshotCacheService.delete('TEST', self.survey.uuid)
+        self.assertIsNone(SurveySnapshotCacheService.get('TEST', self.survey.uuid))
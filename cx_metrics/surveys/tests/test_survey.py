@@ -1,12 +1,16 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4
-from mock import patch
-from django.test import TestCase
+from mock import Mock, patch
+from django.test import TestCase, override_settings
 
 from upkook_core.businesses.services import BusinessService
+
+from cx_metrics.nps.services import NPSService
 from ..models import Survey
+from ..services import SurveyCacheService
 from ..factory import SurveyFactory
 from ..decorators import register_survey, register_survey_serializer
+from ..tasks import delete_business_surveys, update_business_surveys
 from .models import TestSurvey
 
 
@@ -73,6 +77,13 @@ class SurveyTestCase(TestCase):
         self.assertFalse(TestSurvey.objects.filter(name='test_queryset_delete').exists())
         self.assertFalse(Survey.objects.filter(name='test_queryset_delete').exists())
 
+    def test_queryset_delete_counts(self):
+        for _i in range(2):
+            TestSurvey.objects.create(name='test_queryset_delete_counts', business=self.business)
+        deleted, counts = TestSurvey.objects.filter(name='test_queryset_delete_counts').delete()
+        self.assertEqual(deleted, 4)
+        self.assertEqual(counts, {'surveys.TestSurvey': 2, 'surveys.Survey': 2})
+
     def test_queryset_update(self):
         ts = TestSurvey.objects.create(name='test_queryset_update', business=self.business)
         TestSurvey.objects.filter(id=ts.pk).update(name='Hello World!')
@@ -82,8 +93,102 @@ class SurveyTestCase(TestCase):
 
     def test_queryset_update_enabled(self):
         ts = TestSurvey.objects.create(name='test_queryset_update_enabled', business=self.business)
-        TestSurvey.objects.filter(id=ts.pk).update(enabled=False)
+        with self.assertNumQueries(1):
+            TestSurvey.objects.filter(id=ts.pk).update(enabled=False)
         ts.refresh_from_db()
         self.assertFalse(ts.enabled)
         self.assertEqual(ts.name, 'test_queryset_update_enabled')
         self.assertEqual(ts.name, ts.survey.name)
+
+    def test_queryset_bulk_create(self):
+        objs = [TestSurvey(name='test_queryset_bulk_create %d' % i, business=self.business) for i in range(3)]
+        created = TestSurvey.objects.bulk_create(objs, batch_size=2)
+        self.assertEqual(len(created), 3)
+
+        for ts in TestSurvey.objects.filter(name__startswith='test_queryset_bulk_create').select_related('survey'):
+            self.assertEqual(ts.uuid, ts.survey.uuid)
+            self.assertEqual(ts.name, ts.survey.name)
+            self.assertEqual(ts.survey.type, 'TEST')
+            self.assertEqual(ts.survey.business_id, self.business.pk)
+        self.assertEqual(Survey.objects.filter(name__startswith='test_queryset_bulk_create').count(), 3)
+
+    def test_queryset_bulk_create_ignore_conflicts(self):
+        objs = [TestSurvey(name='test_queryset_bulk_create_ignore_conflicts', business=self.business)]
+        self.assertRaises(ValueError, TestSurvey.objects.bulk_create, objs, ignore_conflicts=True)
+
+    def test_queryset_delete_chunked(self):
+        for i in range(5):
+            TestSurvey.objects.create(name='test_queryset_delete_chunked', business=self.business)
+        progress = Mock()
+
+        deleted, counts = TestSurvey.objects.filter(name='test_queryset_delete_chunked').delete_chunked(
+            chunk_size=2, progress=progress
+        )
+        self.assertEqual(deleted, 10)
+        self.assertEqual(counts, {'surveys.TestSurvey': 5, 'surveys.Survey': 5})
+        self.assertEqual([c[0][0] for c in progress.call_args_list], [2, 4, 5])
+        self.assertFalse(Survey.objects.filter(name='test_queryset_delete_chunked').exists())
+
+    def test_queryset_update_chunked(self):
+        for i in range(3):
+            TestSurvey.objects.create(name='test_queryset_update_chunked', business=self.business)
+        progress = Mock()
+
+        rows = TestSurvey.objects.filter(name='test_queryset_update_chunked').update_chunked(
+            {'name': 'Hello World!', 'enabled': False}, chunk_size=2, progress=progress
+        )
+        self.assertEqual(rows, 3)
+        self.assertEqual([c[0][0] for c in progress.call_args_list], [2, 3])
+        self.assertEqual(TestSurvey.objects.filter(name='Hello World!', enabled=False).count(), 3)
+        self.assertEqual(Survey.objects.filter(name='Hello World!').count(), 3)
+
+    def test_delete_business_surveys(self):
+        NPSService.create_nps_survey(
+            name='test_delete_business_surveys', business=self.business,
+            text='text', question='question', message='message',
+        )
+        delete_business_surveys.delay('NPS', self.business.pk)
+        self.assertFalse(Survey.objects.filter(name='test_delete_business_surveys').exists())
+
+    def test_update_business_surveys(self):
+        nps_survey = NPSService.create_nps_survey(
+            name='test_update_business_surveys', business=self.business,
+            text='text', question='question', message='message',
+        )
+        update_business_surveys.delay('NPS', self.business.pk, {'text_enabled': False})
+        nps_survey.refresh_from_db()
+        self.assertFalse(nps_survey.text_enabled)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+)
+class SurveyTasksCacheTestCase(TestCase):
+    fixtures = ['users', 'industries', 'businesses']
+
+    def setUp(self):
+        self.business = BusinessService.get_business_by_id(1)
+        self.nps_survey = NPSService.create_nps_survey(
+            name=self.id(), business=self.business, text='text', question='question', message='message',
+        )
+
+    def cache_survey(self):
+        def compute():
+            return {'name': self.nps_survey.name}, self.business.pk
+        return SurveyCacheService.get_or_compute(self.nps_survey.uuid, compute)
+
+    def test_delete_business_surveys_invalidates_cache(self):
+        self.cache_survey()
+        delete_business_surveys.delay('NPS', self.business.pk)
+        self.assertIsNone(SurveyCacheService.get(self.nps_survey.uuid))
+
+    def test_update_business_surveys_invalidates_cache(self):
+        self.cache_survey()
+        update_business_surveys.delay('NPS', self.business.pk, {'name': 'Renamed'})
+        self.nps_survey.refresh_from_db()
+        self.assertIsNone(SurveyCacheService.get(self.nps_survey.uuid))
+        self.assertEqual(self.cache_survey(), {'name': 'Renamed'})
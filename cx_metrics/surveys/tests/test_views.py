@@ -6,6 +6,7 @@ from http.cookies import SimpleCookie
 import mock
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils.encoding import force_text
@@ -20,9 +21,12 @@ from upkook_core.industries.services import IndustryService
 from upkook_core.teams.services import MemberService
 from upkook_core.teams.tests import MemberPermissionTestMixin
 
+from cx_metrics.multiple_choices.services import MultipleChoiceService
 from cx_metrics.nps.services import NPSService
+from cx_metrics.tests.budgets import QueryBudgetTestMixin
 from ..models import Survey
 from ..serializers import SurveySerializer
+from ..services import SurveyCacheService
 
 
 class MockRequest(object):
@@ -53,7 +57,7 @@ class MockResponse(object):
         return self.cookies.get(key)
 
 
-class SurveyAPIViewTestCase(MemberPermissionTestMixin, TestCase):
+class SurveyAPIViewTestCase(QueryBudgetTestMixin, MemberPermissionTestMixin, TestCase):
     fixtures = ['users', 'industries', 'businesses', 'teams']
 
     def setUp(self):
@@ -100,8 +104,92 @@ class SurveyAPIViewTestCase(MemberPermissionTestMixin, TestCase):
             'url': survey.url,
         })
 
+    def test_get_query_budget(self):
+        for i in range(5):
+            Survey.objects.create(type='test', name='survey %d' % i, business=self.business)
 
-class SurveyFactoryAPIViewTestCase(TestCase):
+        with self.assertQueryBudget('cx-surveys:list'):
+            response = self.client.get(reverse('cx-surveys:list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SurveyCloneAPIViewTestCase(MemberPermissionTestMixin, TestCase):
+    fixtures = ['users', 'industries', 'businesses', 'teams']
+
+    def setUp(self):
+        super(SurveyCloneAPIViewTestCase, self).setUp()
+
+        User = get_user_model()
+        user = User.objects.first()
+        self.member = MemberService.get_member_by_id(1)
+        self.business = self.member.business
+
+        self.client = AuthClient()
+        credentials = {
+            User.USERNAME_FIELD: user.email,
+            'password': 'test_password',
+            'business': self.business.username,
+        }
+        self.client.login(**credentials)
+
+        codenames = ['add_survey', 'change_survey', 'view_survey']
+        self.group = self.give_member_permissions(self.member, app_label='surveys', codenames=codenames)
+
+        self.nps_survey = NPSService.create_nps_survey(
+            name='Survey', business=self.business, text='text', question='question', message='message'
+        )
+        self.nps_survey.contra = MultipleChoiceService.create(text='Why?')
+        self.nps_survey.save()
+        MultipleChoiceService.create_options(self.nps_survey.contra, [
+            {'text': 'Price', 'order': 0}, {'text': 'Quality', 'order': 1}
+        ])
+        NPSService.change_overall_score(self.nps_survey.uuid, NPSService.PROMOTERS, 5)
+
+    def tearDown(self):
+        self.remove_member_permissions(self.member, self.group)
+
+    def post(self, uuid, data):
+        url = reverse('cx-surveys:clone', kwargs={'uuid': uuid})
+        return self.client.post(url, data=json.dumps(data), content_type='application/json')
+
+    def test_post(self):
+        response = self.post(self.nps_survey.uuid, {'names': ['Branch 1', 'Branch 2']})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response_data = json.loads(force_text(response.content))
+        self.assertEqual([item['name'] for item in response_data], ['Branch 1', 'Branch 2'])
+        for item in response_data:
+            clone = NPSService.get_nps_survey_by_uuid(item['id'])
+            self.assertEqual(item['type'], 'NPS')
+            self.assertEqual(clone.survey.uuid, clone.uuid)
+            self.assertEqual(clone.business_id, self.business.pk)
+            self.assertEqual(clone.question, 'question')
+            self.assertEqual(clone.promoters, 0)
+            self.assertNotEqual(clone.contra_id, self.nps_survey.contra_id)
+            self.assertEqual(clone.contra.text, 'Why?')
+            self.assertEqual(list(clone.contra.options.values_list('text', flat=True)), ['Price', 'Quality'])
+
+    @override_settings(SURVEY_CLONE_MAX_COUNT=1)
+    def test_post_invalid(self):
+        response = self.post(self.nps_survey.uuid, {'names': []})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.post(self.nps_survey.uuid, {'names': ['Branch 1', 'Branch 2']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_post_other_business(self):
+        business = BusinessService.create_business(
+            size=5, name='Other', domain='www.other.com',
+            industry=IndustryService.create_industry(name='Industry', icon=''),
+        )
+        survey = NPSService.create_nps_survey(
+            name='Other', business=business, text='text', question='question', message='message'
+        )
+        response = self.post(survey.uuid, {'names': ['Branch 1']})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SurveyFactoryAPIViewTestCase(QueryBudgetTestMixin, TestCase):
     fixtures = ['users', 'industries', 'businesses', 'teams']
 
     def setUp(self):
@@ -128,6 +216,20 @@ class SurveyFactoryAPIViewTestCase(TestCase):
             'url': survey.url,
         })
 
+    def test_get_query_budget(self):
+        nps = NPSService.create_nps_survey(
+            name='SurveyFactoryAPIViewTestCase.test_get_query_budget',
+            business=self.member.business,
+            text='text',
+            question='question',
+            message='message',
+        )
+
+        url = reverse('cx-surveys:retrieve', kwargs={'uuid': str(nps.uuid)})
+        with self.assertQueryBudget('cx-surveys:retrieve'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     @override_settings(
         CACHES={
             'default': {
@@ -159,6 +261,54 @@ class SurveyFactoryAPIViewTestCase(TestCase):
             'url': survey.url,
         })
 
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'rendered-survey',
+            }
+        },
+        SURVEY_CACHE_RENDERED_JSON=True,
+    )
+    def test_get_rendered(self):
+        cache.clear()
+        survey = Survey.objects.create(
+            type='test',
+            name='SurveyFactoryAPIViewTestCase.test_get_rendered',
+            business=self.member.business,
+        )
+
+        url = reverse('cx-surveys:retrieve', kwargs={'uuid': str(survey.uuid)})
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response['Cache-Control'], 'max-age=60')
+        self.assertDictEqual(json.loads(force_text(response.content)), {
+            'id': str(survey.uuid),
+            'type': 'test',
+            'name': survey.name,
+            'url': survey.url,
+        })
+
+        with patch.object(SurveySerializer, 'to_representation') as mock_to_representation:
+            response = self.client.get(url)
+            self.assertFalse(mock_to_representation.called)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"other", W/%s' % etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        survey.name = 'renamed'
+        survey.save()
+        SurveyCacheService.delete(survey.uuid)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(force_text(response.content))['name'], 'renamed')
+
     def test_get_business_is_not_active(self):
         new_industry = IndustryService.create_industry('Industry', '')
         new_business = BusinessService.create_business(
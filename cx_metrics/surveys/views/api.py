@@ -2,18 +2,34 @@
 # vim: ai ts=4 sts=4 et sw=4
 from copy import copy
 from django.conf import settings
-from django.http import Http404
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
+from django.utils.translation import ugettext_lazy as _
 from django.views.decorators.cache import never_cache, cache_control
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import CursorPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from upkook_core.auth.permissions import BusinessMemberPermissions
+from upkook_core.customers.models import generate_client_id
+
+from cx_metrics.multiple_choices.services.multiple_choice import OptionResponseService
 
 from ..factory import survey_serializer_factory
-from ..serializers import SurveySerializer
-from ..services import SurveyService, SurveyCacheService
+from ..serializers import (
+    SurveySerializer, SurveyCloneSerializer, SurveyTimeseriesQuerySerializer, SurveyResponseExportQuerySerializer,
+    SurveyOptionResponsesQuerySerializer,
+)
+from ..services import SurveyService, SurveyCacheService, SurveyRollupService, SurveySnapshotService
 from ..services.cache import SurveyInsightCacheService
+from ..services.clone import SurveyCloneService
+from ..services.export import SurveyResponseExportService
+from ..services.option_response import SurveyOptionResponseService
+from ..tasks import ingest_survey_responses
 
 
 @method_decorator(cache_control(private=True), name='get')
@@ -31,10 +47,38 @@ class SurveyAPIView(generics.ListAPIView):
         return SurveyService.get_surveys_by_business(self.request.user.business_id)
 
 
+@method_decorator(never_cache, name='post')
+class SurveyCloneAPIView(generics.GenericAPIView):
+    """
+    Creates copies of a survey of the business, one per given name, e.g.
+    the same survey for every branch of a chain.
+    """
+    lookup_field = 'uuid'
+    serializer_class = SurveyCloneSerializer
+    permission_classes = (
+        BusinessMemberPermissions('surveys', 'survey'),
+    )
+
+    def get_queryset(self):
+        return SurveyService.get_surveys_by_business(self.request.user.business_id)
+
+    def post(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        clones = SurveyCloneService.clone(
+            instance, serializer.validated_data['names'], author=self.request.user.instance
+        )
+        if not clones:
+            raise Http404
+        return Response(SurveySerializer(clones, many=True).data, status=status.HTTP_201_CREATED)
+
+
 @method_decorator(cache_control(max_age=1 * 60), name='get')  # 1 minute
 class SurveyFactoryAPIView(generics.RetrieveAPIView):
     lookup_field = 'uuid'
-    queryset = SurveyService.all()
+    queryset = SurveyService.all().select_related('business')
 
     def get_object(self):
         obj = super(SurveyFactoryAPIView, self).get_object()
@@ -50,16 +94,39 @@ class SurveyFactoryAPIView(generics.RetrieveAPIView):
     def retrieve(self, request, *args, **kwargs):
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
         cache_key = self.kwargs[lookup_url_kwarg]
-        data = SurveyCacheService.get(cache_key)
-
-        if data is None:
-            instance = self.get_object()
-            serializer = self.get_serializer(instance)
-            data = serializer.data
-            SurveyCacheService.set(cache_key, data)
+        if settings.SURVEY_CACHE_RENDERED_JSON:
+            return self.retrieve_rendered(request, cache_key)
 
+        data = SurveyCacheService.get_or_compute(cache_key, self.get_representation)
         return Response(data)
 
+    def retrieve_rendered(self, request, cache_key):
+        """
+        Serve the cached JSON bytes of the survey as they are, or 304 Not
+        Modified if the client already has them.
+        """
+        etag, content = SurveyCacheService.get_or_render(cache_key, self.render_representation)
+        if etag in self.get_if_none_match(request):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+    def get_if_none_match(self, request):
+        # Weak comparison, see RFC 7232 section 3.2
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        return [value[2:] if value.startswith('W/') else value for value in etags]
+
+    def get_representation(self):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return serializer.data, instance.business_id
+
+    def render_representation(self):
+        data, business_id = self.get_representation()
+        return JSONRenderer().render(data), business_id
+
 
 class SurveyInsightsView(generics.RetrieveAPIView):
     lookup_field = 'uuid'
@@ -68,17 +135,123 @@ class SurveyInsightsView(generics.RetrieveAPIView):
     def retrieve(self, request, *args, **kwargs):
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
         cache_key = self.kwargs[lookup_url_kwarg]
-        data = SurveyInsightCacheService.get(self.survey_type, cache_key)
-        if data is None:
-            instance = self.get_object()
-            serializer = self.get_serializer(instance)
-            data = serializer.data
-            SurveyInsightCacheService.set(self.survey_type, cache_key, data)
-
+        data = SurveyInsightCacheService.get_or_compute(self.survey_type, cache_key, self.get_representation)
         return Response(data)
 
+    def get_representation(self):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return serializer.data, instance.business_id
+
+
+class SurveyTimeseriesView(generics.RetrieveAPIView):
+    """
+    Hourly or daily response counts of a survey read from its rollups
+    """
+    lookup_field = 'uuid'
+    serializer_class = SurveyTimeseriesQuerySerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        results = SurveyRollupService.get_timeseries(
+            instance.uuid, params['granularity'], params['from'], params['to']
+        )
+        return Response({
+            'id': instance.uuid,
+            'granularity': params['granularity'],
+            'from': params['from'],
+            'to': params['to'],
+            'results': results,
+        })
+
+
+class SurveyResponseExportView(generics.RetrieveAPIView):
+    """
+    Streams the responses of a survey with their contra options as CSV or
+    NDJSON. Subclasses provide get_responses() and response_field_name.
+    """
+    lookup_field = 'uuid'
+    serializer_class = SurveyResponseExportQuerySerializer
+    response_field_name = None
+
+    def perform_content_negotiation(self, request, force=False):
+        # The format query parameter selects the export format, not a renderer
+        return super(SurveyResponseExportView, self).perform_content_negotiation(request, force=True)
+
+    def get_responses(self, survey):
+        raise NotImplementedError
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        format_ = params['format']
+
+        queryset = SurveyResponseExportService.filter_period(
+            self.get_responses(instance), params.get('from'), params.get('to')
+        )
+        rows = SurveyResponseExportService.get_rows(queryset, self.response_field_name, instance.contra_id)
+        response = StreamingHttpResponse(
+            SurveyResponseExportService.render(rows, self.response_field_name, format_),
+            content_type=SurveyResponseExportService.CONTENT_TYPES[format_],
+        )
+        response['Content-Disposition'] = 'attachment; filename="%s-%s.%s"' % (
+            instance.type.lower(), instance.uuid, format_
+        )
+        return response
+
+
+class SurveyResponseCursorPagination(CursorPagination):
+    ordering = '-created'
+
+    def get_page_size(self, request):
+        return int(settings.SURVEY_OPTION_RESPONSES_PAGE_SIZE)
+
+
+class SurveyOptionResponsesView(generics.ListAPIView):
+    """
+    Lists the responses of a survey a contra option was chosen with, newest
+    first with keyset pagination. Subclasses provide get_surveys() and
+    filter_responses() for their survey type.
+    """
+    pagination_class = SurveyResponseCursorPagination
+    query_serializer_class = SurveyOptionResponsesQuerySerializer
+
+    def get_surveys(self):
+        raise NotImplementedError
+
+    def filter_responses(self, responses, params):
+        return responses
+
+    def get_queryset(self):
+        survey = get_object_or_404(self.get_surveys(), uuid=self.kwargs['uuid'])
+        serializer = self.query_serializer_class(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        if survey.contra_id is None:
+            raise Http404
+        option_text = OptionResponseService.get_option_text(multiple_choice_id=survey.contra_id, text=params['option'])
+        if option_text is None:
+            raise Http404
+
+        responses = SurveyOptionResponseService.filter_option_text(survey.responses, option_text)
+        responses = SurveyResponseExportService.filter_period(responses, params.get('from'), params.get('to'))
+        return self.filter_responses(responses, params)
+
 
 class SurveyResponseAPIView(generics.CreateAPIView):
+    """
+    Subclasses setting survey_type resolve the survey from its cached
+    SurveySnapshot, so validating a response needs no read queries. They
+    also support the asynchronous mode enabled by RESPONSE_ASYNC_INGESTION.
+    """
+    survey_type = None
 
     def set_client_id(self, request, response, client_id):
         cookie_client_id = request.COOKIES.get(settings.CLIENT_ID_COOKIE_NAME)
@@ -116,9 +289,49 @@ class SurveyResponseAPIView(generics.CreateAPIView):
         return super(SurveyResponseAPIView, self).get_serializer(*args, **default_kwargs)
 
     def get_survey(self):
-        return SurveyService.get_survey_by_uuid(self.kwargs['uuid'])
+        if self.survey_type is None:
+            return self.load_survey(self.kwargs['uuid'])
+        return SurveySnapshotService.get(self.survey_type, self.kwargs['uuid'], self.load_survey)
+
+    def load_survey(self, survey_uuid):
+        return SurveyService.get_survey_by_uuid(survey_uuid)
+
+    def is_async(self):
+        return self.survey_type is not None and bool(settings.RESPONSE_ASYNC_INGESTION)
+
+    def enqueue(self, items):
+        """
+        Store the given raw response payloads with a Celery task
+        """
+        serializer_class = self.get_serializer_class()
+        ingest_survey_responses.delay(
+            self.survey_type,
+            str(self.kwargs['uuid']),
+            '%s.%s' % (serializer_class.__module__, serializer_class.__name__),
+            items,
+            user_agent=self.request.META.get('HTTP_USER_AGENT'),
+        )
+
+    def create_async(self, request):
+        data = self.get_data(request)
+        if hasattr(data, 'dict'):
+            data = data.dict()
+        # Generated here to answer with the client id of the new customer
+        client_id = data['customer'].get('client_id') or generate_client_id()
+        data['customer']['client_id'] = client_id
+
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        self.enqueue([data])
+
+        response = Response({'client_id': client_id}, status=status.HTTP_202_ACCEPTED)
+        self.set_client_id(request, response, client_id)
+        return response
 
     def create(self, request, *args, **kwargs):
+        if self.is_async():
+            return self.create_async(request)
+
         serializer = self.get_serializer(data=self.get_data(request))
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
@@ -130,3 +343,87 @@ class SurveyResponseAPIView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         serializer.save(user_agent=self.request.META.get('HTTP_USER_AGENT'))
+
+
+class SurveyBulkResponseMixin(object):
+    """
+    Accepts a list of survey responses in one request, e.g. when kiosks or
+    SDKs replay their offline queues, and reports the result of each item.
+    Must be mixed into a SurveyResponseAPIView subclass. In asynchronous mode
+    valid responses are enqueued in batches of RESPONSE_ASYNC_BATCH_SIZE.
+    """
+
+    def get_bulk_data(self, request):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('responses')
+
+        if not isinstance(items, list):
+            raise ValidationError({'responses': [_('Expected a list of responses.')]})
+
+        max_size = int(settings.RESPONSE_BULK_MAX_SIZE)
+        if len(items) > max_size:
+            raise ValidationError({
+                'responses': [_('Ensure this field has no more than %(max)d responses.') % {'max': max_size}]
+            })
+
+        return [self.get_item_data(item) for item in items]
+
+    def get_item_data(self, item):
+        if not isinstance(item, dict):
+            return item
+
+        data = copy(item)
+        if not isinstance(data.get('customer'), dict):
+            data['customer'] = {}
+        return data
+
+    def create_async(self, request):
+        items = self.get_bulk_data(request)
+        serializer = self.get_serializer()
+
+        results = []
+        accepted = []
+        for item in items:
+            try:
+                serializer.run_validation(item)
+            except ValidationError as e:
+                results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': e.detail})
+                continue
+            results.append({'status': status.HTTP_202_ACCEPTED})
+            accepted.append(item)
+
+        batch_size = int(settings.RESPONSE_ASYNC_BATCH_SIZE)
+        for start in range(0, len(accepted), batch_size):
+            self.enqueue(accepted[start:start + batch_size])
+
+        return Response({'results': results}, status=status.HTTP_202_ACCEPTED)
+
+    def create(self, request, *args, **kwargs):
+        if self.is_async():
+            return self.create_async(request)
+
+        items = self.get_bulk_data(request)
+        serializer = self.get_serializer()
+
+        results = [None] * len(items)
+        positions = []
+        validated_items = []
+        for index, item in enumerate(items):
+            try:
+                validated_items.append(serializer.run_validation(item))
+                positions.append(index)
+            except ValidationError as e:
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': e.detail}
+
+        user_agent = request.META.get('HTTP_USER_AGENT')
+        instances = serializer.bulk_create(validated_items, user_agent=user_agent)
+        for index, instance in zip(positions, instances):
+            if isinstance(instance, ValidationError):
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': instance.detail}
+            elif instance is None:
+                results[index] = {'status': status.HTTP_404_NOT_FOUND, 'errors': {'detail': _('Not found.')}}
+            else:
+                results[index] = {'status': status.HTTP_201_CREATED, 'data': serializer.to_representation(instance)}
+
+        return Response({'results': results}, status=status.HTTP_200_OK)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+"""
+Maximum number of SQL queries a single request to each public endpoint may
+run, keyed by URL name and prefixed by the method for requests other than
+GET and POST. Authentication, permission checks and savepoints are
+included and the cache is assumed to be cold. View tests check them through
+QueryBudgetTestMixin, the endpoints benchmark reports them next to the
+measured counts.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+QUERY_BUDGETS = {
+    'cx-surveys:list': 12,
+    'cx-surveys:retrieve': 10,
+    'cx-nps:responses-create': 30,
+    'cx-nps:insights': 15,
+    'PUT cx-nps:retrieve': 30,
+    'cx-csat:responses-create': 30,
+    'cx-csat:insights': 15,
+    'cx-ces:responses-create': 30,
+    'cx-ces:insights': 15,
+}
+
+
+class _AssertQueryBudgetContext(CaptureQueriesContext):
+    def __init__(self, test_case, name):
+        self.test_case = test_case
+        self.name = name
+        self.budget = QUERY_BUDGETS[name]
+        super(_AssertQueryBudgetContext, self).__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super(_AssertQueryBudgetContext, self).__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        executed = len(self)
+        self.test_case.assertLessEqual(
+            executed, self.budget,
+            "%s ran %d queries, its budget is %d\n%s" % (
+                self.name, executed, self.budget,
+                '\n'.join(
+                    '%d. %s' % (i, query['sql']) for i, query in enumerate(self.captured_queries, start=1)
+                )
+            )
+        )
+
+
+class QueryBudgetTestMixin(object):
+    def assertQueryBudget(self, name):
+        return _AssertQueryBudgetContext(self, name)
@@ -196,6 +196,9 @@ CACHES = {
     }
 }
 
+# Tests switch cache backends, the local tier is enabled by the tests using it
+SURVEY_LOCAL_CACHE_MAX_SIZE = 0
+
 LOGIN_URL = '/login'
 
 ROOT_URLCONF = 'cx_metrics.tests.urls'
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4
+"""
+Run benchmarks against a throw-away test database and print the results as JSON.
+
+    python run_benchmarks.py response_lookups [--output results.json] [--settings module]
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import django
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Run cx_metrics benchmarks')
+    parser.add_argument('benchmarks', nargs='+', help='benchmark module names in the benchmarks package')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--settings', default='cx_metrics.tests.settings', help='Django settings module')
+    args = parser.parse_args(argv)
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = args.settings
+    django.setup()
+
+    from django.test.runner import DiscoverRunner
+
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        results = {}
+        for name in args.benchmarks:
+            module = importlib.import_module('benchmarks.%s' % name)
+            results[name] = module.run()
+    finally:
+        runner.teardown_databases(old_config)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
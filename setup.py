@@ -41,7 +41,7 @@ setup(
     author=cx_metrics.__author__,
     author_email="saeed@upkook.com",
     python_requires=">=3.5",
-    packages=find_packages(exclude=[]),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     install_requires=INSTALL_REQUIREMENTS,
     extras_require={},
     test_suite='run_tests.main',